@@ -0,0 +1,119 @@
+# Compares cave generation against the original generate_caves, a dict of
+# BlockIDs smoothed in place, kept below as the reference. The rewrite runs
+# as the pure Python and the numpy passes of generate_caves. Noise is drawn
+# differently, so the caves are compared by their air fraction and region
+# count rather than cell for cell. Also times the labelling of the regions.
+# Usage: python benchmarks/bench_caves.py [--seed N] [--sizes 90x150 512x512 2048x2048] [--skip-reference-above CELLS]
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from miner import caves, world
+from miner.world import BlockID
+
+
+def reference_caves(width, height, rng, fill_probability=72, iterations=5):
+    # The original generator, as it was before the byte grids
+    blocks_map = {}
+    for y in range(height):
+        for x in range(width):
+            if rng.randint(0, 100) < fill_probability:
+                blocks_map[(x, y)] = BlockID.STONE
+            else:
+                blocks_map[(x, y)] = BlockID.AIR
+
+    for _ in range(iterations):
+        new_blocks_map = {}
+        for y in range(1, height-1):
+            for x in range(1, width-1):
+                # Count walls around
+                walls = sum(1 for dy in range(-1, 2) for dx in range(-1, 2)
+                            if blocks_map.get((x+dx, y+dy), BlockID.AIR) == BlockID.STONE and (dx != 0 or dy != 0))
+
+                if walls >= 5:
+                    new_blocks_map[(x, y)] = BlockID.STONE
+                else:
+                    new_blocks_map[(x, y)] = BlockID.AIR
+        blocks_map = new_blocks_map
+    # Fix missing borders
+    for y in range(height):
+        blocks_map[(0, y)] = BlockID.STONE
+        blocks_map[(width-1, y)] = BlockID.STONE
+    return blocks_map
+
+
+def reference_cells(blocks_map, width, height):
+    return bytearray(blocks_map.get((x, y), BlockID.AIR).value for y in range(height) for x in range(width))
+
+
+def rewritten_caves(width, height, seed, use_numpy):
+    # Without numpy the whole generator runs as on an install without it
+    band = world.WorldBand(width, height, 0, height)
+    saved, world.np = world.np, world.np if use_numpy else None
+    try:
+        world.generate_caves(band, seed)
+    finally:
+        world.np = saved
+    return band.blocks
+
+
+def describe(cells, width):
+    air = cells.count(BlockID.AIR.value) / len(cells)
+    _, run_labels = caves.label_runs(cells, width)
+    return air, len({int(label) for label in run_labels})
+
+
+def run(width, height, seed, skip_reference_above):
+    results = {}
+    if width * height <= skip_reference_above:
+        start = time.perf_counter()
+        blocks_map = reference_caves(width, height, random.Random(seed))
+        results["reference"] = (time.perf_counter() - start, reference_cells(blocks_map, width, height))
+    for name, use_numpy in (("python", False), ("numpy", True)):
+        if use_numpy and world.np is None:
+            continue
+        start = time.perf_counter()
+        cells = rewritten_caves(width, height, seed, use_numpy)
+        results[name] = (time.perf_counter() - start, cells)
+
+    reference_time = results["reference"][0] if "reference" in results else None
+    for name, (elapsed, cells) in results.items():
+        air, regions = describe(cells, width)
+        line = f"{width}x{height} {name:9} {elapsed * 1000:9.1f} ms  air {air:.3f}  {regions:6} regions"
+        if reference_time is not None and name != "reference":
+            line += f"  x{reference_time / elapsed:.1f} vs reference"
+        print(line)
+    if "python" in results and "numpy" in results:
+        print(f"{width}x{height} python and numpy caves " + ("identical" if results["python"][1] == results["numpy"][1] else "MISMATCH"))
+
+    cells = results["numpy" if "numpy" in results else "python"][1]
+    labels = {}
+    for name, use_numpy in (("python", False), ("numpy", True)):
+        if use_numpy and world.np is None:
+            continue
+        start = time.perf_counter()
+        (rows, _, _), run_labels = caves.label_runs(cells, width, use_numpy=use_numpy)
+        labels[name] = (time.perf_counter() - start, [int(label) for label in run_labels])
+    line = f"{width}x{height} regions:"
+    for name, (elapsed, run_labels) in labels.items():
+        line += f"  {name} {elapsed * 1000:9.1f} ms ({len(set(run_labels))} regions over {len(run_labels)} runs)"
+    if len(labels) == 2:
+        line += "  identical" if labels["python"][1] == labels["numpy"][1] else "  MISMATCH"
+    print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sizes", nargs="+", default=["90x150", "512x512", "2048x2048"])
+    parser.add_argument("--skip-reference-above", type=int, default=1024 * 1024,
+                        help="skip the reference generator on maps with more cells than this")
+    args = parser.parse_args()
+    for size in args.sizes:
+        width, height = (int(v) for v in size.split("x"))
+        run(width, height, args.seed, args.skip_reference_above)
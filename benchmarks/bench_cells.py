@@ -0,0 +1,90 @@
+# Times the cell physics on settled worlds of growing size, and with growing
+# numbers of gravel and magma cells dropped into a cleared cave, against a
+# reference that looks at every loaded cell each tick.
+# Usage: python benchmarks/bench_cells.py [--chunks 4 8 16 32] [--drops 50 200 800] [--ticks 60] [--seed N]
+
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from miner import state
+from miner.cells import LOOSE_CODES
+from miner.simulation import Simulation
+from miner.world import CHUNK_SIZE, LAYER_BLOCKS, BlockID
+
+
+def settled_world(chunks, seed):
+    simulation = Simulation(seed, lighting=False)
+    world = simulation.world
+    for cy in range(chunks):
+        world.chunk(cy)
+    while state.cells.update():
+        pass
+    return simulation
+
+
+def full_scan(cells):
+    # What a physics step costs without the active set: every loaded cell is looked at
+    world = cells.world
+    for chunk in world.chunks.values():
+        y0, _ = world.chunk_rows(chunk.cy)
+        blocks = chunk.layers[LAYER_BLOCKS]
+        for i, code in enumerate(blocks):
+            if code in LOOSE_CODES:
+                y, x = divmod(i, world.width)
+                cells.target(x, y0 + y, code)
+
+
+def time_ticks(step, ticks):
+    start = time.perf_counter()
+    for _ in range(ticks):
+        step()
+    return (time.perf_counter() - start) / ticks * 1000
+
+
+def settled(chunk_counts, ticks, seed):
+    for chunks in chunk_counts:
+        settled_world(chunks, seed)
+        cells = state.cells
+        active = time_ticks(cells.update, ticks)
+        scan = time_ticks(lambda: full_scan(cells), max(ticks // 10, 1))
+        print(f"settled, {chunks * CHUNK_SIZE:5} rows: active cells {active:8.4f} ms/tick, "
+              f"full scan {scan:8.2f} ms/tick ({len(cells.active)} active)")
+
+
+def drops(counts, ticks, seed, rng):
+    # A cleared cave of 4 chunks, then cells dropped into its top half. Every
+    # cell keeps moving for most of the ticks, so the cost follows the drops.
+    for count in counts:
+        simulation = settled_world(4, seed)
+        world = simulation.world
+        rows = 4 * CHUNK_SIZE
+        for y in range(8, rows - 1):
+            for x in range(world.width):
+                state.blocks_handler.blocks.set(x, y, BlockID.AIR.value)
+        while state.cells.update():
+            pass
+        for x, y in rng.sample([(x, y) for y in range(8, rows // 2) for x in range(world.width)], count):
+            state.blocks_handler.set_block(x, y, rng.choice((BlockID.GRAVEL, BlockID.MAGMA)))
+        cells = state.cells
+        moves = cells.moves
+        active = time_ticks(cells.update, ticks)
+        print(f"{count:5} dropped: active cells {active:8.4f} ms/tick, {(cells.moves - moves) / ticks:7.1f} cell changes/tick, "
+              f"{len(cells.active)} cells to look at next")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, nargs="+", default=[4, 8, 16, 32])
+    parser.add_argument("--drops", type=int, nargs="+", default=[50, 200, 800])
+    parser.add_argument("--ticks", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+    settled(args.chunks, args.ticks, args.seed)
+    drops(args.drops, args.ticks, args.seed, random.Random(args.seed))
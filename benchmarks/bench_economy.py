@@ -0,0 +1,34 @@
+# Times the economy simulator with growing process pools, games per second
+# should grow with the workers up to the number of cores.
+# Usage: python benchmarks/bench_economy.py [--games 32] [--ticks 3000] [--workers 1 2 4 8]
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from miner.economy import run_games
+
+
+if __name__ == "__main__":
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=32)
+    parser.add_argument("--ticks", type=int, default=3000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, 4, cores}))
+    args = parser.parse_args()
+    print(f"{cores} cores, {args.games} games of {args.ticks} ticks")
+    baseline = None
+    results = None
+    for workers in args.workers:
+        start = time.perf_counter()
+        played = run_games(args.games, args.ticks, seed=args.seed, workers=workers)
+        rate = args.games / (time.perf_counter() - start)
+        baseline = rate if baseline is None else baseline
+        same = results is None or played == results
+        results = played if results is None else results
+        print(f"{workers:3} workers: {rate:6.2f} games/s  x{rate / baseline:.2f}  efficiency {rate / baseline / workers:.0%}"
+              + ("" if same else "  MISMATCH"))
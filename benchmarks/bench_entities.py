@@ -0,0 +1,56 @@
+# Times the batched enemy update of EntityStore against the frame budget.
+# Usage: python benchmarks/bench_entities.py [--count 10000] [--ticks 300] [--seed N]
+
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from miner import state
+from miner.constants import TICK_TIME
+from miner.simulation import Simulation
+from miner.world import CHUNK_SIZE, np
+
+
+def populate(count, seed):
+    # Spreads the enemies over the loaded chunks around the spawn point
+    simulation = Simulation(seed, lighting=False)
+    world = simulation.world
+    world.stream(0)
+    rows = max(world.chunks) * CHUNK_SIZE + CHUNK_SIZE
+    rng = random.Random(seed)
+    for _ in range(count):
+        state.enemies.spawn(rng.randrange(world.width) * 8, rng.randrange(rows) * 8, rng.choice((-1, 1)))
+    return simulation
+
+
+def run(count, ticks, seed, use_numpy):
+    simulation = populate(count, seed)
+    store = state.enemies
+    start = time.perf_counter()
+    for _ in range(ticks):
+        store.update(simulation.world, use_numpy=use_numpy)
+        store.cleanup()
+    per_tick = (time.perf_counter() - start) / ticks * 1000
+    budget = TICK_TIME * 1000
+    positions = [(handle.x, handle.y) for handle in store.handles]
+    print(f"{'numpy' if use_numpy else 'python':6} {count} enemies: {per_tick:7.2f} ms/tick"
+          f" ({per_tick / budget:.0%} of the {budget:.1f} ms frame)")
+    return positions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=10000)
+    parser.add_argument("--ticks", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+    results = [run(args.count, args.ticks, args.seed, False)]
+    if np is not None:
+        results.append(run(args.count, args.ticks, args.seed, True))
+        print("identical" if results[0] == results[1] else "MISMATCH")
@@ -0,0 +1,105 @@
+# Times long paths through a deep map on the cluster graph against plain A*,
+# and a crowd of enemies chasing the player through the flow fields against
+# a full A* per enemy.
+# Usage: python benchmarks/bench_pathfinding.py [--chunks 16] [--paths 50] [--enemies 300] [--ticks 60] [--seed N]
+
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from miner import state
+from miner.constants import TICK_TIME
+from miner.entities import update_entities
+from miner.pathfinding import CHASE_RADIUS, NavGraph, astar
+from miner.simulation import Simulation
+from miner.world import CHUNK_SIZE
+
+
+def deep_map(chunks, seed):
+    # Loads the chunks and digs a shaft with a gallery every 64 rows, so the
+    # caves of the whole depth hang together
+    simulation = Simulation(seed, lighting=False)
+    world = simulation.world
+    for cy in range(chunks):
+        world.chunk(cy)
+    rows = chunks * CHUNK_SIZE
+    for y in range(rows):
+        state.blocks_handler.destroy_block(world.width // 2, y)
+        if y % 64 == 32:
+            for x in range(world.width):
+                state.blocks_handler.destroy_block(x, y)
+    return simulation, rows
+
+
+def long_paths(graph, rows, count, rng):
+    opens = [(x, y) for y in range(rows) for x in range(graph.world.width) if graph.is_open(x, y)]
+    pairs = []
+    while len(pairs) < count:
+        start, goal = rng.choice(opens), rng.choice(opens)
+        if abs(start[1] - goal[1]) > rows // 2:
+            pairs.append((start, goal))
+    start = time.perf_counter()
+    plain = [astar(a, b, graph.is_open) for a, b in pairs]
+    plain_time = time.perf_counter() - start
+    start = time.perf_counter()
+    hierarchical = [graph.find_path(a, b) for a, b in pairs]
+    graph_time = time.perf_counter() - start
+    found = [(p, h) for p, h in zip(plain, hierarchical) if p is not None]
+    agree = sum((p is None) == (h is None) for p, h in zip(plain, hierarchical))
+    longer = sum(len(h) for _, h in found) / max(sum(len(p) for p, _ in found), 1)
+    print(f"{count} paths over {rows} rows: plain A* {plain_time / count * 1000:7.2f} ms, "
+          f"cluster graph {graph_time / count * 1000:7.2f} ms  x{plain_time / graph_time:.1f}  "
+          f"({len(found)} reachable, {agree}/{count} agree, {longer:.3f}x the optimal length)")
+
+
+def chase(simulation, rows, enemies, ticks, rng):
+    world = simulation.world
+    state.player.x, state.player.y = world.width // 2 * 8, (rows // 2) * 8
+    reach = CHASE_RADIUS
+    px, py = world.width // 2, rows // 2
+    spots = [(x, y) for y in range(max(py - reach, 0), min(py + reach, rows - 1))
+             for x in range(world.width) if state.paths.graph.is_open(x, y) and not state.paths.graph.is_open(x, y + 1)]
+    for _ in range(enemies):
+        x, y = rng.choice(spots)
+        state.enemies.spawn(x * 8, y * 8, rng.choice((-1, 1)))
+    update_entities()  # Builds the flow fields once
+    start = time.perf_counter()
+    for tick in range(ticks):
+        state.player.x += 1 if tick // 30 % 2 == 0 else -1  # A moving target, new fields every few ticks
+        update_entities()
+    field_time = (time.perf_counter() - start) / ticks
+    # The naive way: every enemy searches the whole map every tick
+    graph = state.paths.graph
+    goal = ((state.player.x + 4) >> 3, (state.player.y + 4) >> 3)
+    start = time.perf_counter()
+    for handle in state.enemies.handles:
+        astar(((handle.x + 4) >> 3, handle.y >> 3), goal, graph.is_open)
+    naive_time = time.perf_counter() - start
+    print(f"{enemies} enemies chasing: flow fields {field_time * 1000:7.2f} ms/tick, "
+          f"A* per enemy {naive_time * 1000:7.2f} ms/tick (budget {TICK_TIME * 1000:.1f} ms), "
+          f"{len(state.paths.flows)} cluster flows")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=16)
+    parser.add_argument("--paths", type=int, default=50)
+    parser.add_argument("--enemies", type=int, default=300)
+    parser.add_argument("--ticks", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+    rng = random.Random(args.seed)
+    simulation, rows = deep_map(args.chunks, args.seed)
+    start = time.perf_counter()
+    graph = NavGraph(simulation.world)
+    graph.repair()
+    print(f"cluster graph of {rows} rows built in {(time.perf_counter() - start) * 1000:.1f} ms "
+          f"({len(graph.intra)} clusters, {sum(len(nodes) for nodes in graph.intra.values())} nodes)")
+    long_paths(graph, rows, args.paths, rng)
+    chase(simulation, rows, args.enemies, args.ticks, rng)
@@ -0,0 +1,229 @@
+# Times the hot paths of the game against a stubbed pyxel backend: world
+# generation stages at several map sizes, collision, lighting, ore queries and
+# a full frame of App.draw. Save a run with --save and compare later runs against it with
+# --compare to see what a change did.
+# Usage: python benchmarks/bench_suite.py [--sizes 90x150 256x256 512x512] [--rounds 5]
+#                                          [--only lighting] [--save base.json] [--compare base.json]
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import stub_pyxel
+
+stub_pyxel.install()
+
+from miner import world, physics, controls, state, ui
+from miner import simulation as simulation_module
+
+SEED = 0
+
+
+def measure(run, setup=None, rounds=5, number=1):
+    # Best and mean milliseconds per call; setup runs untimed before every round
+    times = []
+    for _ in range(rounds):
+        fixture = setup() if setup is not None else None
+        start = time.perf_counter()
+        for _ in range(number):
+            run(fixture)
+        times.append((time.perf_counter() - start) / number * 1000)
+    return min(times), sum(times) / len(times)
+
+
+def band_after(width, height, stages):
+    band = world.WorldBand(width, height, 0, height)
+    for stage in stages:
+        stage(band, SEED)
+    return band
+
+
+def copy_band(band):
+    copy = world.WorldBand(band.width, band.height, band.y0, band.y1)
+    copy.blocks[:], copy.variants[:], copy.ores[:] = band.blocks, band.variants, band.ores
+    return copy
+
+
+def bench_generation(sizes, rounds):
+    results = {}
+    before = {
+        "generate_caves": [world.generate_variants],
+        "rocks_gradient_changer": [world.generate_variants, world.generate_caves],
+        "generate_ores": [world.generate_variants, world.generate_caves, world.rocks_gradient_changer],
+    }
+    stages = {
+        "generate_caves": world.generate_caves,
+        "rocks_gradient_changer": world.rocks_gradient_changer,
+        "generate_ores": world.generate_ores,
+    }
+    for width, height in sizes:
+        for name, stage in stages.items():
+            base = band_after(width, height, before[name])
+            results[f"{name} {width}x{height}"] = measure(lambda band: stage(band, SEED), lambda: copy_band(base), rounds)
+    return results
+
+
+def start_simulation(lighting):
+    simulation = simulation_module.Simulation(SEED, lighting=lighting)
+    simulation.world.stream(0)
+    return simulation
+
+
+def bench_collision(rounds):
+    simulation = start_simulation(lighting=False)
+    rows = (max(simulation.world.chunks) + 1) * world.CHUNK_SIZE
+    rng = random.Random(SEED)
+    points = [(rng.randrange(simulation.world.width * 8), rng.randrange(rows * 8)) for _ in range(1000)]
+    moves = [(x, y, rng.randint(-2, 2), rng.randint(-6, 3)) for x, y in points]
+
+    def colliding(fixture):
+        for x, y in points:
+            physics.is_colliding(x, y, False)
+
+    def pushing(fixture):
+        for x, y, dx, dy in moves:
+            physics.push_back(x, y, dx, dy)
+
+    return {
+        "is_colliding x1000": measure(colliding, rounds=rounds),
+        "push_back x1000": measure(pushing, rounds=rounds),
+    }
+
+
+def bench_lighting(rounds):
+    simulation = start_simulation(lighting=True)
+    darkness = state.darkness_system
+    state.scroll_x, state.scroll_y = 0, 40 * 8
+    x, y = 8 * 8, 48 * 8
+    darkness.update_lighting(x, y)
+    darkness.render_darkness()
+
+    def still(fixture):
+        darkness.update_lighting(x, y)
+        darkness.render_darkness()
+
+    def moving(fixture):
+        for step in range(8):
+            darkness.update_lighting(x + 8 * step, y)
+            darkness.render_darkness()
+
+    def digging(fixture):
+        state.blocks_handler.set_block(x // 8 + 1, y // 8, world.BlockID.AIR)
+        darkness.update_lighting(x, y)
+        darkness.render_darkness()
+
+    def restore_block():
+        state.blocks_handler.set_block(x // 8 + 1, y // 8, world.BlockID.STONE)
+        darkness.update_lighting(x, y)
+        darkness.render_darkness()
+
+    return {
+        "lighting still frame": measure(still, rounds=rounds, number=20),
+        "lighting 8 moving frames": measure(moving, rounds=rounds),
+        "lighting frame after a dig": measure(digging, restore_block, rounds=rounds),
+    }
+
+
+def bench_ores(rounds):
+    simulation = start_simulation(lighting=False)
+    index = state.ore_handler.index
+    rng = random.Random(SEED)
+    rows = (max(simulation.world.chunks) + 1) * world.CHUNK_SIZE
+    points = [(rng.randrange(simulation.world.width), rng.randrange(rows)) for _ in range(100)]
+    diamonds = world.OreID.DIAMONDS
+
+    def indexed(fixture):
+        for x, y in points:
+            index.nearest(diamonds, x, y)
+
+    def scanning(fixture):
+        # What a query cost before the index: every cell of every loaded chunk
+        for x, y in points:
+            best = None
+            for cy, chunk in simulation.world.chunks.items():
+                for i, code in enumerate(chunk.layers[world.LAYER_ORES]):
+                    if code == diamonds.value:
+                        ore_y, ore_x = divmod(i, simulation.world.width)
+                        distance = (ore_x - x) ** 2 + (cy * world.CHUNK_SIZE + ore_y - y) ** 2
+                        if best is None or distance < best:
+                            best = distance
+
+    return {
+        "nearest ore x100 indexed": measure(indexed, rounds=rounds),
+        "nearest ore x100 full scan": measure(scanning, rounds=rounds),
+    }
+
+
+def bench_frame(rounds):
+    app = ui.App()
+    app.first_frame_time = 0.0
+    app.start(simulation_module.Simulation(SEED))  # Skips the loading screen, whose world has a random seed
+    simulation = app.simulation
+    simulation.run(controls.ScriptedInput(simulation_module.soak_actions), 600)
+    app.draw()
+    source = controls.ScriptedInput(simulation_module.soak_actions)
+
+    def still(fixture):
+        app.draw()
+
+    def playing(fixture):
+        simulation.tick(source.actions(simulation.tick_count))
+        app.draw()
+
+    return {
+        "App.draw still": measure(still, rounds=rounds, number=20),
+        "tick + App.draw": measure(playing, rounds=rounds, number=20),
+    }
+
+
+GROUPS = ("generation", "collision", "lighting", "ores", "frame")
+
+
+def run(groups, sizes, rounds):
+    results = {}
+    if "generation" in groups:
+        results.update(bench_generation(sizes, rounds))
+    if "collision" in groups:
+        results.update(bench_collision(rounds))
+    if "lighting" in groups:
+        results.update(bench_lighting(rounds))
+    if "ores" in groups:
+        results.update(bench_ores(rounds))
+    if "frame" in groups:
+        results.update(bench_frame(rounds))
+    return results
+
+
+def report(results, baseline):
+    for name, (best, mean) in results.items():
+        line = f"{name:36} {best:9.3f} ms best {mean:9.3f} ms mean"
+        if name in baseline:
+            line += f"  {baseline[name][0] / best:6.2f}x vs baseline"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", nargs="+", default=["90x150", "256x256", "512x512"])
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--only", nargs="+", choices=GROUPS, default=GROUPS)
+    parser.add_argument("--save", metavar="PATH", help="write the results as JSON")
+    parser.add_argument("--compare", metavar="PATH", help="show speedups against saved results")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+    sizes = [tuple(int(v) for v in size.split("x")) for size in args.sizes]
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    results = run(args.only, sizes, args.rounds)
+    report(results, baseline)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=1)
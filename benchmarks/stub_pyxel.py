@@ -0,0 +1,36 @@
+# Headless stand-in for pyxel, installed before the miner package is imported so the game
+# can be timed without a window. Screen drawing, input and audio do nothing.
+# Off-screen images stay real pyxel images, composing them is part of what
+# the benchmarks measure.
+
+import sys
+import types
+
+import pyxel as real_pyxel
+
+
+def noop(*args, **kwargs):
+    return None
+
+
+def install():
+    if isinstance(sys.modules.get("pyxel"), types.ModuleType) and getattr(sys.modules["pyxel"], "IS_STUB", False):
+        return sys.modules["pyxel"]
+    stub = types.ModuleType("pyxel")
+    stub.IS_STUB = True
+    for name in dir(real_pyxel):
+        if name.isupper():
+            setattr(stub, name, getattr(real_pyxel, name))
+    stub.Image = real_pyxel.Image
+    stub.floor = real_pyxel.floor
+    stub.ceil = real_pyxel.ceil
+    stub.images = [real_pyxel.Image(256, 256) for _ in range(3)]
+    stub.tilemaps = []
+    stub.frame_count = 0
+    for name in ("init", "load", "run", "quit", "play", "playm", "cls", "camera", "blt", "bltm",
+                 "text", "rect", "rectb", "pset", "line"):
+        setattr(stub, name, noop)
+    stub.btn = lambda key: False
+    stub.btnp = lambda key, *args, **kwargs: False
+    sys.modules["pyxel"] = stub
+    return stub
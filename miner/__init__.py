@@ -0,0 +1,23 @@
+# Epic Alien Miner Duck In Space, as an importable package. Importing it has
+# no side effects: no window, no assets and no world until a Simulation or an
+# App is created.
+#
+#   world       chunked world store and generation
+#   saves       save files and the edit journal
+#   physics     collision and movement
+#   entities    spatial hash and the enemy store
+#   lighting    light emitters and the darkness overlay
+#   caves       connected cave regions of the loaded chunks
+#   pathfinding cluster nav graph, paths and enemy steering
+#   cells       falling gravel and flowing magma, active cells only
+#   handlers    blocks, ores, mining, inventory and trigger zones
+#   controls    input handling, input sources and recordings
+#   player      the player
+#   simulation  fixed-timestep game core and headless runners
+#   economy     bot games in a process pool and the economy report
+#   net         multiplayer protocol and the thin client
+#   server      authoritative multiplayer server and its load test
+#   audio       sound effects and music
+#   profiler    frame timers, the profiling overlay and dumps
+#   ui          the pyxel window and loading screen
+#   cli         command line entry point
@@ -0,0 +1,8 @@
+import pyxel
+
+audio_enabled = False
+
+
+def play_sound(channel, sound):
+    if audio_enabled:
+        pyxel.play(channel, sound)
@@ -0,0 +1,251 @@
+from bisect import bisect_right
+
+try:
+    import numpy as np
+except ImportError:  # The web build runs without numpy, fall back to pure Python
+    np = None
+
+from .world import BlockID, LAYER_BLOCKS
+
+# === Cave Regions ===
+# Connected areas of air are labelled over horizontal runs instead of cells: a
+# run is a stretch of air in one row, and two runs belong to the same region
+# when they touch across neighbouring rows. A map has far fewer runs than
+# cells, and the run lists double as the lookup from a cell to its region.
+AIR_MASK = bytes(1 if code == BlockID.AIR.value else 0 for code in range(256))
+
+def air_runs(cells, width):
+    # (row, first x, last x) of every air run, in row-major order
+    rows, starts, ends = [], [], []
+    for row in range(len(cells) // width):
+        line = cells[row * width:(row + 1) * width].translate(AIR_MASK)
+        x = line.find(1)
+        while x != -1:
+            end = line.find(0, x)
+            end = width if end == -1 else end
+            rows.append(row)
+            starts.append(x)
+            ends.append(end - 1)
+            x = line.find(1, end)
+    return rows, starts, ends
+
+def label_runs(cells, width, ys=None, use_numpy=None):
+    # Returns the runs as (rows, starts, ends) and the region label of every
+    # run, which is the index of the first run of its region, as lists or with
+    # numpy as arrays. ys gives the world row of every row of cells, rows only
+    # connect where ys is consecutive.
+    if use_numpy is None:
+        use_numpy = np is not None
+    height = len(cells) // width
+    ys = list(range(height)) if ys is None else list(ys)
+    if use_numpy:
+        return label_runs_numpy(cells, width, ys)
+    return label_runs_python(cells, width, ys)
+
+def label_runs_python(cells, width, ys):
+    rows, starts, ends = air_runs(bytes(cells), width)
+    parent = list(range(len(rows)))
+
+    def find(run):
+        while parent[run] != run:
+            parent[run] = parent[parent[run]]
+            run = parent[run]
+        return run
+
+    # Walk every row against the one above with two pointers over the sorted runs
+    above_first = above_end = 0
+    first = 0
+    while first < len(rows):
+        row = rows[first]
+        end = first
+        while end < len(rows) and rows[end] == row:
+            end += 1
+        if above_first < above_end and rows[above_first] == row - 1 and ys[row - 1] == ys[row] - 1:
+            other = above_first
+            for run in range(first, end):
+                while other < above_end and ends[other] < starts[run]:
+                    other += 1
+                touching = other
+                while touching < above_end and starts[touching] <= ends[run]:
+                    a, b = find(run), find(touching)
+                    if a != b:
+                        parent[max(a, b)] = min(a, b)
+                    touching += 1
+        above_first, above_end = first, end
+        first = end
+    return (rows, starts, ends), [find(run) for run in range(len(rows))]
+
+def label_runs_numpy(cells, width, ys):
+    # Same labels as label_runs_python: runs come from the edges of the air
+    # mask, touching pairs from two searchsorted calls, and the components from
+    # hooking roots onto smaller roots and shortcutting until nothing changes.
+    height = len(cells) // width
+    # Air mask with a solid cell closing every row and one in front of it all,
+    # so the mask flips exactly at the first and one past the last cell of a run
+    stride = width + 1
+    air = np.zeros(height * stride + 1, dtype=bool)
+    air[1:].reshape(height, stride)[:, :-1] = np.frombuffer(cells, dtype=np.uint8).reshape(height, width) == BlockID.AIR.value
+    flips = np.flatnonzero(air[1:] != air[:-1])
+    rows, starts = np.divmod(flips[0::2], stride)
+    ends = flips[1::2] - rows * stride - 1
+    count = len(rows)
+
+    # Runs of the row above overlapping each run, as a contiguous index range
+    start_keys, end_keys = rows * stride + starts, rows * stride + ends
+    low = np.searchsorted(end_keys, (rows - 1) * stride + starts, side="left")
+    high = np.searchsorted(start_keys, (rows - 1) * stride + ends, side="right")
+    world_rows = np.asarray(ys, dtype=np.int64)
+    connected = np.zeros(count, dtype=bool)
+    connected[rows > 0] = world_rows[rows[rows > 0] - 1] == world_rows[rows[rows > 0]] - 1
+    touching = np.where(connected, np.maximum(high - low, 0), 0)
+    upper = np.repeat(np.arange(count), touching)
+    offsets = np.arange(len(upper)) - np.repeat(np.cumsum(touching) - touching, touching)
+    lower = np.repeat(low, touching) + offsets
+
+    parent = np.arange(count)
+    while True:
+        a, b = parent[upper], parent[lower]
+        differ = a != b
+        if not differ.any():
+            break
+        np.minimum.at(parent, np.maximum(a, b)[differ], np.minimum(a, b)[differ])
+        while True:
+            grand = parent[parent]
+            if np.array_equal(grand, parent):
+                break
+            parent = grand
+    return (rows, starts, ends), parent
+
+class Region:
+    __slots__ = ("id", "size", "x0", "y0", "x1", "y1")
+
+    def __init__(self, region_id, size, x0, y0, x1, y1):
+        self.id = region_id
+        self.size = size  # Air cells
+        self.x0, self.y0, self.x1, self.y1 = x0, y0, x1, y1  # Inclusive bounding box in blocks
+
+    def __repr__(self):
+        return f"Region({self.id}, size={self.size}, box=({self.x0}, {self.y0}, {self.x1}, {self.y1}))"
+
+class CaveRegions:
+    # Cave regions of the loaded chunks. Loading or evicting a chunk only marks
+    # the labels stale, they are rebuilt on the next query. Opening a wall
+    # joins the regions around it in place through the union-find; filling an
+    # air cell may split a region, so that marks the labels stale too.
+    def __init__(self, world):
+        self.world = world
+        self.stale = True
+        self.parent = []  # Run -> parent run, roots are region ids
+        self.stats = {}  # Region id -> [size, x0, y0, x1, y1]
+        self.row_starts = {}  # World row -> first x of its runs, sorted
+        self.row_runs = {}  # World row -> run ids in the same order
+        self.run_ends = []  # Run -> last x
+        world.add_listener(self)
+
+    def relabel(self):
+        world = self.world
+        chunks = [world.chunks[cy] for cy in sorted(world.chunks)]
+        ys = [y for chunk in chunks for y in range(*world.chunk_rows(chunk.cy))]
+        cells = b"".join(chunk.layers[LAYER_BLOCKS] for chunk in chunks)
+        (rows, starts, ends), labels = label_runs(cells, world.width, ys)
+        if not isinstance(labels, list):
+            rows, starts, ends, labels = rows.tolist(), starts.tolist(), ends.tolist(), labels.tolist()
+        self.parent = labels
+        self.stats = {}
+        self.row_starts, self.row_runs = {}, {}
+        for run, (row, start, end, label) in enumerate(zip(rows, starts, ends, labels)):
+            y = ys[row]
+            self.row_starts.setdefault(y, []).append(start)
+            self.row_runs.setdefault(y, []).append(run)
+            stats = self.stats.get(label)
+            if stats is None:
+                self.stats[label] = [end - start + 1, start, y, end, y]
+            else:
+                stats[0] += end - start + 1
+                stats[1], stats[3] = min(stats[1], start), max(stats[3], end)
+                stats[4] = y
+        self.run_ends = ends
+        self.stale = False
+
+    def find(self, run):
+        parent = self.parent
+        while parent[run] != run:
+            parent[run] = parent[parent[run]]
+            run = parent[run]
+        return run
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return a
+        root, child = min(a, b), max(a, b)
+        self.parent[child] = root
+        merged, joined = self.stats[root], self.stats.pop(child)
+        merged[0] += joined[0]
+        merged[1], merged[2] = min(merged[1], joined[1]), min(merged[2], joined[2])
+        merged[3], merged[4] = max(merged[3], joined[3]), max(merged[4], joined[4])
+        return root
+
+    def run_at(self, x, y):
+        starts = self.row_starts.get(y)
+        if starts is None:
+            return None
+        i = bisect_right(starts, x) - 1
+        if i < 0:
+            return None
+        run = self.row_runs[y][i]
+        return run if self.run_ends[run] >= x else None
+
+    def region_at(self, x, y):
+        # Region id of an air cell, None for solid or unloaded cells
+        if self.stale:
+            self.relabel()
+        run = self.run_at(x, y)
+        return None if run is None else self.find(run)
+
+    def region(self, region_id):
+        if self.stale:
+            self.relabel()
+        return Region(region_id, *self.stats[region_id])
+
+    def regions(self):
+        if self.stale:
+            self.relabel()
+        return [Region(region_id, *stats) for region_id, stats in self.stats.items()]
+
+    def surface_region(self):
+        # The open air above the grass, None while the top chunk is not loaded
+        return self.region_at(0, 0)
+
+    def is_reachable(self, x, y):
+        # Whether an air cell connects to the surface through loaded chunks
+        surface = self.surface_region()
+        return surface is not None and self.region_at(x, y) == surface
+
+    def on_block_changed(self, block_x, block_y):
+        if self.stale:
+            return
+        is_air = self.world.blocks.get(block_x, block_y) == BlockID.AIR.value
+        run = self.run_at(block_x, block_y)
+        if run is not None and not is_air:
+            self.stale = True
+        elif run is None and is_air:
+            # A new one cell run, joined to every region it now touches
+            run = len(self.parent)
+            self.parent.append(run)
+            self.run_ends.append(block_x)
+            self.stats[run] = [1, block_x, block_y, block_x, block_y]
+            starts = self.row_starts.setdefault(block_y, [])
+            i = bisect_right(starts, block_x)
+            starts.insert(i, block_x)
+            self.row_runs.setdefault(block_y, []).insert(i, run)
+            for x, y in ((block_x - 1, block_y), (block_x + 1, block_y), (block_x, block_y - 1), (block_x, block_y + 1)):
+                other = self.run_at(x, y)
+                if other is not None:
+                    self.union(run, other)
+
+    def on_chunk_loaded(self, world, chunk):
+        self.stale = True
+
+    def on_chunk_evicted(self, world, chunk):
+        self.stale = True
@@ -0,0 +1,172 @@
+from . import state
+from .saves import EDIT_PHYSICS
+from .world import BlockID, CHUNK_MASK, CHUNK_SHIFT, LAYER_BLOCKS, SOLID_BY_CODE
+
+# === Cell Physics ===
+# Gravel falls and magma flows, one cell per tick. Only active cells are
+# looked at: a cell becomes active when something next to it changes, and
+# stays active only while it keeps moving, so a settled world costs nothing
+# per tick however much of it is loaded.
+AIR = BlockID.AIR.value
+GRAVEL = BlockID.GRAVEL.value
+MAGMA = BlockID.MAGMA.value
+LOOSE_CODES = (GRAVEL, MAGMA)
+AROUND = ((-1, -1), (0, -1), (1, -1), (-1, 0), (0, 0), (1, 0), (-1, 1), (0, 1), (1, 1))
+
+class CellPhysics:
+    # Moves are written straight into the chunk bytes while the tick runs, so
+    # later cells see earlier moves. The cells that changed are then handed
+    # on in one go: journal (as physics records, which replay but do not
+    # count as mining), unsaved chunks, redraws, and lighting, cave regions
+    # and paths where solidity or air changed.
+    def __init__(self, world):
+        self.world = world
+        self.active = set()  # Cells to look at next tick
+        self.ticks = 0
+        self.moves = 0  # Moves made so far, for benchmarks
+        world.add_listener(self)
+
+    def code(self, x, y):
+        # Block code, None outside the map or in chunks that are not loaded,
+        # which holds a cell in place until its neighbour loads
+        world = self.world
+        if x < 0 or x >= world.width or y < 0 or (world.height is not None and y >= world.height):
+            return None
+        chunk = world.chunks.get(y >> CHUNK_SHIFT)
+        if chunk is None:
+            return None
+        return chunk.layers[LAYER_BLOCKS][(y & CHUNK_MASK) * world.width + x]
+
+    def activate(self, block_x, block_y):
+        # Wakes the loose cells around a changed cell
+        for dx, dy in AROUND:
+            if self.code(block_x + dx, block_y + dy) in LOOSE_CODES:
+                self.active.add((block_x + dx, block_y + dy))
+
+    def target(self, x, y, code):
+        # Where the cell at (x, y) moves this tick, or None. Gravel drops
+        # through air and magma. Magma drops, slides down a slope, and moves
+        # sideways only with magma on top of it, so a pool levels out and a
+        # lone cell on a floor stays put.
+        below = self.code(x, y + 1)
+        if code == GRAVEL:
+            return (x, y + 1) if below == AIR or below == MAGMA else None
+        if below == AIR:
+            return (x, y + 1)
+        sides = (1, -1) if (x + self.ticks) & 1 else (-1, 1)
+        for dx in sides:
+            if self.code(x + dx, y) == AIR and self.code(x + dx, y + 1) == AIR:
+                return (x + dx, y + 1)
+        if self.code(x, y - 1) == MAGMA:
+            for dx in sides:
+                if self.code(x + dx, y) == AIR:
+                    return (x + dx, y)
+        return None
+
+    def occupied(self, x, y, players):
+        # Whether a player or an enemy overlaps the cell. Cells do not move
+        # into one, so nobody gets buried in a block they cannot dig out of.
+        x1, y1 = x * 8, y * 8
+        x2, y2 = x1 + 7, y1 + 7
+        for player in players:
+            if player.x <= x2 and x1 <= player.x + 7 and player.y <= y2 and y1 <= player.y + 7:
+                return True
+        if state.entity_index is not None:
+            for handle in state.entity_index.query((x1, y1, x2, y2)):
+                if handle.x <= x2 and x1 <= handle.x + 7 and handle.y <= y2 and y1 <= handle.y + 7:
+                    return True
+        return False
+
+    def update(self, players=None):
+        # Players to keep clear of, by default the one in the state module
+        if not self.active:
+            return 0
+        if players is None:
+            players = () if state.player is None else (state.player,)
+        world = self.world
+        width, chunks = world.width, world.chunks
+        # Bottom up, so a falling column moves as one
+        cells = sorted(self.active, key=lambda cell: (-cell[1], cell[0]))
+        self.active = woken = set()
+        before, after = {}, {}  # Cell -> code at the start and at the end of the tick, for every cell written
+        moved = set()  # Cells moved into this tick, they wait for the next one
+        for x, y in cells:
+            if (x, y) in moved:
+                woken.add((x, y))
+                continue
+            code = self.code(x, y)
+            if code not in LOOSE_CODES:
+                continue
+            target = self.target(x, y, code)
+            if target is None:
+                continue
+            if self.occupied(*target, players):
+                # Held until whoever is in the way moves on
+                woken.add((x, y))
+                continue
+            tx, ty = target
+            other = self.code(tx, ty)
+            before.setdefault((x, y), code)
+            before.setdefault(target, other)
+            after[(x, y)], after[target] = other, code
+            chunks[y >> CHUNK_SHIFT].layers[LAYER_BLOCKS][(y & CHUNK_MASK) * width + x] = other
+            chunks[ty >> CHUNK_SHIFT].layers[LAYER_BLOCKS][(ty & CHUNK_MASK) * width + tx] = code
+            moved.add(target)
+            # Neighbours of both cells look again next tick, the ones that are
+            # not loose drop out there
+            for dx, dy in AROUND:
+                woken.add((x + dx, y + dy))
+                woken.add((tx + dx, ty + dy))
+        self.ticks += 1
+        changed = [(x, y, old, after[(x, y)]) for (x, y), old in before.items() if after[(x, y)] != old]
+        if changed:
+            self.apply(changed)
+        return len(changed)
+
+    def apply(self, changed):
+        world = self.world
+        self.moves += len(changed)
+        journal, blocks_handler = state.journal, state.blocks_handler
+        for cy in {y >> CHUNK_SHIFT for _, y, _, _ in changed}:
+            world.chunks[cy].dirty = True
+            world.unsaved.add(cy)
+            world.edited.add(cy)
+        for x, y, old, new in changed:
+            if journal is not None:
+                journal.record(x, y, old, new, kind=EDIT_PHYSICS)
+            if blocks_handler is not None:
+                blocks_handler.mark_dirty(x, y)
+            solidity = SOLID_BY_CODE[old] != SOLID_BY_CODE[new]
+            if solidity and state.paths is not None:
+                state.paths.graph.on_block_changed(x, y)
+            # Lava rock glows only next to air, so magma flowing in or out of
+            # air matters to lighting even though it is not solid
+            if (solidity or AIR in (old, new)) and state.darkness_system is not None:
+                state.darkness_system.on_block_changed(x, y)
+            if state.cave_regions is not None and AIR in (old, new):
+                state.cave_regions.on_block_changed(x, y)
+
+    def on_block_changed(self, block_x, block_y):
+        self.activate(block_x, block_y)
+
+    def on_chunk_loaded(self, world, chunk):
+        # Loose cells of the new chunk that can move, and the row above it,
+        # which may have been waiting for this chunk to load. Chunks mapped
+        # from a save are mmaps, which only find bytes.
+        y0, y1 = world.chunk_rows(chunk.cy)
+        blocks = chunk.layers[LAYER_BLOCKS]
+        for code in LOOSE_CODES:
+            needle = bytes((code,))
+            i = blocks.find(needle)
+            while i != -1:
+                y, x = divmod(i, world.width)
+                if self.target(x, y0 + y, code) is not None:
+                    self.active.add((x, y0 + y))
+                i = blocks.find(needle, i + 1)
+        for x in range(world.width):
+            if self.code(x, y0 - 1) in LOOSE_CODES:
+                self.active.add((x, y0 - 1))
+
+    def on_chunk_evicted(self, world, chunk):
+        y0, y1 = world.chunk_rows(chunk.cy)
+        self.active = {(x, y) for x, y in self.active if not y0 <= y < y1}
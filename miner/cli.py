@@ -0,0 +1,62 @@
+import argparse
+import logging
+
+from .saves import audit_journal
+from .controls import ScriptedInput
+from .simulation import run_headless, run_replay, soak_actions
+from .server import run_load_test, run_server
+from .economy import run_economy
+from .world import OreID, Ores
+from .ui import App
+
+
+def main(started=None):
+    parser = argparse.ArgumentParser(description="Epic Alien Miner Duck In Space")
+    parser.add_argument("--headless", action="store_true", help="run the simulation without a window")
+    parser.add_argument("--ticks", type=int, default=10000, help="ticks to run headless")
+    parser.add_argument("--seed", type=int, default=0, help="world seed for headless runs")
+    parser.add_argument("--audit", metavar="SAVE_DIR", help="summarise the edit journal of a save")
+    parser.add_argument("--record", metavar="PATH", help="record the input of this session")
+    parser.add_argument("--replay", metavar="PATH", help="replay a recorded session headless")
+    parser.add_argument("--lighting", action="store_true", help="update lighting in headless runs")
+    parser.add_argument("--profile", metavar="PATH", help="time every frame into a .csv or .json file (F3 shows the overlay)")
+    parser.add_argument("--serve", type=int, metavar="PORT", help="host a multiplayer world of --seed on this port")
+    parser.add_argument("--host", default="127.0.0.1", help="address --serve listens on, 0.0.0.0 for LAN play (no authentication)")
+    parser.add_argument("--connect", metavar="HOST:PORT", help="join a multiplayer server")
+    parser.add_argument("--load-test", type=int, metavar="BOTS", help="time a local server against scripted clients for --ticks")
+    parser.add_argument("--economy", type=int, metavar="GAMES", help="play GAMES seeded bot games of --ticks and report the economy")
+    parser.add_argument("--ore-table", action="append", metavar="PATH", help="ore table for --economy, repeat to compare several")
+    parser.add_argument("--price", action="append", default=[], metavar="ORE=VALUE", help="price an ore differently in the --economy report")
+    parser.add_argument("--workers", type=int, help="processes for --economy (default: one per core)")
+    parser.add_argument("--report", metavar="PATH", help="also write the --economy report as JSON")
+    parser.add_argument("--debug", action="store_true", help="log debug messages")
+    args = parser.parse_args()
+    logging.basicConfig(
+        level=logging.DEBUG if args.debug else logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",  # Include timestamp, log level, and message
+        datefmt="%Y-%m-%d %H:%M:%S",  # Format for the timestamp
+    )
+    if args.audit:
+        audit_journal(args.audit)
+    elif args.replay:
+        run_replay(args.replay, args.lighting, args.profile)
+    elif args.serve is not None:
+        run_server(args.seed, args.host, args.serve)
+    elif args.load_test is not None:
+        run_load_test(args.load_test, args.ticks, args.seed)
+    elif args.economy is not None:
+        prices = None
+        if args.price:
+            prices = dict(Ores.BASE_VALUE)
+            for entry in args.price:
+                name, _, value = entry.partition("=")
+                prices[OreID[name.upper()]] = int(value)
+        run_economy(args.economy, args.ticks, args.ore_table or (None,), args.seed, args.workers, prices, args.report)
+    elif args.headless:
+        run_headless(ScriptedInput(soak_actions), args.seed, ticks=args.ticks, lighting=args.lighting, profile_path=args.profile)
+    else:
+        connect = None
+        if args.connect:
+            host, _, port = args.connect.rpartition(":")
+            connect = (host or "127.0.0.1", int(port))
+        App(args.record, started, args.profile, connect)
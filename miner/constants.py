@@ -0,0 +1,18 @@
+SCREEN_W, SCREEN_H = (128, 128)
+MAP_SIZE_BLOCKS_X, MAP_SIZE_BLOCKS_Y = 90, 150
+
+TRANSPARENT_COLOR = 2
+SCROLL_BORDER_X = 80
+SCROLL_BORDER_Y = 80
+TILE_FLOOR = (1, 0)
+TILE_SPAWN1 = (0, 1)
+TILE_SPAWN2 = (1, 1)
+TILE_SPAWN3 = (2, 1)
+WALL_TILE_X = 4
+VOID_TILE = (0,0)
+
+DARKNESS_SPRITES = [(0,104+y*8,8,8) for y in range(9)]
+
+TICK_RATE = 30  # Simulation ticks per second, pyxel's default frame rate
+TICK_TIME = 1 / TICK_RATE
+MAX_TICKS_PER_UPDATE = 4  # Catch-up limit after a slow frame
@@ -0,0 +1,157 @@
+import pyxel
+import struct
+
+from . import state
+
+
+class InputHandler:
+    def __init__(self, double_click_time=10, hold_time=5):
+        self.keys = {
+            "left": [pyxel.KEY_LEFT, pyxel.KEY_A, pyxel.GAMEPAD1_BUTTON_DPAD_LEFT],
+            "right": [pyxel.KEY_RIGHT, pyxel.KEY_D, pyxel.GAMEPAD1_BUTTON_DPAD_RIGHT],
+            "down": [pyxel.KEY_DOWN, pyxel.KEY_S, pyxel.GAMEPAD1_BUTTON_DPAD_DOWN],
+            "jump": [
+                pyxel.KEY_SPACE,
+                pyxel.KEY_W,
+                pyxel.GAMEPAD1_BUTTON_DPAD_UP,
+                pyxel.GAMEPAD1_BUTTON_A,
+            ],
+        }
+        self.states = {
+            key: {
+                "pressed": False,
+                "long_pressed": False,
+                "held": False,
+                "double_click": False,
+                "last_press_time": -double_click_time,
+            }
+            for key in self.keys
+        }
+        self.double_click_time = double_click_time
+        self.hold_time = hold_time
+        self.hold_counters = {key: 0 for key in self.keys}
+        self.tick = 0  # Updates seen, the clock for double clicks
+
+    def update(self):
+        self.apply(poll_actions(self.keys))
+
+    def apply(self, actions):
+        # actions maps every action to (pressed_now, held_now) for this tick
+        self.tick += 1
+        for action, (pressed_now, held_now) in actions.items():
+            # Double Click Detection
+            self.states[action]["double_click"] = False
+            if pressed_now:
+                if (
+                    self.tick - self.states[action]["last_press_time"]
+                    <= self.double_click_time
+                ):
+                    self.states[action]["double_click"] = True
+                self.states[action]["last_press_time"] = self.tick
+
+            # Holding Detection
+            if held_now:
+                self.hold_counters[action] += 1
+                self.states[action]["held"] = (
+                    self.hold_counters[action] >= self.hold_time
+                )
+            else:
+                self.hold_counters[action] = 0
+                self.states[action]["held"] = False
+
+            self.states[action]["pressed"] = pressed_now
+            self.states[action]["long_pressed"] = held_now
+
+    def is_pressed(self, action):
+        return self.states[action]["pressed"]
+
+    def is_long_pressed(self, action):
+        return self.states[action]["long_pressed"]
+
+    def is_held(self, action):
+        return self.states[action]["held"]
+
+    def is_double_click(self, action):
+        return self.states[action]["double_click"]
+
+# === Input Sources ===
+# The simulation only sees per-tick action snapshots, {action: (pressed, held)}.
+# A source hands them out tick by tick: from the keyboard, from a recording or
+# from a script. actions() returns None once the source has run out.
+ACTIONS = ("left", "right", "down", "jump")
+RECORDING_MAGIC = b"MINI"
+RECORDING_VERSION = 1
+RECORDING_HEADER = struct.Struct("<4sHqi")  # magic, version, seed, world height (-1 for endless)
+# After the header every tick is one byte: bit 2i is action i pressed, bit 2i+1 held
+
+def poll_actions(keys):
+    return {
+        action: (any(pyxel.btnp(k) for k in action_keys), any(pyxel.btn(k) for k in action_keys))
+        for action, action_keys in keys.items()
+    }
+
+def pack_actions(actions):
+    bits = 0
+    for i, action in enumerate(ACTIONS):
+        pressed, held = actions.get(action, (False, False))
+        bits |= (pressed << 2 * i) | (held << 2 * i + 1)
+    return bits
+
+def unpack_actions(bits):
+    return {action: (bool(bits >> 2 * i & 1), bool(bits >> 2 * i + 1 & 1)) for i, action in enumerate(ACTIONS)}
+
+class LiveInput:
+    # The keyboard and gamepad, through pyxel
+    def actions(self, tick):
+        return poll_actions(state.input.keys)
+
+class ScriptedInput:
+    # A bot: script(tick) returns the actions of that tick
+    def __init__(self, script, ticks=None):
+        self.script = script
+        self.ticks = ticks
+
+    def actions(self, tick):
+        if self.ticks is not None and tick >= self.ticks:
+            return None
+        return self.script(tick)
+
+class RecordedInput:
+    # Plays back a recording made by InputRecorder, along with the world it was made in
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, version, self.seed, height = RECORDING_HEADER.unpack_from(data)
+        if magic != RECORDING_MAGIC:
+            raise ValueError(f"{path} is not an input recording")
+        if version != RECORDING_VERSION:
+            raise ValueError(f"{path} has recording version {version}, expected {RECORDING_VERSION}")
+        self.world_height = None if height < 0 else height
+        self.ticks = data[RECORDING_HEADER.size:]
+        self.decoded = [unpack_actions(bits) for bits in range(256)]
+
+    def __len__(self):
+        return len(self.ticks)
+
+    def actions(self, tick):
+        if tick >= len(self.ticks):
+            return None
+        return self.decoded[self.ticks[tick]]
+
+class InputRecorder:
+    # Writes the actions of every simulated tick, a byte each
+    def __init__(self, path, world):
+        self.file = open(path, "wb")
+        self.file.write(RECORDING_HEADER.pack(RECORDING_MAGIC, RECORDING_VERSION, world.seed,
+                                              -1 if world.height is None else world.height))
+        self.pending = bytearray()
+
+    def record(self, actions):
+        self.pending.append(pack_actions(actions))
+        if len(self.pending) >= 1024:
+            self.file.write(self.pending)
+            self.pending.clear()
+
+    def close(self):
+        self.file.write(self.pending)
+        self.file.close()
@@ -0,0 +1,206 @@
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from . import state
+from .constants import TICK_TIME
+from .saves import EDIT_PHYSICS, EDIT_PLAYER
+from .world import ORES_BY_CODE, OreID, Ores, load_ore_table
+from .simulation import Simulation
+
+# === Economy Simulator ===
+# Plays many seeded headless games with a mining bot and reports what the
+# economy looks like from the player's side: money per minute, ore found per
+# depth band and how long until each ore is first mined. The bot never
+# goes back to the shop: games only record ore counts, and money is what
+# the shop would pay for the ore mined each minute, worked out in the report
+# with the shop's own sale value, so other prices need no new games.
+# Games are independent, a process pool spreads them over cores.
+BOT_REACH = 12  # Blocks around the player the bot looks for ore in
+BOT_STUCK_TICKS = 20  # Ticks without moving before the bot jumps
+BOT_WANDER_TICKS = 90  # Ticks the bot keeps one direction while no ore is in reach
+BOT_RETARGET_TICKS = 15  # Ticks between looking for closer ore while the target is still there
+DEPTH_BAND = 16  # Rows per depth band in the report
+REPORT_BANDS = 10  # Bands below this many go together into the last one
+TICKS_PER_MINUTE = round(60 / TICK_TIME)
+ECONOMY_TICKS = 5 * TICKS_PER_MINUTE  # Length of a game
+TIERS = [ore_id for ore_id in OreID if ore_id != OreID.NONE]
+
+class MiningBot:
+    # Input source that plays like a greedy miner: always digs down, steers
+    # towards the nearest ore level with or below it, wanders from side to
+    # side when none is in reach and jumps when it has not moved for a while
+    def __init__(self, ticks=None):
+        self.ticks = ticks
+        self.held = set()
+        self.position = None
+        self.still = 0
+        self.goal = None
+
+    def target(self, x, y):
+        best = None
+        for ore_id in TIERS:
+            for ore_x, ore_y in state.ore_handler.index.within(ore_id, x, y, BOT_REACH):
+                if ore_y >= y:
+                    candidate = ((ore_x - x) ** 2 + (ore_y - y) ** 2, ore_y, ore_x)
+                    if best is None or candidate < best:
+                        best = candidate
+                    break  # Nearest first, the rest of this ore is further away
+        return None if best is None else (best[2], best[1])
+
+    def actions(self, tick):
+        if self.ticks is not None and tick >= self.ticks:
+            return None
+        player = state.player
+        x, y = (player.x + 4) // 8, (player.y + 4) // 8
+        goal = self.goal
+        if goal is None or tick % BOT_RETARGET_TICKS == 0 or state.ore_handler.ores.get(*goal) == OreID.NONE.value:
+            goal = self.goal = self.target(x, y)
+        target = goal
+        held = {"down"}
+        if player.x % 8 and not player.is_falling and not state.blocks_handler.is_solid(x, y + 1):
+            # Standing across two columns with the hole under the middle one
+            # dug, step over the other one so digging down carries on there
+            held.add("right" if player.x % 8 < 4 else "left")
+        elif target is None:
+            held.add("left" if tick // BOT_WANDER_TICKS % 2 else "right")
+        elif target[0] != x:
+            held.add("left" if target[0] < x else "right")
+        if (player.x, player.y) == self.position:
+            self.still += 1
+        else:
+            self.position, self.still = (player.x, player.y), 0
+        if self.still >= BOT_STUCK_TICKS:
+            held.add("jump")
+            self.still = 0
+        actions = {action: (action in held and action not in self.held, action in held) for action in ("left", "right", "down", "jump")}
+        self.held = held
+        return actions
+
+class EconomyTally:
+    # Stands in for the edit journal during a game: blocks dug and ores mined
+    # per depth band, ores mined per game minute and the first tick of each
+    # ore. Cells moved by the physics were not dug and are left out.
+    def __init__(self):
+        self.tick = 0
+        self.dug = {}  # Depth band -> blocks dug
+        self.yields = {}  # Depth band -> {ore name: mined}
+        self.minutes = []  # Minute -> {ore name: mined}
+        self.first = {}  # Ore name -> tick first mined
+
+    def record(self, x, y, old_block, new_block, ore=OreID.NONE.value, kind=EDIT_PLAYER):
+        if kind == EDIT_PHYSICS:
+            return
+        band = min(y // DEPTH_BAND, REPORT_BANDS)
+        if ore != OreID.NONE.value:
+            name = ORES_BY_CODE[ore].name
+            found = self.yields.setdefault(band, {})
+            found[name] = found.get(name, 0) + 1
+            minute = self.tick // TICKS_PER_MINUTE
+            while len(self.minutes) <= minute:
+                self.minutes.append({})
+            self.minutes[minute][name] = self.minutes[minute].get(name, 0) + 1
+            self.first.setdefault(name, self.tick)
+        elif old_block != new_block:
+            self.dug[band] = self.dug.get(band, 0) + 1
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+ore_tables = {}  # Path -> rules, loaded once per worker process
+
+def play_game(seed, ticks=ECONOMY_TICKS, table_path=None):
+    # One game from a fresh simulation, the result is plain data for the report
+    if table_path is not None and table_path not in ore_tables:
+        ore_tables[table_path] = load_ore_table(table_path)
+    simulation = Simulation(seed, lighting=False, ore_table=ore_tables.get(table_path))
+    tally = state.journal = EconomyTally()
+    simulation.run(MiningBot(ticks))
+    state.journal = None
+    minutes = tally.minutes + [{} for _ in range(-(-ticks // TICKS_PER_MINUTE) - len(tally.minutes))]
+    return {"seed": seed, "table": table_path, "ticks": ticks, "depth": state.player.y // 8,
+            "dug": tally.dug, "yields": tally.yields, "minutes": minutes, "first": tally.first}
+
+def play_job(job):
+    logging.getLogger().setLevel(logging.WARNING)
+    return play_game(*job)
+
+def run_games(games, ticks=ECONOMY_TICKS, tables=(None,), seed=0, workers=None):
+    # Every table plays the same seeds, so differences between them come from
+    # the table and not from the worlds drawn. Jobs go to the workers in
+    # batches to keep the overhead per game small.
+    jobs = [(seed + game, ticks, table) for table in tables for game in range(games)]
+    workers = os.cpu_count() or 1 if workers is None else workers
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(play_job, jobs, chunksize=max(1, len(jobs) // (workers * 8))))
+    return [play_job(job) for job in jobs]
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)] if values else None
+
+def summarize(results, prices=None):
+    # Report per ore table: money per minute, yield per depth band and time to every tier
+    report = {}
+    for table in dict.fromkeys(result["table"] for result in results):
+        games = [result for result in results if result["table"] == table]
+        minutes = len(games[0]["minutes"])
+        money = [[Ores.get_sale_value({OreID[name]: count for name, count in minute.items()}, prices) for minute in game["minutes"]] for game in games]
+        bands = sorted({band for game in games for band in game["dug"]} | {band for game in games for band in game["yields"]})
+        yields = {}
+        for band in bands:
+            dug = sum(game["dug"].get(band, 0) for game in games)
+            found = {ore_id.name: sum(game["yields"].get(band, {}).get(ore_id.name, 0) for game in games) for ore_id in TIERS}
+            rows = f"{band * DEPTH_BAND}+" if band == REPORT_BANDS else f"{band * DEPTH_BAND}-{(band + 1) * DEPTH_BAND - 1}"
+            yields[rows] = {"dug": dug, **{name: count / dug if dug else 0.0 for name, count in found.items()}}
+        tiers = {}
+        for ore_id in TIERS:
+            seconds = [game["first"][ore_id.name] * TICK_TIME for game in games if ore_id.name in game["first"]]
+            tiers[ore_id.name] = {"reached": len(seconds) / len(games), "p50": percentile(seconds, 0.5), "p90": percentile(seconds, 0.9)}
+        totals = [sum(game) for game in money]
+        report["default" if table is None else table] = {
+            "games": len(games),
+            "money_per_minute": sum(totals) / len(games) / (games[0]["ticks"] / TICKS_PER_MINUTE),
+            "money_per_minute_p10": percentile(totals, 0.1) / (games[0]["ticks"] / TICKS_PER_MINUTE),
+            "money_per_minute_p90": percentile(totals, 0.9) / (games[0]["ticks"] / TICKS_PER_MINUTE),
+            "money_by_minute": [sum(game[minute] for game in money) / len(games) for minute in range(minutes)],
+            "depth_p50": percentile([game["depth"] for game in games], 0.5),
+            "yield_per_block": yields,
+            "time_to_tier": tiers,
+        }
+    return report
+
+def print_report(report):
+    for table, entry in report.items():
+        print(f"== {table}: {entry['games']} games ==")
+        print(f"money per minute {entry['money_per_minute']:.0f} mean, {entry['money_per_minute_p10']:.0f} p10, "
+              f"{entry['money_per_minute_p90']:.0f} p90, median depth {entry['depth_p50']} rows")
+        print("by minute " + " ".join(f"{money:.0f}" for money in entry["money_by_minute"]))
+        print(f"{'rows':>9} {'dug':>8}" + "".join(f"{ore_id.name.lower():>10}" for ore_id in TIERS) + "  (ore per block dug)")
+        for band, found in entry["yield_per_block"].items():
+            print(f"{band:>9} {found['dug']:>8}" + "".join(f"{found[ore_id.name]:>10.4f}" for ore_id in TIERS))
+        for name, tier in entry["time_to_tier"].items():
+            if tier["p50"] is None:
+                print(f"{name.lower():>9} never reached")
+            else:
+                print(f"{name.lower():>9} reached in {tier['reached']:.0%} of games, {tier['p50']:.0f}s p50, {tier['p90']:.0f}s p90")
+
+def run_economy(games=1000, ticks=ECONOMY_TICKS, tables=(None,), seed=0, workers=None, prices=None, report_path=None):
+    logging.getLogger().setLevel(logging.WARNING)
+    start = time.perf_counter()
+    results = run_games(games, ticks, tables, seed, workers)
+    elapsed = time.perf_counter() - start
+    report = summarize(results, prices)
+    print_report(report)
+    print(f"{len(results)} games of {ticks} ticks in {elapsed:.1f}s ({len(results) / elapsed:.1f} games/s, "
+          f"{len(results) * ticks / elapsed:.0f} ticks/s)")
+    if report_path is not None:
+        with open(report_path, "w") as f:
+            json.dump(report, f, indent=1)
+    return report
@@ -0,0 +1,315 @@
+import pyxel
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # The web build runs without numpy, fall back to pure Python
+    np = None
+
+from . import state
+from .constants import TRANSPARENT_COLOR
+from .world import CHUNK_MASK, CHUNK_SHIFT, LAYER_BLOCKS, SOLID_BY_CODE, SOLID_CODES_NP
+
+def entity_area(entity, w=8, h=8):
+    return (entity.x, entity.y, entity.x + w - 1, entity.y + h - 1)
+
+def update_entities(targets=None):
+    # Enemies chase the nearest of targets, (x, y) player positions, by
+    # default the one player in the state module
+    if targets is None:
+        targets = [(state.player.x, state.player.y)]
+    if state.paths is not None and state.enemies.handles:
+        state.paths.steer(state.enemies, targets)
+    state.enemies.update(state.blocks_handler.world)
+    state.enemies.cleanup()
+
+SPATIAL_CELL_SIZE = 32  # Pixels per side of a spatial hash cell, 4 blocks
+
+class SpatialHash:
+    # Uniform grid broad phase over world pixels. Items register with an
+    # inclusive (x1, y1, x2, y2) area and land in every cell it touches, so
+    # an overlap query only looks at the few cells around it no matter how
+    # many zones or entities the world holds.
+    def __init__(self, cell_size=SPATIAL_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}  # (cell_x, cell_y) -> dict used as an ordered set of items
+        self.item_cells = {}  # item -> range of cells it is registered in
+
+    def __len__(self):
+        return len(self.item_cells)
+
+    def __contains__(self, item):
+        return item in self.item_cells
+
+    def cell_range(self, area):
+        (x1, y1, x2, y2) = area
+        size = self.cell_size
+        return (int(x1) // size, int(y1) // size, int(x2) // size, int(y2) // size)
+
+    def insert(self, item, area):
+        cells = self.cell_range(area)
+        self.item_cells[item] = cells
+        (cx1, cy1, cx2, cy2) = cells
+        for cy in range(cy1, cy2 + 1):
+            for cx in range(cx1, cx2 + 1):
+                self.cells.setdefault((cx, cy), {})[item] = None
+
+    def remove(self, item):
+        cells = self.item_cells.pop(item, None)
+        if cells is None:
+            return
+        (cx1, cy1, cx2, cy2) = cells
+        for cy in range(cy1, cy2 + 1):
+            for cx in range(cx1, cx2 + 1):
+                bucket = self.cells[(cx, cy)]
+                del bucket[item]
+                if not bucket:
+                    del self.cells[(cx, cy)]
+
+    def move(self, item, area):
+        # Most moves stay inside the same cells and cost a single comparison
+        if self.item_cells.get(item) == self.cell_range(area):
+            return
+        self.remove(item)
+        self.insert(item, area)
+
+    def query(self, area):
+        # Items whose cells overlap the area, each once, callers do the exact test
+        (cx1, cy1, cx2, cy2) = self.cell_range(area)
+        if cx1 == cx2 and cy1 == cy2:
+            return list(self.cells.get((cx1, cy1), ()))
+        found = {}
+        for cy in range(cy1, cy2 + 1):
+            for cx in range(cx1, cx2 + 1):
+                bucket = self.cells.get((cx, cy))
+                if bucket:
+                    found.update(bucket)
+        return list(found)
+
+    def query_point(self, x, y):
+        return self.query((x, y, x, y))
+
+ENEMY_WALK_SPEED = 1
+ENEMY_FALL_SPEED = 2  # Divides 8, so falling enemies always land on a block line
+
+def store_field(name):
+    def get(handle):
+        return getattr(handle.store, name)[handle.slot]
+    def set(handle, value):
+        getattr(handle.store, name)[handle.slot] = value
+    return property(get, set)
+
+class EntityHandle:
+    # Thin view of one entity in an EntityStore, reads and writes go straight
+    # to the store's arrays. The slot follows the entity when the store
+    # compacts, a removed entity is left with slot -1.
+    __slots__ = ("store", "slot")
+
+    x = store_field("x")
+    y = store_field("y")
+    dx = store_field("dx")
+    dy = store_field("dy")
+    direction = store_field("direction")
+
+    def __init__(self, store, slot):
+        self.store = store
+        self.slot = slot
+
+    @property
+    def is_alive(self):
+        return self.slot >= 0 and self.store.alive[self.slot] != 0
+
+    @is_alive.setter
+    def is_alive(self, value):
+        self.store.alive[self.slot] = 1 if value else 0
+
+    def draw(self):
+        u = pyxel.frame_count // 4 % 2 * 8
+        w = 8 if self.direction > 0 else -8
+        pyxel.blt(self.x, self.y, 0, u, 24, w, 8, TRANSPARENT_COLOR)
+
+class EntityStore:
+    # Struct of arrays: every entity is a slot in a set of parallel typed
+    # arrays, and the systems below update all of them in one pass (as numpy
+    # views of the same memory when numpy is available). Entities walk along
+    # the ground, turn at walls and fall off ledges. Entities in chunks that
+    # are not loaded wait until their chunk comes back.
+    def __init__(self, index=None):
+        self.x = array("i")
+        self.y = array("i")
+        self.dx = array("i")
+        self.dy = array("i")
+        self.direction = array("b")
+        self.alive = array("B")
+        # Positions the spatial index last saw, so only entities that left their cells are moved
+        self.indexed_x = array("i")
+        self.indexed_y = array("i")
+        self.handles = []
+        self.index = SpatialHash() if index is None else index
+
+    def __len__(self):
+        return len(self.handles)
+
+    def __iter__(self):
+        return iter(list(self.handles))
+
+    def arrays(self):
+        return (self.x, self.y, self.dx, self.dy, self.direction, self.alive, self.indexed_x, self.indexed_y)
+
+    def spawn(self, x, y, direction=1, speed=ENEMY_WALK_SPEED):
+        handle = EntityHandle(self, len(self.handles))
+        for values, value in zip(self.arrays(), (x, y, direction * speed, 0, direction, 1, x, y)):
+            values.append(value)
+        self.handles.append(handle)
+        self.index.insert(handle, entity_area(handle))
+        return handle
+
+    def cleanup(self):
+        # Swap-and-pop from the highest dead slot down, the last slot is
+        # always alive by the time it fills a hole
+        alive = self.alive
+        if alive.count(0) == 0:
+            return
+        handles = self.handles
+        for slot in range(len(handles) - 1, -1, -1):
+            if alive[slot]:
+                continue
+            dead = handles[slot]
+            self.index.remove(dead)
+            last = len(handles) - 1
+            if slot != last:
+                for values in self.arrays():
+                    values[slot] = values[last]
+                handles[slot] = handles[last]
+                handles[slot].slot = slot
+            for values in self.arrays():
+                values.pop()
+            handles.pop()
+            dead.slot = -1
+
+    def update(self, world, use_numpy=None):
+        if use_numpy is None:
+            use_numpy = np is not None
+        if use_numpy:
+            self.update_numpy(world)
+        else:
+            self.update_python(world)
+
+    def update_python(self, world):
+        x, y, dx, dy, direction, alive = self.x, self.y, self.dx, self.dy, self.direction, self.alive
+        chunks, width, height = world.chunks, world.width, world.height
+        index, handles = self.index, self.handles
+
+        def solid(bx, by):
+            # True or False, None while the block's chunk is not loaded. The
+            # map sides and bottom count as walls, above the map is open.
+            if bx < 0 or bx >= width or (height is not None and by >= height):
+                return True
+            if by < 0:
+                return False
+            chunk = chunks.get(by >> CHUNK_SHIFT)
+            if chunk is None:
+                return None
+            return SOLID_BY_CODE[chunk.layers[LAYER_BLOCKS][(by & CHUNK_MASK) * width + bx]]
+
+        for i in range(len(handles)):
+            if not alive[i]:
+                continue
+            ex, ey = x[i], y[i]
+            if ey & 7:
+                y[i] = ey + dy[i]
+            else:
+                ground_left = solid(ex >> 3, (ey >> 3) + 1)
+                ground_right = solid((ex + 7) >> 3, (ey >> 3) + 1)
+                if ground_left is None or ground_right is None:
+                    continue
+                if not (ground_left or ground_right):
+                    dy[i] = ENEMY_FALL_SPEED
+                    y[i] = ey + ENEMY_FALL_SPEED
+                else:
+                    dy[i] = 0
+                    step = dx[i]
+                    blocked = solid((ex + 7 + step) >> 3 if step > 0 else (ex + step) >> 3, ey >> 3)
+                    if blocked is None:
+                        continue
+                    if blocked:
+                        dx[i] = -step
+                        direction[i] = -direction[i]
+                    else:
+                        x[i] = ex + step
+            index.move(handles[i], entity_area(handles[i]))
+        self.indexed_x[:] = x
+        self.indexed_y[:] = y
+
+    def solid_numpy(self, world, bx, by):
+        # Vectorised solid(): returns (solid, loaded) boolean arrays
+        width, height = world.width, world.height
+        solid = np.ones(len(bx), dtype=bool)
+        loaded = np.ones(len(bx), dtype=bool)
+        inside = (bx >= 0) & (bx < width)
+        if height is not None:
+            inside &= by < height
+        solid[inside & (by < 0)] = False
+        inside &= by >= 0
+        loaded[inside] = False
+        cy = by >> CHUNK_SHIFT
+        for c in np.unique(cy[inside]):
+            chunk = world.chunks.get(int(c))
+            if chunk is None:
+                continue
+            mask = inside & (cy == c)
+            cells = np.frombuffer(chunk.layers[LAYER_BLOCKS], dtype=np.uint8)
+            solid[mask] = SOLID_CODES_NP[cells[(by[mask] & CHUNK_MASK) * width + bx[mask]]]
+            loaded[mask] = True
+        return solid, loaded
+
+    def update_numpy(self, world):
+        if not self.handles:
+            return
+        x = np.frombuffer(self.x, dtype=np.intc)
+        y = np.frombuffer(self.y, dtype=np.intc)
+        dx = np.frombuffer(self.dx, dtype=np.intc)
+        dy = np.frombuffer(self.dy, dtype=np.intc)
+        direction = np.frombuffer(self.direction, dtype=np.int8)
+        alive = np.frombuffer(self.alive, dtype=np.uint8) != 0
+        indexed_x = np.frombuffer(self.indexed_x, dtype=np.intc)
+        indexed_y = np.frombuffer(self.indexed_y, dtype=np.intc)
+
+        aligned = alive & ((y & 7) == 0)
+        mid_fall = alive & ~aligned
+        y[mid_fall] += dy[mid_fall]
+
+        row = (y >> 3) + 1
+        ground_left, loaded_left = self.solid_numpy(world, x >> 3, row)
+        ground_right, loaded_right = self.solid_numpy(world, (x + 7) >> 3, row)
+        settled = aligned & loaded_left & loaded_right
+        ground = ground_left | ground_right
+
+        fall = settled & ~ground
+        dy[fall] = ENEMY_FALL_SPEED
+        y[fall] += ENEMY_FALL_SPEED
+
+        walk = settled & ground
+        dy[walk] = 0
+        ahead = np.where(dx > 0, (x + 7 + dx) >> 3, (x + dx) >> 3)
+        blocked, loaded_ahead = self.solid_numpy(world, ahead, y >> 3)
+        walk &= loaded_ahead
+        turn = walk & blocked
+        dx[turn] = -dx[turn]
+        direction[turn] = -direction[turn]
+        step = walk & ~blocked
+        x[step] += dx[step]
+
+        # Only entities that crossed a cell line go back to the spatial index
+        size = self.index.cell_size
+        moved = ((x // size != indexed_x // size) | ((x + 7) // size != (indexed_x + 7) // size)
+                 | (y // size != indexed_y // size) | ((y + 7) // size != (indexed_y + 7) // size))
+        for i in np.flatnonzero(moved).tolist():
+            handle = self.handles[i]
+            self.index.move(handle, entity_area(handle))
+        indexed_x[:] = x
+        indexed_y[:] = y
+
+    def draw(self, area):
+        for handle in self.index.query(area):
+            handle.draw()
@@ -0,0 +1,435 @@
+import pyxel
+import logging
+
+from . import state
+from .constants import SCREEN_H, SCREEN_W, TRANSPARENT_COLOR
+from .world import (
+    BLOCKS_BY_CODE,
+    BlockID,
+    Blocks,
+    CHUNK_MASK,
+    CHUNK_SHIFT,
+    CHUNK_SIZE,
+    LAYER_BLOCKS,
+    LAYER_ORES,
+    ORES_BY_CODE,
+    OreID,
+    Ores,
+    SOLID_BY_CODE,
+)
+from .physics import destroy_block
+from .entities import SpatialHash
+from .lighting import LightEmitter, SHOP_LIGHT
+
+class InventoryHandler:
+    def __init__(self):
+        self.ores = {}  # Dictionary to store mined ores and their count
+        self.player_money = 0
+
+    def collect_ore(self, ore_id):
+        if ore_id != OreID.NONE:
+            if ore_id in self.ores:
+                self.ores[ore_id] += 1
+            else:
+                self.ores[ore_id] = 1  # First time collecting this ore
+
+    def add_money(self, amount):
+        self.player_money+=amount
+    def clear(self):
+        self.ores = {}
+    def get_inventory(self):
+        return self.ores  # Returns only mined ores
+
+    def draw_ui(self):
+        y_offset = 1
+        x_offset = 5
+        for ore, count in self.get_inventory().items():
+            ore_name = ore.name.capitalize()
+            ore_ui_sprite = Ores.get_ui_sprite(ore)
+            pyxel.blt(state.scroll_x+ x_offset,state.scroll_y + y_offset,0, *ore_ui_sprite, TRANSPARENT_COLOR)
+            pyxel.text(state.scroll_x+x_offset+9, state.scroll_y+y_offset, f"x{count}", 7)
+            x_offset += 16  # Move down for next item
+        pyxel.text(state.scroll_x+SCREEN_W-20, state.scroll_y, f"{self.player_money}$",7)
+
+class MiningHelper:
+    def __init__(self, required_hits=45):
+        self.current_block = None  # Track only one mined block
+        self.mining_hits = 0
+        self.required_hits = required_hits
+
+    def mine(self, x, y):
+        block_pos = (x, y)
+
+        if self.current_block != block_pos:
+            self.current_block = block_pos
+            self.mining_hits = 0  # Reset progress when switching blocks
+
+        self.mining_hits += 100
+
+        if self.mining_hits >= self.required_hits:
+            destroy_block(block_pos[0], block_pos[1])
+            self.current_block = None
+            self.mining_hits = 0
+
+    def draw(self):
+        if not self.current_block:
+            return
+        x, y = self.current_block[0] * 8, self.current_block[1] * 8
+        progress = self.mining_hits / self.required_hits
+
+        # Define the number of dots for the rectangle's perimeter
+        total_dots = 32  # 8 dots per side for an 8x8 block
+
+        # Calculate the number of filled dots based on progress
+        filled_dots = int(total_dots * progress)
+
+        # Draw top side
+        for i in range(8):
+            if i < filled_dots:
+                pyxel.pset(x + i, y - 1, 7)  # Filled dot
+            else:
+                pyxel.pset(x + i, y - 1, 13)  # Unfilled dot
+
+        # Draw right side
+        for i in range(8):
+            if 8 + i < filled_dots:
+                pyxel.pset(x + 8, y + i, 7)  # Filled dot
+            else:
+                pyxel.pset(x + 8, y + i, 13)  # Unfilled dot
+
+        # Draw bottom side
+        for i in range(8):
+            if 16 + i < filled_dots:
+                pyxel.pset(x + 7 - i, y + 8, 7)  # Filled dot
+            else:
+                pyxel.pset(x + 7 - i, y + 8, 13)  # Unfilled dot
+
+        # Draw left side
+        for i in range(8):
+            if 24 + i < filled_dots:
+                pyxel.pset(x - 1, y + 7 - i, 7)  # Filled dot
+            else:
+                pyxel.pset(x - 1, y + 7 - i, 13)  # Unfilled dot
+
+    def reset(self):
+        self.current_block = None
+        self.mining_hits = 0
+
+ORE_BUCKET_SIZE = 16  # Blocks per side of the ore index buckets, divides CHUNK_SIZE
+
+class OreIndex:
+    # Block positions of every ore in the loaded chunks, bucketed per ore into
+    # squares of ORE_BUCKET_SIZE blocks, so a query only visits the buckets in
+    # its reach instead of scanning the map. Chunks are indexed as they load and
+    # dropped as they are evicted, single cells are kept up to date by
+    # OresHandler.destroy_ore.
+    def __init__(self, world):
+        self.world = world
+        self.buckets: dict[OreID, dict[tuple[int, int], set[tuple[int, int]]]] = {ore_id: {} for ore_id in OreID if ore_id != OreID.NONE}
+        world.add_listener(self)
+
+    def add(self, x, y, ore_id):
+        self.buckets[ore_id].setdefault((x // ORE_BUCKET_SIZE, y // ORE_BUCKET_SIZE), set()).add((x, y))
+
+    def remove(self, x, y, ore_id):
+        buckets = self.buckets[ore_id]
+        key = (x // ORE_BUCKET_SIZE, y // ORE_BUCKET_SIZE)
+        bucket = buckets.get(key)
+        if bucket is None:
+            return
+        bucket.discard((x, y))
+        if not bucket:
+            del buckets[key]
+
+    def total(self, ore_id):
+        return sum(len(bucket) for bucket in self.buckets[ore_id].values())
+
+    def count(self, ore_id, y0, y1):
+        # Ore left in the rows y0..y1-1 of the loaded chunks
+        found = 0
+        for (bucket_x, bucket_y), bucket in self.buckets[ore_id].items():
+            top = bucket_y * ORE_BUCKET_SIZE
+            if top >= y1 or top + ORE_BUCKET_SIZE <= y0:
+                continue
+            if y0 <= top and top + ORE_BUCKET_SIZE <= y1:
+                found += len(bucket)
+            else:
+                found += sum(1 for x, y in bucket if y0 <= y < y1)
+        return found
+
+    def within(self, ore_id, x, y, radius):
+        # Positions at most radius blocks away, nearest first
+        buckets = self.buckets[ore_id]
+        found = []
+        for bucket_y in range((y - radius) // ORE_BUCKET_SIZE, (y + radius) // ORE_BUCKET_SIZE + 1):
+            for bucket_x in range((x - radius) // ORE_BUCKET_SIZE, (x + radius) // ORE_BUCKET_SIZE + 1):
+                for ore_x, ore_y in buckets.get((bucket_x, bucket_y), ()):
+                    distance = (ore_x - x) ** 2 + (ore_y - y) ** 2
+                    if distance <= radius * radius:
+                        found.append((distance, ore_x, ore_y))
+        found.sort()
+        return [(ore_x, ore_y) for _, ore_x, ore_y in found]
+
+    def nearest(self, ore_id, x, y, max_distance=None):
+        # Closest position of the ore, or None. Buckets are visited by their
+        # distance to (x, y) and the search ends at the first bucket that
+        # cannot hold anything closer than the best found so far.
+        order = []
+        for (bucket_x, bucket_y), bucket in self.buckets[ore_id].items():
+            left, top = bucket_x * ORE_BUCKET_SIZE, bucket_y * ORE_BUCKET_SIZE
+            dx = max(left - x, 0, x - (left + ORE_BUCKET_SIZE - 1))
+            dy = max(top - y, 0, y - (top + ORE_BUCKET_SIZE - 1))
+            order.append((dx * dx + dy * dy, bucket))
+        order.sort(key=lambda entry: entry[0])
+        best = None  # (distance squared, y, x), ties go to the topmost then leftmost
+        limit = float("inf") if max_distance is None else max_distance * max_distance
+        for bucket_distance, bucket in order:
+            if bucket_distance > limit:
+                break
+            for ore_x, ore_y in bucket:
+                candidate = ((ore_x - x) ** 2 + (ore_y - y) ** 2, ore_y, ore_x)
+                if candidate[0] <= limit and (best is None or candidate < best):
+                    best, limit = candidate, candidate[0]
+        return None if best is None else (best[2], best[1])
+
+    def on_chunk_loaded(self, world, chunk):
+        none = OreID.NONE.value
+        y0 = chunk.cy * CHUNK_SIZE
+        with memoryview(chunk.layers[LAYER_ORES]) as cells:
+            for i, code in enumerate(cells):
+                if code != none:
+                    y, x = divmod(i, world.width)
+                    self.add(x, y0 + y, ORES_BY_CODE[code])
+
+    def on_chunk_evicted(self, world, chunk):
+        y0, y1 = world.chunk_rows(chunk.cy)
+        for buckets in self.buckets.values():
+            for key in [key for key in buckets if y0 <= key[1] * ORE_BUCKET_SIZE < y1]:
+                del buckets[key]
+
+class OresHandler:
+    def __init__(self, world):
+        self.world = world
+        self.ores = world.ores
+        self.index = OreIndex(world)
+    def get_ore_id(self, x, y):
+        return ORES_BY_CODE[self.ores.get(x, y, OreID.NONE.value)]
+
+    def destroy_ore(self, x, y):
+        ore_id = self.get_ore_id(x, y)
+        if not ore_id == OreID.NONE:
+            state.inventory_handler.collect_ore(ore_id)
+            self.index.remove(x, y, ore_id)
+            if state.journal is not None:
+                block = self.world.blocks.get(x, y)
+                state.journal.record(x, y, block, block, ore_id.value)
+        self.ores.set(x, y, OreID.NONE.value)
+        state.blocks_handler.mark_dirty(x, y)
+
+# === Block Map Handler ===
+class BlocksHandler:
+    def __init__(self, world):
+        self.world = world
+        self.blocks = world.blocks
+        self.variants = world.variants
+        # Off-screen terrain images per chunk row, with the cells to redraw in them
+        self.chunk_images: dict[int, pyxel.Image] = {}
+        self.dirty_cells: dict[int, set[tuple[int, int]]] = {}
+        world.add_listener(self)
+
+    def destroy_block(self, block_x, block_y):
+        if not self.is_in_range(block_x, block_y):
+            return
+        self.set_block(block_x, block_y, BlockID.AIR)
+        state.ore_handler.destroy_ore(block_x, block_y)
+
+    def is_solid(self, block_x, block_y) -> bool:
+        world = self.world
+        if not world.in_range(block_x, block_y):
+            return False
+        chunk = world.chunk(block_y >> CHUNK_SHIFT)
+        return SOLID_BY_CODE[chunk.layers[LAYER_BLOCKS][(block_y & CHUNK_MASK) * world.width + block_x]]
+
+    def any_solid(self, x1, y1, x2, y2):
+        # Whether any block in the inclusive rectangle is solid, outside the map counts as empty
+        world = self.world
+        x1, x2, y1 = max(x1, 0), min(x2, world.width - 1), max(y1, 0)
+        if world.height is not None:
+            y2 = min(y2, world.height - 1)
+        if x1 > x2:
+            return False
+        for y in range(y1, y2 + 1):
+            start = (y & CHUNK_MASK) * world.width
+            for code in world.chunk(y >> CHUNK_SHIFT).layers[LAYER_BLOCKS][start + x1:start + x2 + 1]:
+                if SOLID_BY_CODE[code]:
+                    return True
+        return False
+
+    def is_in_range(self, block_x, block_y):
+        return self.world.in_range(block_x, block_y)
+
+    def set_block(self, block_x, block_y, block_id):
+        if not self.is_in_range(block_x, block_y):
+            return
+        if state.journal is not None:
+            state.journal.record(block_x, block_y, self.blocks.get(block_x, block_y), block_id.value)
+        self.blocks.set(block_x, block_y, block_id.value)
+        self.mark_dirty(block_x, block_y)
+        if state.darkness_system is not None:
+            state.darkness_system.on_block_changed(block_x, block_y)
+        if state.cave_regions is not None:
+            state.cave_regions.on_block_changed(block_x, block_y)
+        if state.paths is not None:
+            state.paths.graph.on_block_changed(block_x, block_y)
+        if state.cells is not None:
+            state.cells.on_block_changed(block_x, block_y)
+
+    def get_block_id(self, block_x, block_y):
+        return BLOCKS_BY_CODE[self.blocks.get(block_x, block_y, BlockID.AIR.value)]
+
+    def get_block_image(self, block_x, block_y):
+        block_id = self.get_block_id(block_x, block_y)
+        return Blocks.get_texture(block_id)
+
+    def draw(self):
+        # The terrain is pre-rendered per chunk, so a frame is one blit per chunk in view
+        world = self.world
+        left, right = max(state.scroll_x, 0), min(state.scroll_x + SCREEN_W, world.width * 8)
+        top, bottom = max(state.scroll_y, 0), state.scroll_y + SCREEN_H
+        if world.height is not None:
+            bottom = min(bottom, world.height * 8)
+        if left >= right or top >= bottom:
+            return
+
+        chunk_px = CHUNK_SIZE * 8
+        for cy in range(top // chunk_px, (bottom - 1) // chunk_px + 1):
+            image = self.chunk_image(cy)
+            chunk_top = cy * chunk_px
+            v0, v1 = max(top, chunk_top), min(bottom, chunk_top + image.height)
+            pyxel.blt(left - state.scroll_x, v0 - state.scroll_y, image, left, v0 - chunk_top, right - left, v1 - v0)
+
+    def chunk_image(self, cy):
+        image = self.chunk_images.get(cy)
+        if image is None:
+            y0, y1 = self.world.chunk_rows(cy)
+            image = self.chunk_images[cy] = pyxel.Image(self.world.width * 8, (y1 - y0) * 8)
+            for block_y in range(y0, y1):
+                for block_x in range(self.world.width):
+                    self.draw_block(image, block_x, block_y)
+            self.dirty_cells.pop(cy, None)
+        else:
+            for block_x, block_y in self.dirty_cells.pop(cy, ()):
+                self.draw_block(image, block_x, block_y)
+        return image
+
+    def mark_dirty(self, block_x, block_y):
+        # Redraw the cell in its chunk image the next time that chunk is drawn
+        cy = block_y >> CHUNK_SHIFT
+        if cy in self.chunk_images:
+            self.dirty_cells.setdefault(cy, set()).add((block_x, block_y))
+
+    def draw_block(self, image, block_x, block_y):
+        block_image = self.get_block_image(block_x, block_y)
+
+        # Block position inside its chunk image
+        image_x = block_x * 8
+        image_y = (block_y & CHUNK_MASK) * 8
+        image.rect(image_x, image_y, 8, 8, 0)
+
+        # Include block variant:
+        variant_int = self.variants.get(block_x, block_y)
+        variant_x, variant_y = variant_int%2, variant_int//2
+        (img_u, img_v, img_w, img_h) = block_image
+        variant_block_image = (img_u + variant_x*8, img_v + variant_y*8, img_w, img_h)
+        image.blt(image_x, image_y, pyxel.images[0], *variant_block_image, TRANSPARENT_COLOR)
+
+        # Draw ore on block
+        ore_id = state.ore_handler.get_ore_id(block_x, block_y)
+        if ore_id != OreID.NONE:
+            ore_image = Ores.get_texture(ore_id)
+            image.blt(image_x, image_y, pyxel.images[0], *ore_image, TRANSPARENT_COLOR)
+
+    def on_chunk_loaded(self, world, chunk):
+        pass
+
+    def on_chunk_evicted(self, world, chunk):
+        self.chunk_images.pop(chunk.cy, None)
+        self.dirty_cells.pop(chunk.cy, None)
+
+
+def area_to_xywh(area):
+    (x1,y1,x2,y2) = area
+    return (x1, y1, x2-x1, y2-y1)
+
+class TriggerZone:
+    def __init__(self, x1, y1, x2, y2, color=1, is_invisible=False, light=0):
+        self.area = (x1, y1, x2, y2)
+        self.color = color
+        self.is_invisible = is_invisible
+        self.light = light
+        self.emitter = None  # Light emitter of a lit zone while it is added
+        self.slot = None  # Index in TriggerZonesHandler.trigger_zones
+
+
+    def draw(self):
+        if self.is_invisible:
+            return
+        xywh_area = area_to_xywh(self.area)
+        pyxel.rect(*xywh_area, self.color)
+
+    def is_in_area(self, object_coords):
+        (o_x, o_y) = object_coords
+        (x1, y1, x2, y2) = self.area
+        return x1 <= o_x <= x2 and y1 <= o_y <= y2
+
+    def trigger(self):
+        logging.info(f"TriggerZone: {self} triggered!")
+
+class ShopZone(TriggerZone):
+    def __init__(self, x1, y1, x2, y2, color=1, is_invisible=False, light=SHOP_LIGHT):
+        super().__init__(x1, y1, x2, y2, color, is_invisible, light)
+
+    def trigger(self):
+        super().trigger()
+        # Sell every ore
+        state.inventory_handler.add_money(Ores.get_sale_value(state.inventory_handler.get_inventory()))
+
+        # Clear ores:
+        state.inventory_handler.clear()
+
+class TriggerZonesHandler:
+    def __init__(self):
+        self.trigger_zones : list[TriggerZone] = []
+        self.zone_index = SpatialHash()
+        shop_zone : TriggerZone = ShopZone(0,0,40,16,2)
+        self.add_zone(shop_zone)
+
+    def add_zone(self, zone : TriggerZone):
+        zone.slot = len(self.trigger_zones)
+        self.trigger_zones.append(zone)
+        self.zone_index.insert(zone, zone.area)
+        if zone.light and state.darkness_system is not None:
+            (x1, y1, x2, y2) = zone.area
+            zone.emitter = state.darkness_system.add_emitter(LightEmitter((x1 + x2) // 16, (y1 + y2) // 16, zone.light))
+
+    def remove_zone(self, zone : TriggerZone):
+        # Swap-and-pop, zones are not kept in order
+        last = self.trigger_zones.pop()
+        if last is not zone:
+            self.trigger_zones[zone.slot] = last
+            last.slot = zone.slot
+        zone.slot = None
+        self.zone_index.remove(zone)
+        if zone.emitter is not None:
+            state.darkness_system.remove_emitter(zone.emitter)
+            zone.emitter = None
+
+    def check_zones_player(self):
+        for zone in self.zone_index.query_point(state.player.x, state.player.y):
+            zone : TriggerZone = zone
+            if zone.is_in_area((state.player.x,state.player.y)):
+                zone.trigger()
+
+    def draw_zones(self):
+        for zone in self.zone_index.query((state.scroll_x, state.scroll_y, state.scroll_x + SCREEN_W - 1, state.scroll_y + SCREEN_H - 1)):
+            zone.draw()
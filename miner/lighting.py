@@ -0,0 +1,357 @@
+import pyxel
+
+from . import state
+from .constants import DARKNESS_SPRITES, SCREEN_W, TRANSPARENT_COLOR
+from .world import BLOCKS_BY_CODE, BlockID, CHUNK_MASK, CHUNK_SHIFT, CHUNK_SIZE, LAYER_BLOCKS
+
+# Light lost per block crossed, in half light levels: open blocks let light through
+LIGHT_COST_BY_CODE = [1 if block_id in (BlockID.GRASS, BlockID.AIR, BlockID.MAGMA) else 4 for block_id in BLOCKS_BY_CODE]
+
+EMITTER_BUCKET_SIZE = 16  # Blocks per side of the emitter lookup buckets
+STALE_LIGHT = 255  # Marks combined light cells that have to be recomputed
+PLAYER_LIGHT = 9
+LAVA_LIGHT = 3
+LAVA_TILE = 8  # Blocks per side of the squares whose glowing lava shares one emitter
+SHOP_LIGHT = 6
+OVERLAY_BLOCKS = SCREEN_W // 8 + 1  # Blocks per side of the darkness overlay, covers any scroll offset
+DARKNESS_SUBDIVISION = 1  # Darkness cells per block side, 2 or 4 give a smoother gradient
+
+def propagate_light(blocks, origin_x, origin_y, budget, cells=((0, 0),)):
+    # Dijkstra over a bucket queue: costs are small integers, so each bucket
+    # holds the cells at one distance and every cell is settled exactly once.
+    # The light starts from every cell at an (x, y) offset in `cells` from the
+    # origin. Returns the light (in half levels) of the cells `budget` around
+    # their bounding box, row by row, which is the brightest any one of them
+    # gives.
+    radius = budget
+    size = max(dx for dx, dy in cells) + 1 + 2 * radius
+    rows = max(dy for dx, dy in cells) + 1 + 2 * radius
+    light_field = bytearray(size * rows)
+    settled = bytearray(len(light_field))
+    buckets = [[] for _ in range(budget)]
+    buckets[0].extend((radius + dy) * size + radius + dx for dx, dy in cells)
+    air = BlockID.AIR.value
+
+    for cost in range(budget):
+        for index in buckets[cost]:
+            if settled[index]:
+                continue
+            settled[index] = 1
+            light_field[index] = budget - cost
+
+            dy, dx = divmod(index, size)
+            next_cost = cost + LIGHT_COST_BY_CODE[blocks.get(origin_x + dx - radius, origin_y + dy - radius, air)]
+            if next_cost >= budget:
+                continue  # Neighbours would stay dark
+            # Cells closer than the budget never reach the field border
+            for neighbour in (index - 1, index + 1, index - size, index + size):
+                if not settled[neighbour]:
+                    buckets[next_cost].append(neighbour)
+    return light_field
+
+class LightEmitter:
+    # Lights from the cells at the (x, y) offsets in `cells` from (x, y): a
+    # single cell for most emitters, all glowing cells of a tile for lava
+    def __init__(self, x, y, light, cells=((0, 0),)):
+        self.x = x
+        self.y = y
+        self.light = light
+        self.cells = cells
+        self.width = max(dx for dx, dy in cells) + 1
+        self.height = max(dy for dx, dy in cells) + 1
+        self.radius = int(light * 2)
+        self.light_field = None  # Computed on demand, dropped when a block in reach changes
+
+    def bounds(self):
+        # Inclusive block rectangle the light reaches
+        radius = self.radius
+        return self.x - radius, self.y - radius, self.x + self.width - 1 + radius, self.y + self.height - 1 + radius
+
+    def covers(self, x, y):
+        x0, y0, x1, y1 = self.bounds()
+        return x0 <= x <= x1 and y0 <= y <= y1
+
+    def get_light(self, x, y):
+        # Light this emitter alone gives to (x, y), in half levels
+        x0, y0, x1, y1 = self.bounds()
+        if x0 <= x <= x1 and y0 <= y <= y1:
+            return self.light_field[(y - y0) * (x1 - x0 + 1) + x - x0]
+        return 0
+
+class DarknessSystem:
+    # World space light map lit by any number of emitters: the player, exposed
+    # lava, the shop and anything else added with add_emitter. Every emitter
+    # caches its own light field, and the combined light of a cell is cached per
+    # chunk until an emitter covering it moves or a block in its reach changes.
+    def __init__(self):
+        self.emitter_buckets: dict[tuple[int, int], list[LightEmitter]] = {}
+        self.max_reach = 0  # Furthest any emitter's light gets from its x, y
+        self.lava_emitters: dict[tuple[int, int], LightEmitter] = {}  # Lava tile -> emitter of its glowing cells
+        self.light_rows: dict[int, bytearray] = {}  # Chunk row -> combined light in half levels
+        self.player_emitter = None
+        self.version = 0  # Bumped whenever emitters or cached light rows go away or come in
+        # Composed darkness overlay, anchored at the top left block in view
+        self.subdivision = DARKNESS_SUBDIVISION
+        self.overlay = None
+        self.overlay_levels = None
+        self.overlay_origin = None
+
+    def bucket(self, x, y):
+        return (x // EMITTER_BUCKET_SIZE, y // EMITTER_BUCKET_SIZE)
+
+    def add_emitter(self, emitter, mark_stale=True):
+        self.emitter_buckets.setdefault(self.bucket(emitter.x, emitter.y), []).append(emitter)
+        self.max_reach = max(self.max_reach, emitter.radius + max(emitter.width, emitter.height) - 1)
+        self.version += 1
+        if mark_stale:
+            self.mark_stale(emitter)
+        return emitter
+
+    def remove_emitter(self, emitter, mark_stale=True):
+        key = self.bucket(emitter.x, emitter.y)
+        self.emitter_buckets[key].remove(emitter)
+        if not self.emitter_buckets[key]:
+            del self.emitter_buckets[key]
+        self.version += 1
+        if mark_stale:
+            self.mark_stale(emitter)
+
+    def move_emitter(self, emitter, x, y):
+        self.remove_emitter(emitter)
+        emitter.x, emitter.y = x, y
+        emitter.light_field = None
+        self.add_emitter(emitter)
+
+    def emitters_in(self, x0, y0, x1, y1):
+        # Emitters whose light rectangle overlaps the block rectangle
+        reach = self.max_reach
+        found = []
+        for bucket_y in range((y0 - reach) // EMITTER_BUCKET_SIZE, (y1 + reach) // EMITTER_BUCKET_SIZE + 1):
+            for bucket_x in range((x0 - reach) // EMITTER_BUCKET_SIZE, (x1 + reach) // EMITTER_BUCKET_SIZE + 1):
+                for emitter in self.emitter_buckets.get((bucket_x, bucket_y), ()):
+                    left, top, right, bottom = emitter.bounds()
+                    if right >= x0 and left <= x1 and bottom >= y0 and top <= y1:
+                        found.append(emitter)
+        return found
+
+    def light_row(self, cy):
+        row = self.light_rows.get(cy)
+        if row is None:
+            row = self.light_rows[cy] = bytearray([STALE_LIGHT]) * (state.blocks_handler.world.width * CHUNK_SIZE)
+        return row
+
+    def mark_stale(self, emitter):
+        width = state.blocks_handler.world.width
+        left, top, right, bottom = emitter.bounds()
+        x0, x1 = max(left, 0), min(right, width - 1)
+        if x0 > x1:
+            return
+        stale = bytes([STALE_LIGHT]) * (x1 - x0 + 1)
+        for y in range(max(top, 0), bottom + 1):
+            row = self.light_rows.get(y >> CHUNK_SHIFT)
+            if row is not None:
+                start = (y & CHUNK_MASK) * width
+                row[start + x0:start + x1 + 1] = stale
+
+    def update_lighting(self, world_player_x, world_player_y, base_light=PLAYER_LIGHT):
+        block_player_x, block_player_y = world_player_x//8, world_player_y//8
+        emitter = self.player_emitter
+        if emitter is None or emitter.light != base_light:
+            if emitter is not None:
+                self.remove_emitter(emitter)
+            self.player_emitter = self.add_emitter(LightEmitter(block_player_x, block_player_y, base_light))
+        elif (emitter.x, emitter.y) != (block_player_x, block_player_y):
+            self.move_emitter(emitter, block_player_x, block_player_y)
+
+    def refresh_view(self, x0, y0, x1, y1):
+        # Recombine the stale cells of the view, leaves everything else untouched.
+        # Returns whether any cell had to be recombined.
+        world = state.blocks_handler.world
+        x0, x1 = max(x0, 0), min(x1, world.width - 1)
+        spans = self.stale_spans(x0, y0, x1, y1)
+        if not spans:
+            return False
+
+        # Propagating can generate chunks and with them new lava emitters and
+        # stale rows, so collect again until both settle
+        while True:
+            version = self.version
+            emitters = self.emitters_in(min(span[3] for span in spans), spans[0][2], max(span[4] for span in spans), spans[-1][2])
+            for emitter in emitters:
+                if emitter.light_field is None:
+                    emitter.light_field = propagate_light(world.blocks, emitter.x, emitter.y, emitter.radius, emitter.cells)
+            if version == self.version:
+                break
+            spans = self.stale_spans(x0, y0, x1, y1)
+        # Every emitter lays its field over the stale spans it reaches, and
+        # each cell keeps the brightest. Fresh cells inside a span already hold
+        # that maximum, so going over them again changes nothing.
+        spans_by_y = {}
+        for row, start, y, a, b in spans:
+            row[start + a:start + b + 1] = row[start + a:start + b + 1].replace(bytes([STALE_LIGHT]), b"\0")
+            spans_by_y[y] = (row, start, a, b)
+        for emitter in emitters:
+            left, top, right, bottom = emitter.bounds()
+            size, field = right - left + 1, emitter.light_field
+            for y in range(top, bottom + 1):
+                span = spans_by_y.get(y)
+                if span is None:
+                    continue
+                row, start, a, b = span
+                a, b = max(a, left), min(b, right)
+                if a > b:
+                    continue
+                offset = (y - top) * size + a - left
+                row[start + a:start + b + 1] = bytes(map(max, row[start + a:start + b + 1], field[offset:offset + b - a + 1]))
+        return True
+
+    def stale_spans(self, x0, y0, x1, y1):
+        # (light row, row start, y, first x, last x) of every view row with
+        # stale cells, from the first to the last stale cell in it
+        world = state.blocks_handler.world
+        spans = []
+        for y in range(max(y0, 0), y1 + 1):
+            row = self.light_row(y >> CHUNK_SHIFT)
+            start = (y & CHUNK_MASK) * world.width
+            first = row.find(STALE_LIGHT, start + x0, start + x1 + 1)
+            if first != -1:
+                spans.append((row, start, y, first - start, row.rfind(STALE_LIGHT, start + x0, start + x1 + 1) - start))
+        return spans
+
+    def get_light(self, block_x, block_y):
+        world = state.blocks_handler.world
+        if not world.in_range(block_x, block_y):
+            return 0
+        light = self.light_row(block_y >> CHUNK_SHIFT)[(block_y & CHUNK_MASK) * world.width + block_x]
+        return 0 if light == STALE_LIGHT else light / 2
+
+    def on_block_changed(self, block_x, block_y):
+        for emitter in self.emitters_in(block_x, block_y, block_x, block_y):
+            emitter.light_field = None
+            self.mark_stale(emitter)
+        self.update_lava((block_y - 1) // LAVA_TILE, (block_y + 1) // LAVA_TILE, max(block_x - 1, 0) // LAVA_TILE, (block_x + 1) // LAVA_TILE)
+
+    def peek_row(self, block_y):
+        # Block codes of a whole row without generating chunks, None where nothing is loaded
+        world = state.blocks_handler.world
+        chunk = world.chunks.get(block_y >> CHUNK_SHIFT) if world.in_range(0, block_y) else None
+        if chunk is None:
+            return None
+        start = (block_y & CHUNK_MASK) * world.width
+        return chunk.layers[LAYER_BLOCKS][start:start + world.width]
+
+    def update_lava(self, tile_y0, tile_y1, tile_x0=0, tile_x1=None):
+        # Magma rock glows where it touches air. The glowing cells of each
+        # LAVA_TILE square share one emitter, tiles whose glowing cells stay
+        # the same keep theirs. Covers the tiles tile_x0..tile_x1 of the tile
+        # rows tile_y0..tile_y1. Deep rows are nearly all magma rock, so the
+        # glowing cells are found from the air next to them.
+        magma, air = BlockID.MAGMA_ROCK.value, BlockID.AIR.value
+        width = state.blocks_handler.world.width
+        if tile_x1 is None:
+            tile_x1 = (width - 1) // LAVA_TILE
+        x0, x1 = tile_x0 * LAVA_TILE, min((tile_x1 + 1) * LAVA_TILE, width)
+        y0, y1 = tile_y0 * LAVA_TILE, (tile_y1 + 1) * LAVA_TILE
+        rows = {y: self.peek_row(y) for y in range(y0 - 1, y1 + 1)}
+        glowing = {}
+        for y in range(y0 - 1, y1 + 1):
+            row = rows[y]
+            if row is None:
+                continue
+            x = row.find(air, max(x0 - 1, 0), x1 + 1)
+            while x != -1:
+                for cell_x, cell_y in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)):
+                    if x0 <= cell_x < x1 and y0 <= cell_y < y1 and rows[cell_y] is not None and rows[cell_y][cell_x] == magma:
+                        glowing.setdefault((cell_x // LAVA_TILE, cell_y // LAVA_TILE), set()).add((cell_x, cell_y))
+                x = row.find(air, x + 1, x1 + 1)
+        for tile in [tile for tile in self.lava_emitters if tile_y0 <= tile[1] <= tile_y1 and tile_x0 <= tile[0] <= tile_x1]:
+            emitter = self.lava_emitters[tile]
+            if {(emitter.x + dx, emitter.y + dy) for dx, dy in emitter.cells} != glowing.get(tile, set()):
+                self.remove_emitter(self.lava_emitters.pop(tile))
+        for tile, cells in glowing.items():
+            if tile not in self.lava_emitters:
+                x, y = min(x for x, _ in cells), min(y for _, y in cells)
+                self.lava_emitters[tile] = self.add_emitter(LightEmitter(x, y, LAVA_LIGHT, tuple(sorted((cx - x, cy - y) for cx, cy in cells))))
+
+    def on_chunk_loaded(self, world, chunk):
+        # Includes the edge rows of loaded neighbours, whose exposure may
+        # change. Adding and removing lava emitters marks their light stale,
+        # cached light anywhere else stays right.
+        y0, y1 = world.chunk_rows(chunk.cy)
+        self.light_rows.pop(chunk.cy, None)
+        self.update_lava((y0 - 1) // LAVA_TILE, y1 // LAVA_TILE)
+        self.version += 1
+
+    def on_chunk_evicted(self, world, chunk):
+        self.light_rows.pop(chunk.cy, None)
+        y0, y1 = world.chunk_rows(chunk.cy)
+        for tile in [tile for tile in self.lava_emitters if y0 <= tile[1] * LAVA_TILE < y1]:
+            self.remove_emitter(self.lava_emitters.pop(tile))
+        # Edge rows of the neighbours no longer glow towards the chunk
+        self.update_lava((y0 - 1) // LAVA_TILE, (y0 - 1) // LAVA_TILE)
+        self.update_lava(y1 // LAVA_TILE, y1 // LAVA_TILE)
+
+    def render_darkness(self):
+        # The overlay is composed in an off-screen image covering the blocks in
+        # view and blitted in one go. Only cells whose darkness level changed since
+        # the last frame are redrawn into it.
+        sub = self.subdivision
+        start_x, start_y = state.scroll_x // 8, state.scroll_y // 8
+        margin = 1 if sub > 1 else 0  # Interpolation reads the ring of blocks around the view
+        view_changed = self.refresh_view(start_x - margin, start_y - margin, start_x + OVERLAY_BLOCKS + margin - 1, start_y + OVERLAY_BLOCKS + margin - 1)
+
+        if self.overlay is None:
+            self.overlay = pyxel.Image(OVERLAY_BLOCKS * 8, OVERLAY_BLOCKS * 8)
+            self.overlay_levels = bytearray([STALE_LIGHT]) * (OVERLAY_BLOCKS * sub) ** 2
+        if (start_x, start_y) != self.overlay_origin:
+            self.overlay_origin = (start_x, start_y)
+            self.overlay_levels[:] = bytearray([STALE_LIGHT]) * len(self.overlay_levels)
+            view_changed = True
+
+        if view_changed:
+            if sub == 1:
+                self.compose_blocks(start_x, start_y)
+            else:
+                self.compose_gradient(start_x, start_y, sub)
+        pyxel.blt(start_x * 8, start_y * 8, self.overlay, 0, 0, OVERLAY_BLOCKS * 8, OVERLAY_BLOCKS * 8, TRANSPARENT_COLOR)
+
+    def compose_blocks(self, start_x, start_y):
+        levels, overlay, bank = self.overlay_levels, self.overlay, pyxel.images[0]
+        for y in range(OVERLAY_BLOCKS):
+            for x in range(OVERLAY_BLOCKS):
+                light_level = self.get_light(start_x + x, start_y + y)
+                light_level = max(int(light_level - 1), 0)
+                index = y * OVERLAY_BLOCKS + x
+                if levels[index] != light_level:
+                    levels[index] = light_level
+                    overlay.blt(x * 8, y * 8, bank, *DARKNESS_SPRITES[light_level])
+
+    def compose_gradient(self, start_x, start_y, sub):
+        # Every block is split into sub x sub pieces, each lit by bilinear
+        # interpolation between the block and its neighbours and drawn with the
+        # matching piece of the darkness sprite
+        size = OVERLAY_BLOCKS + 2
+        lights = [self.get_light(start_x + x - 1, start_y + y - 1) for y in range(size) for x in range(size)]
+        piece = 8 // sub
+        offsets = [((q + 0.5) / sub - 0.5) for q in range(sub)]
+        levels, overlay, bank = self.overlay_levels, self.overlay, pyxel.images[0]
+        side = OVERLAY_BLOCKS * sub
+        for y in range(OVERLAY_BLOCKS):
+            for x in range(OVERLAY_BLOCKS):
+                center = (y + 1) * size + x + 1
+                for qy, fy in enumerate(offsets):
+                    row = center + (size if fy > 0 else -size)
+                    wy = abs(fy)
+                    for qx, fx in enumerate(offsets):
+                        step = 1 if fx > 0 else -1
+                        wx = abs(fx)
+                        light_level = (
+                            (1 - wy) * ((1 - wx) * lights[center] + wx * lights[center + step])
+                            + wy * ((1 - wx) * lights[row] + wx * lights[row + step])
+                        )
+                        light_level = max(int(light_level - 1), 0)
+                        index = (y * sub + qy) * side + x * sub + qx
+                        if levels[index] != light_level:
+                            levels[index] = light_level
+                            (u, v, w, h) = DARKNESS_SPRITES[light_level]
+                            overlay.blt(x * 8 + qx * piece, y * 8 + qy * piece, bank, u + qx * piece, v + qy * piece, piece, piece)
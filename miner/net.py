@@ -0,0 +1,190 @@
+import asyncio
+import queue
+import struct
+import threading
+import zlib
+
+from . import state
+from .world import BLOCKS_BY_CODE, Chunk, ORES_BY_CODE, OreID
+from .entities import entity_area
+from .player import Player
+from .simulation import Simulation
+
+# === Network Protocol ===
+# Every message is one frame: a little-endian length and then the payload,
+# whose first byte is the message type. The server only ever sends what a
+# client cannot work out on its own: clients generate the world from the seed
+# in HELLO, get the chunks edited before they joined as CHUNK frames, and
+# after that one DELTA per tick with the cells edited in it and the entities
+# in view that changed since the last one they were sent.
+FRAME_LENGTH = struct.Struct("<I")
+MSG_HELLO, MSG_CHUNK, MSG_DELTA, MSG_INVENTORY, MSG_INPUT = 1, 2, 3, 4, 16
+HELLO = struct.Struct("<BIqii")  # type, player id, seed, width, height (-1 for endless)
+CHUNK = struct.Struct("<Bi")  # type, chunk row, then the three layers zlib-compressed
+DELTA = struct.Struct("<BIiiHHH")  # type, tick, scroll x/y, edited cells, entities, entities gone
+DELTA_CELL = struct.Struct("<HIBB")  # x, y, block, ore
+DELTA_ENTITY = struct.Struct("<IiibB")  # id, x, y, direction, flags
+DELTA_GONE = struct.Struct("<I")  # id
+INVENTORY = struct.Struct("<BqH")  # type, money, ore kinds, then SAVE_ORE-like entries
+INVENTORY_ORE = struct.Struct("<BI")  # ore code, count
+INPUT = struct.Struct("<BB")  # type, actions packed like a recording tick
+ENTITY_ENEMY = 1  # Flag bits of DELTA_ENTITY
+ENTITY_FALLING = 2
+
+def frame(payload):
+    return FRAME_LENGTH.pack(len(payload)) + payload
+
+async def read_frame(reader):
+    (length,) = FRAME_LENGTH.unpack(await reader.readexactly(FRAME_LENGTH.size))
+    return await reader.readexactly(length)
+
+def encode_hello(player_id, world):
+    return HELLO.pack(MSG_HELLO, player_id, world.seed, world.width, -1 if world.height is None else world.height)
+
+def encode_chunk(chunk):
+    return CHUNK.pack(MSG_CHUNK, chunk.cy) + zlib.compress(b"".join(chunk.layers))
+
+def encode_delta(tick, scroll, cells, entities, gone):
+    parts = [DELTA.pack(MSG_DELTA, tick, scroll[0], scroll[1], len(cells), len(entities), len(gone))]
+    parts += [DELTA_CELL.pack(*cell) for cell in cells]
+    parts += [DELTA_ENTITY.pack(entity_id, *values) for entity_id, values in entities]
+    parts += [DELTA_GONE.pack(entity_id) for entity_id in gone]
+    return b"".join(parts)
+
+def decode_delta(payload):
+    _, tick, scroll_x, scroll_y, cell_count, entity_count, gone_count = DELTA.unpack_from(payload)
+    offset = DELTA.size
+    cells = list(DELTA_CELL.iter_unpack(payload[offset:offset + cell_count * DELTA_CELL.size]))
+    offset += cell_count * DELTA_CELL.size
+    entities = list(DELTA_ENTITY.iter_unpack(payload[offset:offset + entity_count * DELTA_ENTITY.size]))
+    offset += entity_count * DELTA_ENTITY.size
+    gone = [entity_id for (entity_id,) in DELTA_GONE.iter_unpack(payload[offset:offset + gone_count * DELTA_GONE.size])]
+    return tick, (scroll_x, scroll_y), cells, entities, gone
+
+def encode_inventory(inventory):
+    ores = inventory.get_inventory()
+    return INVENTORY.pack(MSG_INVENTORY, inventory.player_money, len(ores)) + b"".join(
+        INVENTORY_ORE.pack(ore_id.value, count) for ore_id, count in ores.items())
+
+def decode_inventory(payload):
+    _, money, kinds = INVENTORY.unpack_from(payload)
+    ores = {ORES_BY_CODE[code]: count for code, count in INVENTORY_ORE.iter_unpack(payload[INVENTORY.size:INVENTORY.size + kinds * INVENTORY_ORE.size])}
+    return money, ores
+
+def encode_input(bits):
+    return INPUT.pack(MSG_INPUT, bits)
+
+# === Thin Client ===
+class RemoteGame:
+    # The client side of a served game: a local Simulation that is never
+    # ticked, only kept in step with what the server sends. The world comes
+    # from the seed like everywhere else, edits and entities from the frames.
+    def __init__(self):
+        self.player_id = None
+        self.simulation = None
+        self.tick = 0
+        self.players = {}  # Entity id -> Player of everyone else in view
+        self.enemies = {}  # Entity id -> handle in the local EntityStore
+
+    def apply(self, payload):
+        kind = payload[0]
+        if kind == MSG_HELLO:
+            _, self.player_id, seed, width, height = HELLO.unpack(payload)
+            self.simulation = Simulation(seed, None if height < 0 else height)
+        elif kind == MSG_CHUNK:
+            _, cy = CHUNK.unpack_from(payload)
+            self.apply_chunk(cy, zlib.decompress(payload[CHUNK.size:]))
+        elif kind == MSG_DELTA:
+            self.apply_delta(*decode_delta(payload))
+        elif kind == MSG_INVENTORY:
+            state.inventory_handler.player_money, state.inventory_handler.ores = decode_inventory(payload)
+
+    def apply_chunk(self, cy, data):
+        world = self.simulation.world
+        if cy in world.chunks:
+            world.evict_chunk(cy)
+        size = len(data) // 3
+        chunk = Chunk(cy, bytearray(data[:size]), bytearray(data[size:2 * size]), bytearray(data[2 * size:]))
+        chunk.dirty = True  # Evicting has to keep it, the seed alone no longer gives it back
+        world.unsaved.add(cy)
+        world.edited.add(cy)
+        world.add_chunk(chunk)
+
+    def apply_delta(self, tick, scroll, cells, entities, gone):
+        self.tick = tick
+        state.scroll_x, state.scroll_y = scroll
+        world = self.simulation.world
+        for x, y, block, ore in cells:
+            if world.blocks.get(x, y) != block:
+                state.blocks_handler.set_block(x, y, BLOCKS_BY_CODE[block])
+            old_ore = ORES_BY_CODE[world.ores.get(x, y, OreID.NONE.value)]
+            if old_ore.value != ore:
+                world.ores.set(x, y, ore)
+                if old_ore != OreID.NONE:
+                    state.ore_handler.index.remove(x, y, old_ore)
+                if ORES_BY_CODE[ore] != OreID.NONE:
+                    state.ore_handler.index.add(x, y, ORES_BY_CODE[ore])
+                state.blocks_handler.mark_dirty(x, y)
+        for entity_id, x, y, direction, flags in entities:
+            if flags & ENTITY_ENEMY:
+                handle = self.enemies.get(entity_id)
+                if handle is None:
+                    handle = self.enemies[entity_id] = state.enemies.spawn(x, y, direction)
+                handle.x, handle.y, handle.direction = x, y, direction
+                state.enemies.index.move(handle, entity_area(handle))
+                continue
+            player = state.player if entity_id == self.player_id else self.players.get(entity_id)
+            if player is None:
+                player = self.players[entity_id] = Player(x, y)
+            player.x, player.y, player.direction, player.is_falling = x, y, direction, bool(flags & ENTITY_FALLING)
+        for entity_id in gone:
+            self.players.pop(entity_id, None)
+            handle = self.enemies.pop(entity_id, None)
+            if handle is not None:
+                handle.is_alive = False
+        state.enemies.cleanup()
+        world.stream(state.player.y // 8)
+
+    def draw_players(self):
+        for player in self.players.values():
+            player.draw()
+
+class NetClient:
+    # One connection to a server on its own thread and event loop. Frames
+    # received are queued for the game thread, input goes the other way.
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.frames = queue.Queue()
+        self.loop = None
+        self.writer = None
+        self.error = None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        try:
+            asyncio.run(self.receive())
+        except Exception as error:
+            self.error = error
+
+    async def receive(self):
+        self.loop = asyncio.get_running_loop()
+        reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        while True:
+            self.frames.put(await read_frame(reader))
+
+    def send_input(self, bits):
+        if self.writer is not None:
+            self.loop.call_soon_threadsafe(self.writer.write, frame(encode_input(bits)))
+
+    def pending(self):
+        # Every frame received since the last call
+        frames = []
+        while not self.frames.empty():
+            frames.append(self.frames.get_nowait())
+        return frames
+
+    def close(self):
+        if self.writer is not None:
+            self.loop.call_soon_threadsafe(self.writer.close)
@@ -0,0 +1,382 @@
+import heapq
+from collections import deque
+
+from .world import CHUNK_MASK, CHUNK_SHIFT, LAYER_BLOCKS, SOLID_BY_CODE
+
+# === Pathfinding ===
+# Paths run over the open (non-solid) cells of the loaded chunks, four-way
+# with unit steps. Long paths go through an abstraction of the map: it is cut
+# into square clusters, the cells where two clusters open onto each other
+# become nodes, and nodes of one cluster are linked with their distance inside
+# it. A search then crosses the map node to node and only the legs inside a
+# cluster are searched cell by cell.
+CLUSTER_SIZE = 16  # Blocks per side of a cluster, divides CHUNK_SIZE
+ENTRANCE_SPLIT = 6  # Openings this wide or wider get a node at both ends instead of the middle
+CHASE_RADIUS = 48  # Blocks from the target that enemies chase it from
+OPEN_BY_CODE = bytes(0 if code < len(SOLID_BY_CODE) and SOLID_BY_CODE[code] else 1 for code in range(256))
+NEIGHBOURS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+def astar(start, goal, is_open, bounds=None):
+    # Cells from start to goal, both included, or None. is_open(x, y) tells
+    # the walkable cells, bounds (x0, y0, x1, y1) limits the search inclusively.
+    if not (is_open(*start) and is_open(*goal)):
+        return None
+    x0, y0, x1, y1 = bounds if bounds is not None else (float("-inf"), float("-inf"), float("inf"), float("inf"))
+    goal_x, goal_y = goal
+    came = {start: None}
+    cost = {start: 0}
+    heap = [(abs(start[0] - goal_x) + abs(start[1] - goal_y), 0, start)]
+    while heap:
+        _, g, cell = heapq.heappop(heap)
+        if cell == goal:
+            path = []
+            while cell is not None:
+                path.append(cell)
+                cell = came[cell]
+            return path[::-1]
+        if g > cost[cell]:
+            continue
+        x, y = cell
+        for dx, dy in NEIGHBOURS:
+            nx, ny = x + dx, y + dy
+            if not (x0 <= nx <= x1 and y0 <= ny <= y1):
+                continue
+            step = (nx, ny)
+            if g + 1 < cost.get(step, g + 2) and is_open(nx, ny):
+                cost[step] = g + 1
+                came[step] = cell
+                heapq.heappush(heap, (g + 1 + abs(nx - goal_x) + abs(ny - goal_y), g + 1, step))
+    return None
+
+class NavGraph:
+    # The cluster abstraction of the loaded chunks. Loading or evicting a
+    # chunk and every block change only mark clusters dirty, repair() redoes
+    # the openings around the dirty clusters and relinks only the clusters
+    # whose nodes or cells changed, so opening a tunnel costs a few clusters.
+    def __init__(self, world):
+        self.world = world
+        self.columns = -(-world.width // CLUSTER_SIZE)
+        self.borders = {}  # (cluster, cluster right of or below it) -> [(cell, cell)] openings
+        self.crossings = {}  # Node -> nodes across a border, one step away
+        self.intra = {}  # Cluster -> node -> {node: steps inside the cluster}
+        self.masks = {}  # Cluster -> open cells, one byte per cell in rows
+        self.dirty = set()
+        self.version = 0  # Goes up with every repair, path caches check it
+        world.add_listener(self)
+        for chunk in world.chunks.values():
+            self.on_chunk_loaded(world, chunk)
+
+    def is_open(self, x, y):
+        world = self.world
+        if x < 0 or x >= world.width or y < 0 or (world.height is not None and y >= world.height):
+            return False
+        chunk = world.chunks.get(y >> CHUNK_SHIFT)
+        return chunk is not None and OPEN_BY_CODE[chunk.layers[LAYER_BLOCKS][(y & CHUNK_MASK) * world.width + x]] == 1
+
+    def cluster_of(self, x, y):
+        return (x // CLUSTER_SIZE, y // CLUSTER_SIZE)
+
+    def bounds(self, cluster):
+        world = self.world
+        x0, y0 = cluster[0] * CLUSTER_SIZE, cluster[1] * CLUSTER_SIZE
+        y1 = y0 + CLUSTER_SIZE if world.height is None else min(y0 + CLUSTER_SIZE, world.height)
+        return (x0, y0, min(x0 + CLUSTER_SIZE, world.width) - 1, y1 - 1)
+
+    def is_loaded(self, cluster):
+        cx, cy = cluster
+        world = self.world
+        return (0 <= cx < self.columns and cy >= 0 and (world.height is None or cy * CLUSTER_SIZE < world.height)
+                and (cy * CLUSTER_SIZE) >> CHUNK_SHIFT in world.chunks)
+
+    def mask(self, cluster):
+        # Open cells of a loaded cluster, rebuilt when the cluster is repaired
+        mask = self.masks.get(cluster)
+        if mask is None:
+            x0, y0, x1, y1 = self.bounds(cluster)
+            world = self.world
+            blocks = world.chunks[y0 >> CHUNK_SHIFT].layers[LAYER_BLOCKS]
+            start = (y0 & CHUNK_MASK) * world.width
+            mask = self.masks[cluster] = b"".join(
+                blocks[start + row * world.width + x0:start + row * world.width + x1 + 1].translate(OPEN_BY_CODE)
+                for row in range(y1 - y0 + 1))
+        return mask
+
+    def local_costs(self, cell, cluster):
+        # Steps from cell to every cell of its cluster it reaches without leaving it
+        x0, y0, x1, _ = self.bounds(cluster)
+        width = x1 - x0 + 1
+        mask = self.mask(cluster)
+        first = (cell[1] - y0) * width + cell[0] - x0
+        if not mask[first]:
+            return {}
+        steps = {first: 0}
+        queue = deque((first,))
+        while queue:
+            i = queue.popleft()
+            x = i % width
+            for j in (i - 1 if x > 0 else -1, i + 1 if x < width - 1 else -1, i - width, i + width):
+                if 0 <= j < len(mask) and mask[j] and j not in steps:
+                    steps[j] = steps[i] + 1
+                    queue.append(j)
+        return {(x0 + i % width, y0 + i // width): cost for i, cost in steps.items()}
+
+    # --- Building and repair ---
+    def scan_border(self, a, b):
+        # Openings between two neighbouring clusters, b right of or below a
+        if not (self.is_loaded(a) and self.is_loaded(b)):
+            return []
+        ax0, ay0, ax1, ay1 = self.bounds(a)
+        if b[1] == a[1]:
+            pairs = [((ax1, y), (ax1 + 1, y)) for y in range(ay0, ay1 + 1)]
+        else:
+            pairs = [((x, ay1), (x, ay1 + 1)) for x in range(ax0, ax1 + 1)]
+        openings, run = [], []
+        for pair in pairs + [None]:
+            if pair is not None and self.is_open(*pair[0]) and self.is_open(*pair[1]):
+                run.append(pair)
+                continue
+            if run:
+                openings += [run[0], run[-1]] if len(run) >= ENTRANCE_SPLIT else [run[len(run) // 2]]
+                run = []
+        return openings
+
+    def set_border(self, key, openings):
+        for cell, other in self.borders.pop(key, ()):
+            self.crossings[cell].remove(other)
+            self.crossings[other].remove(cell)
+        if openings:
+            self.borders[key] = openings
+            for cell, other in openings:
+                self.crossings.setdefault(cell, []).append(other)
+                self.crossings.setdefault(other, []).append(cell)
+
+    def link(self, cluster):
+        # Steps between every two nodes of the cluster
+        self.intra.pop(cluster, None)
+        if not self.is_loaded(cluster):
+            return
+        cx, cy = cluster
+        nodes = set()
+        for key, side in ((((cx - 1, cy), cluster), 1), (((cx, cy - 1), cluster), 1), ((cluster, (cx + 1, cy)), 0), ((cluster, (cx, cy + 1)), 0)):
+            nodes.update(pair[side] for pair in self.borders.get(key, ()))
+        links = self.intra[cluster] = {}
+        for node in sorted(nodes):
+            costs = self.local_costs(node, cluster)
+            links[node] = {other: costs[other] for other in nodes if other != node and other in costs}
+
+    def repair(self):
+        if not self.dirty:
+            return
+        relink = set()
+        for cluster in self.dirty:
+            self.masks.pop(cluster, None)
+            relink.add(cluster)
+        for cluster in self.dirty:
+            cx, cy = cluster
+            for key in (((cx - 1, cy), cluster), ((cx, cy - 1), cluster), (cluster, (cx + 1, cy)), (cluster, (cx, cy + 1))):
+                openings = self.scan_border(*key)
+                if openings != self.borders.get(key, []):
+                    self.set_border(key, openings)
+                    relink.update(key)
+        for cluster in relink:
+            self.link(cluster)
+        self.dirty.clear()
+        self.version += 1
+
+    def on_block_changed(self, block_x, block_y):
+        self.dirty.add(self.cluster_of(block_x, block_y))
+
+    def on_chunk_loaded(self, world, chunk):
+        y0, y1 = world.chunk_rows(chunk.cy)
+        for cy in range(y0 // CLUSTER_SIZE, -(-y1 // CLUSTER_SIZE)):
+            self.dirty.update((cx, cy) for cx in range(self.columns))
+
+    def on_chunk_evicted(self, world, chunk):
+        # Clusters never repaired have nothing to take down
+        y0, y1 = world.chunk_rows(chunk.cy)
+        for cy in range(y0 // CLUSTER_SIZE, -(-y1 // CLUSTER_SIZE)):
+            for cx in range(self.columns):
+                if (cx, cy) in self.intra:
+                    self.dirty.add((cx, cy))
+                else:
+                    self.dirty.discard((cx, cy))
+                    self.masks.pop((cx, cy), None)
+
+    # --- Queries ---
+    def neighbours(self, node):
+        links = self.intra.get(self.cluster_of(*node), {}).get(node, {})
+        yield from links.items()
+        for other in self.crossings.get(node, ()):
+            yield other, 1
+
+    def find_path(self, start, goal):
+        # Cells from start to goal through the loaded chunks, or None
+        self.repair()
+        if not (self.is_open(*start) and self.is_open(*goal)):
+            return None
+        start_cluster, goal_cluster = self.cluster_of(*start), self.cluster_of(*goal)
+        if start_cluster == goal_cluster:
+            path = astar(start, goal, self.is_open, self.bounds(start_cluster))
+            if path is not None:
+                return path
+        # Node to node from the start's cluster to the goal's, the goal is one more node
+        goal_costs = {node: cost for node, cost in self.local_costs(goal, goal_cluster).items() if node in self.intra.get(goal_cluster, {})}
+        start_costs = self.local_costs(start, start_cluster)
+        goal_x, goal_y = goal
+        came, cost, heap = {}, {}, []
+        for node in self.intra.get(start_cluster, {}):
+            if node in start_costs:
+                came[node], cost[node] = start, start_costs[node]
+                heapq.heappush(heap, (cost[node] + abs(node[0] - goal_x) + abs(node[1] - goal_y), cost[node], node))
+        found = False
+        while heap:
+            _, g, node = heapq.heappop(heap)
+            if node == goal and g == cost.get(goal):
+                found = True
+                break
+            if g > cost.get(node, g):
+                continue
+            steps = list(self.neighbours(node))
+            if node in goal_costs:
+                steps.append((goal, goal_costs[node]))
+            for other, step in steps:
+                if g + step < cost.get(other, float("inf")):
+                    cost[other], came[other] = g + step, node
+                    heapq.heappush(heap, (g + step + abs(other[0] - goal_x) + abs(other[1] - goal_y), g + step, other))
+        if not found:
+            return None
+        route = [goal]
+        while route[-1] != start:
+            route.append(came[route[-1]])
+        route.reverse()
+        # Back to cells: crossings are one step, the rest are searched inside their cluster
+        path = [start]
+        for a, b in zip(route, route[1:]):
+            if b in self.crossings.get(a, ()):
+                path.append(b)
+            else:
+                path += astar(a, b, self.is_open, self.bounds(self.cluster_of(*a)))[1:]
+        return path
+
+class PathService:
+    # Path requests are collected over a tick and answered together. Every
+    # answer is the next cell towards the target, read from a flow field: one
+    # search over the nodes per target gives every node its distance to it,
+    # and one search inside a cluster per (cluster, target) spreads that over
+    # the cluster's cells. Everything asking from the same cluster for the
+    # same target shares both, so a crowd chasing the player costs a few
+    # cluster searches and not a full search each.
+    def __init__(self, graph):
+        self.graph = graph
+        self.requests = []  # (requester, cell, target) for this tick
+        self.fields = {}  # Target -> node -> (steps to the target, next node or None)
+        self.flows = {}  # (cluster, target) -> cell -> next cell, None at the target
+        self.version = -1
+
+    def request(self, requester, cell, target):
+        self.requests.append((requester, cell, target))
+
+    def update(self):
+        # [(requester, cell, next cell or None)] for this tick's requests
+        graph = self.graph
+        graph.repair()
+        if graph.version != self.version:
+            self.fields.clear()
+            self.flows.clear()
+            self.version = graph.version
+        targets = {target for _, _, target in self.requests}
+        for key in [key for key in self.fields if key not in targets]:
+            del self.fields[key]
+        for key in [key for key in self.flows if key[1] not in targets]:
+            del self.flows[key]
+        answers = []
+        for requester, cell, target in self.requests:
+            key = (graph.cluster_of(*cell), target)
+            flow = self.flows.get(key)
+            if flow is None:
+                flow = self.flows[key] = self.flow(*key)
+            answers.append((requester, cell, flow.get(cell)))
+        self.requests.clear()
+        return answers
+
+    def field(self, target):
+        # Steps from every node that reaches the target, with the node it goes to next
+        field = self.fields.get(target)
+        if field is not None:
+            return field
+        graph = self.graph
+        field = self.fields[target] = {}
+        if not graph.is_open(*target):
+            return field
+        cluster = graph.cluster_of(*target)
+        costs = graph.local_costs(target, cluster)
+        heap = [(costs[node], node, ()) for node in graph.intra.get(cluster, {}) if node in costs]  # () sorts before any cell
+        heapq.heapify(heap)
+        while heap:
+            steps, node, after = heapq.heappop(heap)
+            if node in field:
+                continue
+            field[node] = (steps, after or None)
+            for other, step in graph.neighbours(node):
+                if other not in field:
+                    heapq.heappush(heap, (steps + step, other, node))
+        return field
+
+    def flow(self, cluster, target):
+        # Next cell towards the target for every cell of the cluster. Nodes
+        # that leave the cluster next and the target itself seed a search
+        # over the cluster's cells, each cell then steps to where it was
+        # reached from.
+        graph = self.graph
+        if not graph.is_loaded(cluster):
+            return {}
+        field = self.field(target)
+        heap = []
+        for node in graph.intra.get(cluster, {}):
+            entry = field.get(node)
+            if entry is not None and entry[1] is not None and graph.cluster_of(*entry[1]) != cluster:
+                heap.append((entry[0], node, entry[1]))
+        if graph.cluster_of(*target) == cluster and graph.is_open(*target):
+            heap.append((0, target, ()))
+        heapq.heapify(heap)
+        x0, y0, x1, y1 = graph.bounds(cluster)
+        width = x1 - x0 + 1
+        mask = graph.mask(cluster)
+        flow = {}
+        while heap:
+            steps, cell, after = heapq.heappop(heap)
+            if cell in flow:
+                continue
+            flow[cell] = after or None
+            x, y = cell
+            for dx, dy in NEIGHBOURS:
+                nx, ny = x + dx, y + dy
+                if x0 <= nx <= x1 and y0 <= ny <= y1 and mask[(ny - y0) * width + nx - x0] and (nx, ny) not in flow:
+                    heapq.heappush(heap, (steps + 1, (nx, ny), cell))
+        return flow
+
+    def steer(self, enemies, targets):
+        # Turns every enemy near one of the targets, (x, y) player positions
+        # in pixels, towards the next cell of its way to the nearest. Enemies
+        # still walk and fall on their own, steering only picks the
+        # direction, so ways up stay out of their reach.
+        reach = CHASE_RADIUS * 8
+        for handle in enemies.handles:
+            if handle.y & 7:
+                continue  # Mid fall
+            nearest = None
+            for target_x, target_y in targets:
+                if abs(handle.x - target_x) <= reach and abs(handle.y - target_y) <= reach:
+                    distance = (handle.x - target_x) ** 2 + (handle.y - target_y) ** 2
+                    if nearest is None or distance < nearest[0]:
+                        nearest = (distance, target_x, target_y)
+            if nearest is None:
+                continue  # Too far from everyone
+            self.request(handle, ((handle.x + 4) >> 3, handle.y >> 3), ((nearest[1] + 4) >> 3, (nearest[2] + 4) >> 3))
+        for handle, (x, _), step in self.update():
+            if step is None or step[0] == x:
+                continue
+            direction = 1 if step[0] > x else -1
+            if handle.direction != direction:
+                handle.direction = direction
+                handle.dx = direction * abs(handle.dx)
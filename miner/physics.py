@@ -0,0 +1,122 @@
+import pyxel
+
+from . import state
+
+def clamp(value, min_value, max_value):
+    return max(min_value, min(value, max_value))
+
+
+def get_tile(tile_x, tile_y):
+    return pyxel.tilemaps[1].pget(tile_x, tile_y)
+
+def destroy_block(tile_x,tile_y):
+    state.blocks_handler.destroy_block(tile_x, tile_y)
+
+
+def is_colliding(x, y, is_falling):
+    # Get player new bounding box:
+    x1 = pyxel.floor(x) // 8
+    y1 = (pyxel.floor(y)) // 8
+    x2 = (pyxel.ceil(x) + 7) // 8
+    y2 = (pyxel.ceil(y) + 7) // 8
+
+    # print(x1, y1, x2, y2)
+
+    # Check if player is completly in empty space!
+    if state.blocks_handler.any_solid(x1, y1, x2, y2):
+        return True
+
+    # Legacy code!
+    # if is_falling and y % 8 == 1:
+    #     for xi in range(x1, x2 + 1):
+    #         if get_tile(xi, y1 + 1) == TILE_FLOOR:
+    #             return True
+    return False
+
+def is_close_enough(entity_x, entity_y, block_x, block_y, proximity=4):
+    # Define the entity's bounding box corners
+    entity_corners = [
+        (entity_x, entity_y),  # top-left
+        (entity_x + 7, entity_y),  # top-right
+        (entity_x, entity_y + 7),  # bottom-left
+        (entity_x + 7, entity_y + 7),  # bottom-right
+    ]
+
+    # Define the block's bounding box corners
+    block_corners = [
+        (block_x, block_y),  # top-left
+        (block_x + 7, block_y),  # top-right
+        (block_x, block_y + 7),  # bottom-left
+        (block_x + 7, block_y + 7),  # bottom-right
+    ]
+
+    # Check if any corner of the entity is within the proximity of the block
+    for ex, ey in entity_corners:
+        for bx, by in block_corners:
+            # Check if the distance between entity corner and block corner is within proximity
+            if abs(ex - bx) <= proximity and abs(ey - by) <= proximity:
+                return True  # Entity is close enough to the block
+
+    return False  # No proximity found
+
+
+def push_back(x, y, dx, dy, w=8, h=8):
+    # Moves a w x h box along y, then along x, stopping each axis at the first
+    # pixel step that would overlap a solid block
+    col1, col2 = pyxel.floor(x) // 8, (pyxel.ceil(x) + w - 1) // 8
+    y = sweep_axis(y, dy, h, lambda y1, y2: state.blocks_handler.any_solid(col1, y1, col2, y2))
+    row1, row2 = pyxel.floor(y) // 8, (pyxel.ceil(y) + h - 1) // 8
+    x = sweep_axis(x, dx, w, lambda x1, x2: state.blocks_handler.any_solid(x1, row1, x2, row2))
+    return x, y
+
+
+def sweep_advance(p, d, count):
+    # Takes count pixel steps of the remaining delta d from p, with the same
+    # arithmetic as stepping one pixel at a time so float positions match too
+    if type(p) is int and type(d) is int:
+        step = count if d > 0 else -count
+        return p + step, d - step
+    for _ in range(count):
+        step = max(-1, min(1, d))
+        p += step
+        d -= step
+    return p, d
+
+
+def sweep_axis(pos, delta, size, is_blocked):
+    # Swept collision along one axis. The box moves in unit steps (the last one
+    # may be fractional) and covers the block lines floor(pos)//8..(ceil(pos)+size-1)//8.
+    # Once the first step is free, a later step can only collide in the lines its
+    # leading edge newly enters, so instead of testing every pixel this jumps from
+    # one block line crossing to the next. is_blocked(line1, line2) tells whether
+    # any solid block lies in those lines across the box.
+    if delta == 0:
+        return pos
+    steps = pyxel.ceil(abs(delta))
+    forward = delta > 0
+
+    p, d = sweep_advance(pos, delta, 1)
+    first, last = pyxel.floor(p) // 8, (pyxel.ceil(p) + size - 1) // 8
+    if is_blocked(first, last):
+        return pos
+    lead = last if forward else first
+    done = 1
+    while done < steps:
+        # First whole step at which the leading edge enters the next block line
+        if forward:
+            next_step = 8 * (lead + 1) - size + 1 - pyxel.ceil(pos)
+        else:
+            next_step = pyxel.floor(pos) - 8 * lead + 1
+        next_step = min(max(next_step, done + 1), steps)
+        next_p, next_d = sweep_advance(p, d, next_step - done)
+        next_lead = (pyxel.ceil(next_p) + size - 1) // 8 if forward else pyxel.floor(next_p) // 8
+        if next_lead != lead:
+            if is_blocked(*((lead + 1, next_lead) if forward else (next_lead, lead - 1))):
+                return sweep_advance(p, d, next_step - 1 - done)[0]
+            lead = next_lead
+        p, d, done = next_p, next_d, next_step
+    return p
+
+
+def is_wall(block_x, block_y):
+    return state.blocks_handler.is_solid(block_x, block_y)
@@ -0,0 +1,149 @@
+import pyxel
+
+from . import state
+from .constants import (
+    MAP_SIZE_BLOCKS_X,
+    SCREEN_H,
+    SCREEN_W,
+    SCROLL_BORDER_X,
+    SCROLL_BORDER_Y,
+    TRANSPARENT_COLOR,
+)
+from .audio import play_sound
+from .physics import clamp, is_close_enough, is_wall, push_back
+from .entities import EntityStore, SpatialHash
+
+class Player:
+    __slots__ = ("x", "y", "dx", "dy", "direction", "is_falling")
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+        self.dx = 0
+        self.dy = 0
+        self.direction = 1
+        self.is_falling = False
+
+    def update(self):
+        last_y = self.y
+        if state.input.is_long_pressed("left"):
+            self.dx = -2
+            self.direction = -1
+        if state.input.is_long_pressed("right"):
+            self.dx = 2
+            self.direction = 1
+        self.dy = min(self.dy + 1, 3)
+        if state.input.is_pressed("jump"):
+            self.dy = -6
+            play_sound(3, 8)
+        self.x, self.y = push_back(self.x, self.y, self.dx, self.dy)
+        self.dx = int(self.dx * 0.8)
+        self.is_falling = self.y > last_y
+
+        map_height = state.blocks_handler.world.height
+        self.x = clamp(self.x, 0, MAP_SIZE_BLOCKS_X * 8)
+        self.y = max(self.y, 0) if map_height is None else clamp(self.y, 0, map_height * 8)
+
+        if self.x > state.scroll_x + SCROLL_BORDER_X:
+            last_scroll_x = state.scroll_x
+            state.scroll_x = min(self.x - SCROLL_BORDER_X, (MAP_SIZE_BLOCKS_X-8) * 8)
+            # spawn_enemy(last_scroll_x + 128, scroll_x + 127)
+        if self.x < state.scroll_x + (SCREEN_W - SCROLL_BORDER_X):
+            last_scroll_x = state.scroll_x
+            state.scroll_x = max(self.x - (SCREEN_W - SCROLL_BORDER_X), 0)
+            # spawn_enemy(last_scroll_x + 128, scroll_x + 127)
+        if self.y > state.scroll_y + SCROLL_BORDER_Y:
+            last_scroll_y = state.scroll_y
+            state.scroll_y = self.y - SCROLL_BORDER_Y if map_height is None else min(self.y - SCROLL_BORDER_Y, (map_height-8) * 8)
+            # spawn_enemy(last_scroll_x + 128, scroll_x + 127)
+        if self.y < state.scroll_y + (SCREEN_H - SCROLL_BORDER_Y):
+            last_scroll_y = state.scroll_y
+            state.scroll_y = max(self.y - (SCREEN_H - SCROLL_BORDER_Y), 0)
+            # spawn_enemy(last_scroll_x + 128, scroll_x + 127)
+
+        # Handle mining:
+        # If button is held + player is in proximity he starts mining (only true holding counts (this with delay))
+        # 1. Look at held direction
+        # 2. Look at marked block (proximity + blocktype)
+        # 3. Start mining it if it is valid!
+        marked_blocks = self.get_marker_blocks()
+        pre_mining_progress = state.mining_helper.mining_hits
+        for key, key_state in state.input.states.items():
+            if state.input.is_held(key):
+                # get marked blocks assiciated with key
+                mined_blocks_coords = None
+                for blocks in marked_blocks:
+                    if blocks[2] == key:
+                        mined_blocks_coords = (blocks[0], blocks[1])
+                        break
+                if mined_blocks_coords == None:
+                    continue
+                if not is_wall(*mined_blocks_coords):
+                    continue
+                # Proximity check:
+                # Mine, mine, mine!
+                state.mining_helper.mine(*mined_blocks_coords)
+                break
+        if not (state.mining_helper.mining_hits > pre_mining_progress):
+            # Reset mining
+            state.mining_helper.reset()
+
+        # Handle doubleclicks:
+
+        # Check for zones triggers
+        state.trigger_zones_handler.check_zones_player()
+
+    # left, right, down
+
+    # Marker blocks = blocks that are in player proximity if solid?
+    def get_marker_blocks(self):
+        player_middle_x,player_middle_y = pyxel.floor(self.x + 4), pyxel.floor(self.y + 4)
+
+        directions = [(0, 1),(0, -1),(1, 0),(-1, 0)]
+        directions_names = ["down","jump","right","left"]
+        neighbour_points = [(player_middle_x + dx * 8, player_middle_y + dy * 8, directions_names[directions.index((dx,dy))]) for dx, dy in directions]
+
+        marker_blocks = []
+        for nei_point in neighbour_points:
+            (px, py, dir_name) = nei_point
+            bx, by = px//8, py//8
+            if not state.blocks_handler.is_solid(bx, by):
+                continue
+            if not is_close_enough(self.x, self.y, bx*8, by*8):
+                continue
+            marker_blocks.append((bx, by, dir_name))
+        return marker_blocks
+
+    def draw(self):
+        u = (2 if self.is_falling else pyxel.frame_count // 3 % 2) * 8
+        w = 8 if self.direction > 0 else -8
+        pyxel.blt(self.x, self.y, 0, u, 16, w, 8, TRANSPARENT_COLOR)
+
+    def draw_block_markers(self):
+        # Define the marker graphics
+        marker_graphic = (0, 64, 8, 8)
+        marker_graphic_hit = (8, 64, 8, 8)
+
+        marker_blocks = self.get_marker_blocks()
+
+        # Determine the correct marker based on mining hits
+        if state.mining_helper.current_block and ((state.mining_helper.mining_hits) % 30 < 7):
+            marker = marker_graphic_hit
+        else:
+            marker = marker_graphic
+
+        for block in marker_blocks:
+            (bx, by, block_name) = block
+            pyxel.blt(bx*8, by*8, 0, *marker, TRANSPARENT_COLOR)
+
+
+def game_over():
+    state.scroll_x = 0
+    state.scroll_y = 0
+    state.player.x = 0
+    state.player.y = 0
+    state.player.dx = 0
+    state.player.dy = 0
+    state.entity_index = SpatialHash()
+    state.enemies = EntityStore(state.entity_index)
+    play_sound(3, 9)
@@ -0,0 +1,160 @@
+import pyxel
+import csv
+import json
+import time
+from collections import deque
+
+PROFILE_WINDOW = 120  # Frames the rolling percentiles are taken over
+# Sections in the order the overlay and the dumps list them
+SECTIONS = ("update", "input", "player", "entities", "physics", "stream", "draw", "blocks", "lighting", "darkness", "ui")
+OVERLAY_SECTIONS = ("update", "input", "player", "entities", "physics", "draw", "blocks", "lighting", "darkness", "ui")
+
+class NullSection:
+    # Handed out while profiling is off, entering and leaving it does nothing
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_SECTION = NullSection()
+
+class Section:
+    __slots__ = ("totals", "name", "start")
+
+    def __init__(self, totals, name):
+        self.totals = totals
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.totals[self.name] = self.totals.get(self.name, 0.0) + (time.perf_counter() - self.start) * 1000
+        return False
+
+class Profiler:
+    # Named timers around the subsystems of a frame. While disabled section()
+    # returns a shared no-op context, so the instrumented code pays one call.
+    # Enabled, every frame's milliseconds per section and screen blits go into
+    # a rolling window for the overlay and, with a dump path, into a CSV or
+    # JSON file (picked by the extension) with one record per frame.
+    def __init__(self, window=PROFILE_WINDOW):
+        self.enabled = False
+        self.window = window
+        self.totals: dict[str, float] = {}  # Section -> ms so far this frame
+        self.samples: dict[str, deque] = {name: deque(maxlen=window) for name in SECTIONS}
+        self.blit_samples = deque(maxlen=window)
+        self.blits = 0
+        self.frame = 0
+        self.dump_path = None
+        self.dump_file = None
+        self.dump_writer = None
+        self.dump_frames = None
+        self.real_blt = None
+        self.real_bltm = None
+
+    def section(self, name):
+        if not self.enabled:
+            return NULL_SECTION
+        return Section(self.totals, name)
+
+    def enable(self, dump_path=None, window=PROFILE_WINDOW):
+        # A window of None keeps every frame
+        if dump_path is not None:
+            self.dump_path = dump_path
+            if dump_path.endswith(".json"):
+                self.dump_frames = []
+            else:
+                self.dump_file = open(dump_path, "w", newline="")
+                self.dump_writer = csv.writer(self.dump_file)
+                self.dump_writer.writerow(("frame", "blits") + SECTIONS)
+        if self.enabled:
+            return
+        self.enabled = True
+        self.window = window
+        self.samples = {name: deque(maxlen=window) for name in SECTIONS}
+        self.blit_samples = deque(maxlen=window)
+        self.totals.clear()
+        self.blits = 0
+        self.frame = 0
+        # Screen blits are counted by wrapping pyxel's, only while profiling
+        self.real_blt, self.real_bltm = pyxel.blt, pyxel.bltm
+        pyxel.blt, pyxel.bltm = self.counted(self.real_blt), self.counted(self.real_bltm)
+
+    def disable(self):
+        if not self.enabled:
+            return
+        self.enabled = False
+        pyxel.blt, pyxel.bltm = self.real_blt, self.real_bltm
+        self.close()
+
+    def toggle(self):
+        if self.enabled:
+            self.disable()
+        else:
+            self.enable()
+
+    def counted(self, blit):
+        def counting_blit(*args, **kwargs):
+            self.blits += 1
+            return blit(*args, **kwargs)
+        return counting_blit
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        totals = self.totals
+        for name, samples in self.samples.items():
+            samples.append(totals.get(name, 0.0))
+        self.blit_samples.append(self.blits)
+        if self.dump_writer is not None:
+            self.dump_writer.writerow([self.frame, self.blits] + [f"{totals.get(name, 0.0):.4f}" for name in SECTIONS])
+        if self.dump_frames is not None:
+            self.dump_frames.append({"frame": self.frame, "blits": self.blits, **{name: round(totals.get(name, 0.0), 4) for name in SECTIONS}})
+        totals.clear()
+        self.blits = 0
+        self.frame += 1
+
+    def stats(self, name):
+        # Mean, median, 95th and 99th percentile in ms over the window
+        samples = sorted(self.samples[name])
+        if not samples:
+            return 0.0, 0.0, 0.0, 0.0
+        last = len(samples) - 1
+        return (sum(samples) / len(samples), samples[last // 2], samples[last * 95 // 100], samples[last * 99 // 100])
+
+    def summary(self):
+        return {name: dict(zip(("mean", "p50", "p95", "p99"), self.stats(name))) for name in SECTIONS}
+
+    def close(self):
+        # Finishes the dump file, the rolling window stays for the overlay
+        if self.dump_file is not None:
+            self.dump_file.close()
+            self.dump_file = None
+            self.dump_writer = None
+        if self.dump_frames is not None:
+            with open(self.dump_path, "w") as f:
+                json.dump({"window": self.window, "summary": self.summary(), "frames": self.dump_frames}, f, indent=1)
+            self.dump_frames = None
+        self.dump_path = None
+
+    def draw_overlay(self):
+        # Screen space table: mean, p95 and p99 ms per section and blits per frame
+        if not self.enabled:
+            return
+        pyxel.camera()
+        pyxel.rect(0, 0, 92, 8 + 6 * (len(OVERLAY_SECTIONS) + 1), 0)
+        pyxel.text(1, 1, f"{'ms':8}{'avg':>5}{'p95':>5}{'p99':>5}", 7)
+        y = 8
+        for name in OVERLAY_SECTIONS:
+            mean, _, p95, p99 = self.stats(name)
+            pyxel.text(1, y, f"{name[:8]:8}{mean:5.1f}{p95:5.1f}{p99:5.1f}", 13 if name in ("update", "draw") else 6)
+            y += 6
+        blits = self.blit_samples
+        pyxel.text(1, y, f"blits   {blits[-1] if blits else 0:5}", 6)
+
+profiler = Profiler()
@@ -0,0 +1,178 @@
+import os
+import queue
+import struct
+import threading
+
+from . import state
+from .world import ORES_BY_CODE, OreID, write_atomic
+
+# === Saves ===
+# A save is a directory: save.bin holds the format version, world seed and
+# size, player and inventory, and every chunk changed from what the seed
+# generates has its own chunk file. A chunk file stores the block, variant
+# and ore layers raw, each starting on a page boundary so it can be mapped
+# straight into memory as the chunk's layer. Opening a save only reads the
+# header, chunks are mapped as the player reaches them.
+SAVE_MAGIC = b"MINR"
+SAVE_VERSION = 1
+SAVE_HEADER = struct.Struct("<4sHqii")  # magic, version, seed, width, height (-1 for endless)
+SAVE_PLAYER = struct.Struct("<iiiibBiiqH")  # x, y, dx, dy, direction, is_falling, scroll x/y, money, ore kinds
+SAVE_ORE = struct.Struct("<BI")  # ore code, count
+QUICKSAVE_DIR = os.path.join("saves", "quicksave")  # F5 saves, F9 loads, edits in between are journaled
+
+def pack_player(player, inventory):
+    ores = inventory.get_inventory()
+    data = SAVE_PLAYER.pack(player.x, player.y, player.dx, player.dy, player.direction, player.is_falling,
+                            state.scroll_x, state.scroll_y, inventory.player_money, len(ores))
+    for ore_id, count in ores.items():
+        data += SAVE_ORE.pack(ore_id.value, count)
+    return data
+
+def unpack_player(data, offset=0):
+    (x, y, dx, dy, direction, is_falling, save_scroll_x, save_scroll_y, money, ore_kinds) = SAVE_PLAYER.unpack_from(data, offset)
+    offset += SAVE_PLAYER.size
+    ores = {}
+    for _ in range(ore_kinds):
+        code, count = SAVE_ORE.unpack_from(data, offset)
+        ores[ORES_BY_CODE[code]] = count
+        offset += SAVE_ORE.size
+    return {"player": (x, y, dx, dy, direction, bool(is_falling)), "scroll": (save_scroll_x, save_scroll_y), "money": money, "ores": ores}
+
+def write_save(save_dir, world, player, inventory):
+    world.save(save_dir)
+    data = SAVE_HEADER.pack(SAVE_MAGIC, SAVE_VERSION, world.seed, world.width, -1 if world.height is None else world.height)
+    write_atomic(os.path.join(save_dir, "save.bin"), data + pack_player(player, inventory))
+
+def read_save(save_dir):
+    # The player and inventory come from the journal's snapshot when there
+    # is one, so they match the world with the journal replayed
+    with open(os.path.join(save_dir, "save.bin"), "rb") as f:
+        data = f.read()
+    magic, version, seed, width, height = SAVE_HEADER.unpack_from(data)
+    if magic != SAVE_MAGIC:
+        raise ValueError(f"{save_dir} is not a save")
+    if version != SAVE_VERSION:
+        raise ValueError(f"{save_dir} has save version {version}, expected {SAVE_VERSION}")
+    if os.path.exists(journal_path(save_dir)) and os.path.exists(snapshot_path(save_dir)):
+        with open(snapshot_path(save_dir), "rb") as f:
+            data, offset = f.read(), 0
+    else:
+        offset = SAVE_HEADER.size
+    return {"seed": seed, "width": width, "height": None if height < 0 else height, **unpack_player(data, offset)}
+
+# === Edit Journal ===
+# Every block and ore edit after the last save is appended to journal.bin in
+# the save directory as one fixed-size record: tick, x, y, block before and
+# after, the ore taken out of the cell and what made the edit. Loading maps
+# the save and replays the journal on top, so autosaving is an append and the
+# file doubles as an audit trail of everything mined. The player and inventory
+# are snapshotted to player.bin after every batch of records is written, so a
+# load puts them back as they were when the world last was.
+JOURNAL_MAGIC = b"MINJ"
+JOURNAL_VERSION = 1
+JOURNAL_HEADER = struct.Struct("<4sHqii")  # magic, version, seed, width, height (-1 for endless)
+JOURNAL_RECORD = struct.Struct("<IiiBBBB")  # tick, x, y, old block, new block, ore removed, kind
+EDIT_PLAYER = 0  # Dug or placed by a player, also every record of older journals
+EDIT_PHYSICS = 1  # Moved by the cell physics, replayed but not counted as mining
+JOURNAL_FLUSH_TICKS = 30  # Hand the pending records to the writer thread once a second
+
+def journal_path(save_dir):
+    return os.path.join(save_dir, "journal.bin")
+
+def snapshot_path(save_dir):
+    return os.path.join(save_dir, "player.bin")
+
+class EditJournal:
+    # Records are packed on the game thread into a pending buffer and written
+    # out in batches by a background thread, so an edit never waits on disk
+    def __init__(self, path, world, truncate=False):
+        self.tick = 0
+        self.pending = bytearray()
+        self.batches = queue.Queue()
+        self.snapshot = snapshot_path(os.path.dirname(path))
+        new = truncate or not os.path.exists(path) or os.path.getsize(path) < JOURNAL_HEADER.size
+        self.file = open(path, "wb" if new else "ab")
+        if new:
+            self.file.write(JOURNAL_HEADER.pack(JOURNAL_MAGIC, JOURNAL_VERSION, world.seed, world.width,
+                                                -1 if world.height is None else world.height))
+            self.file.flush()
+            if os.path.exists(self.snapshot):
+                os.remove(self.snapshot)  # Belongs to an older journal, the save has the player now
+        else:
+            # A record cut off by a crash mid-write would shift every record
+            # appended after it, so it goes before anything is appended
+            size = os.path.getsize(path)
+            self.file.truncate(size - (size - JOURNAL_HEADER.size) % JOURNAL_RECORD.size)
+        self.writer = threading.Thread(target=self.write_batches, daemon=True)
+        self.writer.start()
+
+    def record(self, x, y, old_block, new_block, ore=OreID.NONE.value, kind=EDIT_PLAYER):
+        self.pending += JOURNAL_RECORD.pack(self.tick, x, y, old_block, new_block, ore, kind)
+
+    def flush(self):
+        # The player moves without editing anything, so the snapshot goes
+        # along even when there are no records
+        self.batches.put((bytes(self.pending), pack_player(state.player, state.inventory_handler)))
+        self.pending.clear()
+
+    def write_batches(self):
+        while True:
+            batch = self.batches.get()
+            if batch is None:
+                break
+            records, snapshot = batch
+            if records:
+                self.file.write(records)
+                self.file.flush()
+            write_atomic(self.snapshot, snapshot)
+
+    def close(self):
+        self.flush()
+        self.batches.put(None)
+        self.writer.join()
+        self.file.close()
+
+def read_journal(path, world=None):
+    # Yields (tick, x, y, old block, new block, ore, kind) records. A record cut off
+    # by a crash mid-write is dropped.
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < JOURNAL_HEADER.size:
+        return
+    magic, version, seed, width, height = JOURNAL_HEADER.unpack_from(data)
+    if magic != JOURNAL_MAGIC:
+        raise ValueError(f"{path} is not an edit journal")
+    if version != JOURNAL_VERSION:
+        raise ValueError(f"{path} has journal version {version}, expected {JOURNAL_VERSION}")
+    if world is not None and (seed, width) != (world.seed, world.width):
+        raise ValueError(f"{path} belongs to another world")
+    end = JOURNAL_HEADER.size + (len(data) - JOURNAL_HEADER.size) // JOURNAL_RECORD.size * JOURNAL_RECORD.size
+    yield from JOURNAL_RECORD.iter_unpack(memoryview(data)[JOURNAL_HEADER.size:end])
+
+def replay_journal(world, path):
+    # Writes straight to the world layers, meant to run before any handler
+    # listens to the world so they all see the edited chunks on load
+    no_ore = OreID.NONE.value
+    count = 0
+    for tick, x, y, old_block, new_block, ore, kind in read_journal(path, world):
+        if old_block != new_block:
+            world.blocks.set(x, y, new_block)
+        if ore != no_ore:
+            world.ores.set(x, y, no_ore)
+        count += 1
+    return count
+
+def audit_journal(save_dir):
+    # Edits and ores mined since the last full save, cell physics moves apart
+    edits, moves, mined = 0, 0, {}
+    for tick, x, y, old_block, new_block, ore, kind in read_journal(journal_path(save_dir)):
+        if kind == EDIT_PHYSICS:
+            moves += 1
+            continue
+        edits += 1
+        if ore != OreID.NONE.value:
+            ore_id = ORES_BY_CODE[ore]
+            mined[ore_id] = mined.get(ore_id, 0) + 1
+    print(f"{edits} edits since the last save, {moves} cells moved by physics")
+    for ore_id, count in mined.items():
+        print(f"  {ore_id.name.capitalize()}: {count} mined")
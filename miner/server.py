@@ -0,0 +1,280 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+from . import state
+from .constants import TICK_TIME
+from .entities import update_entities
+from .handlers import InventoryHandler, MiningHelper
+from .controls import InputHandler, pack_actions, unpack_actions
+from .player import Player
+from .simulation import Simulation, soak_actions
+from .net import (
+    ENTITY_ENEMY,
+    ENTITY_FALLING,
+    MSG_DELTA,
+    MSG_INPUT,
+    INPUT,
+    encode_chunk,
+    encode_delta,
+    encode_hello,
+    encode_input,
+    encode_inventory,
+    frame,
+    read_frame,
+)
+
+HELD_BITS = pack_actions({action: (False, True) for action in ("left", "right", "down", "jump")})
+INPUT_BACKLOG = 8  # Ticks of input kept per player, older ones are dropped after a stall
+VIEW_MARGIN = 64  # Pixels around a player's view that entities are still sent for
+
+class EditFeed:
+    # Stands in for the edit journal while serving: every edit marks its cell
+    # for the next delta, and goes on to the real journal if there is one
+    def __init__(self, journal=None):
+        self.journal = journal
+        self.tick = 0
+        self.cells = {}  # (x, y) -> None, an ordered set
+
+    def record(self, x, y, old_block, new_block, *ore, **kind):
+        self.cells[(x, y)] = None
+        if self.journal is not None:
+            self.journal.tick = self.tick
+            self.journal.record(x, y, old_block, new_block, *ore, **kind)
+
+    def take(self):
+        cells = list(self.cells)
+        self.cells.clear()
+        return cells
+
+    def flush(self):
+        if self.journal is not None:
+            self.journal.flush()
+
+    def close(self):
+        if self.journal is not None:
+            self.journal.close()
+
+class Seat:
+    # One connected player, with everything the single player game keeps in
+    # the state module for its player. The server binds a seat into the state
+    # module while that player updates, so Player and the handlers run as is.
+    def __init__(self, seat_id, x, writer):
+        self.id = seat_id
+        self.player = Player(x, 0)
+        self.input = InputHandler()
+        self.mining_helper = MiningHelper()
+        self.inventory = InventoryHandler()
+        self.scroll = (0, 0)
+        self.inputs = deque(maxlen=INPUT_BACKLOG)
+        self.last_input = 0
+        self.writer = writer
+        self.sent_entities = {}  # Entity id -> what this client was last sent
+        self.sent_inventory = None
+        self.bytes_sent = 0
+
+    def bind(self):
+        state.player, state.input, state.mining_helper, state.inventory_handler = self.player, self.input, self.mining_helper, self.inventory
+        state.scroll_x, state.scroll_y = self.scroll
+
+    def unbind(self):
+        self.scroll = (state.scroll_x, state.scroll_y)
+
+    def next_actions(self):
+        # One queued input per tick. Without one the keys stay held but
+        # nothing counts as pressed again.
+        if self.inputs:
+            self.last_input = self.inputs.popleft()
+            return unpack_actions(self.last_input)
+        return unpack_actions(self.last_input & HELD_BITS)
+
+    def send(self, payload):
+        data = frame(payload)
+        self.bytes_sent += len(data)
+        self.writer.write(data)
+
+class GameServer:
+    # Authoritative game for many players: one world, ticked at the fixed rate
+    # on the event loop. Clients only send their packed input per tick, and
+    # get back the cells edited in each tick and the entities in their view
+    # that changed, see miner.net for the frames.
+    def __init__(self, seed=0, world_height=None):
+        self.simulation = Simulation(seed, world_height, lighting=False)
+        self.world = self.simulation.world
+        self.feed = EditFeed(state.journal)
+        state.journal = self.feed
+        self.seats: dict[int, Seat] = {}
+        self.next_id = 1
+        self.enemy_ids = {}  # Enemy handle -> entity id
+        self.tick_times = deque(maxlen=1000)  # Milliseconds per tick, simulation and encoding
+        self.server = None
+
+    def new_id(self):
+        entity_id = self.next_id
+        self.next_id += 1
+        return entity_id
+
+    async def handle(self, reader, writer):
+        seat_id = self.new_id()
+        seat = Seat(seat_id, seat_id * 16 % (self.world.width * 8 - 8), writer)
+        # Everything a newcomer cannot generate from the seed: the edited chunks
+        seat.send(encode_hello(seat_id, self.world))
+        for cy in sorted(self.world.edited):
+            seat.send(encode_chunk(self.world.chunks.get(cy) or self.world.load_chunk(cy)))
+        self.seats[seat_id] = seat
+        logging.info(f"Player {seat_id} joined, {len(self.seats)} playing")
+        try:
+            while True:
+                payload = await read_frame(reader)
+                if payload[0] == MSG_INPUT:
+                    seat.inputs.append(INPUT.unpack(payload)[1])
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            del self.seats[seat_id]
+            writer.close()
+            logging.info(f"Player {seat_id} left, {len(self.seats)} playing")
+
+    def tick(self):
+        simulation = self.simulation
+        self.feed.tick = simulation.tick_count
+        for seat in list(self.seats.values()):
+            seat.bind()
+            state.input.apply(seat.next_actions())
+            state.player.update()
+            seat.unbind()
+        update_entities([(seat.player.x, seat.player.y) for seat in self.seats.values()])
+        state.cells.update([seat.player for seat in self.seats.values()])
+        self.world.stream_rows([seat.player.y // 8 for seat in self.seats.values()] or [0])
+        simulation.tick_count += 1
+        self.broadcast()
+
+    def entity_states(self):
+        # Entity id -> (x, y, direction, flags) of every player and enemy
+        entities = {seat.id: (seat.player.x, seat.player.y, seat.player.direction, ENTITY_FALLING if seat.player.is_falling else 0)
+                    for seat in self.seats.values()}
+        handles = set(state.enemies.handles)
+        for handle in [handle for handle in self.enemy_ids if handle not in handles]:
+            del self.enemy_ids[handle]
+        for handle in state.enemies.handles:
+            entity_id = self.enemy_ids.get(handle)
+            if entity_id is None:
+                entity_id = self.enemy_ids[handle] = self.new_id()
+            entities[entity_id] = (handle.x, handle.y, handle.direction, ENTITY_ENEMY)
+        return entities
+
+    def broadcast(self):
+        world = self.world
+        cells = [(x, y, world.blocks.get(x, y), world.ores.get(x, y)) for x, y in self.feed.take()]
+        entities = self.entity_states()
+        for seat in self.seats.values():
+            (scroll_x, scroll_y) = seat.scroll
+            x0, y0 = scroll_x - VIEW_MARGIN, scroll_y - VIEW_MARGIN
+            x1, y1 = scroll_x + 128 + VIEW_MARGIN, scroll_y + 128 + VIEW_MARGIN
+            sent = seat.sent_entities
+            changed, seen = [], set()
+            for entity_id, values in entities.items():
+                if not (x0 <= values[0] <= x1 and y0 <= values[1] <= y1):
+                    continue
+                seen.add(entity_id)
+                if sent.get(entity_id) != values:
+                    sent[entity_id] = values
+                    changed.append((entity_id, values))
+            gone = [entity_id for entity_id in sent if entity_id not in seen]
+            for entity_id in gone:
+                del sent[entity_id]
+            if cells or changed or gone:
+                seat.send(encode_delta(self.simulation.tick_count, seat.scroll, cells, changed, gone))
+            inventory = (seat.inventory.player_money, dict(seat.inventory.ores))
+            if inventory != seat.sent_inventory:
+                seat.sent_inventory = inventory
+                seat.send(encode_inventory(seat.inventory))
+
+    async def serve(self, host="127.0.0.1", port=0):
+        self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def run(self, ticks=None):
+        # Fixed rate ticks on the event loop until ticks have passed
+        next_tick = time.perf_counter()
+        start = self.simulation.tick_count
+        while ticks is None or self.simulation.tick_count - start < ticks:
+            began = time.perf_counter()
+            self.tick()
+            self.tick_times.append((time.perf_counter() - began) * 1000)
+            next_tick += TICK_TIME
+            await asyncio.sleep(max(next_tick - time.perf_counter(), 0))
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+        for seat in list(self.seats.values()):
+            seat.writer.close()
+        self.feed.close()
+        state.journal = None
+
+def run_server(seed=0, host="127.0.0.1", port=7777):
+    async def main():
+        server = GameServer(seed)
+        port_used = await server.serve(host, port)
+        logging.info(f"Serving world {seed} on {host}:{port_used}")
+        try:
+            await server.run()
+        finally:
+            server.close()
+    asyncio.run(main())
+
+# === Load Test ===
+async def bot(port, number, ticks, stats):
+    # A scripted client: sends one input per tick and reads every frame
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    received = {"join": 0, "game": 0, "cells": 0}
+    joined = False
+
+    async def receive():
+        nonlocal joined
+        while True:
+            payload = await read_frame(reader)
+            if payload[0] == MSG_DELTA:
+                joined = True
+                received["cells"] += int.from_bytes(payload[13:15], "little")
+            received["game" if joined else "join"] += len(payload) + 4
+
+    reading = asyncio.ensure_future(receive())
+    offset = number * 37  # Every bot plays its own stretch of the script
+    next_tick = time.perf_counter()
+    for tick in range(ticks):
+        writer.write(frame(encode_input(pack_actions(soak_actions(tick + offset)))))
+        next_tick += TICK_TIME
+        await asyncio.sleep(max(next_tick - time.perf_counter(), 0))
+    reading.cancel()
+    writer.close()
+    stats.append(received)
+
+def run_load_test(bots=100, ticks=300, seed=0):
+    # Server and bots share one event loop, the tick times only cover the server's tick
+    logging.getLogger().setLevel(logging.WARNING)
+
+    async def main():
+        server = GameServer(seed)
+        port = await server.serve()
+        stats = []
+        clients = [asyncio.ensure_future(bot(port, number, ticks, stats)) for number in range(bots)]
+        await asyncio.sleep(0.5)  # Let everyone join before timing
+        server.tick_times.clear()
+        await server.run(ticks)
+        await asyncio.gather(*clients)
+        server.close()
+        return server, stats
+
+    server, stats = asyncio.run(main())
+    times = sorted(server.tick_times)
+    seconds = len(times) * TICK_TIME
+    game = sorted(entry["game"] for entry in stats)
+    print(f"{bots} bots, {len(times)} ticks: tick {sum(times) / len(times):.2f} ms mean, "
+          f"{times[len(times) * 95 // 100]:.2f} ms p95, {times[-1]:.2f} ms max (budget {TICK_TIME * 1000:.1f} ms)")
+    print(f"per client: {sum(game) / len(game) / seconds / 1024:.2f} KiB/s mean, {game[-1] / seconds / 1024:.2f} KiB/s max, "
+          f"join {sum(entry['join'] for entry in stats) / len(stats) / 1024:.1f} KiB, "
+          f"{sum(entry['cells'] for entry in stats) / len(stats):.0f} cell edits received")
+    return server, stats
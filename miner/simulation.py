@@ -0,0 +1,192 @@
+import hashlib
+import logging
+import os
+import time
+import struct
+
+from . import state
+from .constants import MAP_SIZE_BLOCKS_X, MAX_TICKS_PER_UPDATE, TICK_TIME
+from .world import WorldGenerator, WorldStore
+from .saves import EditJournal, JOURNAL_FLUSH_TICKS, journal_path, read_save, replay_journal, write_save
+from .entities import EntityStore, SpatialHash, update_entities
+from .lighting import DarknessSystem, OVERLAY_BLOCKS
+from .caves import CaveRegions
+from .pathfinding import NavGraph, PathService
+from .cells import CellPhysics
+from .handlers import BlocksHandler, InventoryHandler, MiningHelper, OresHandler, TriggerZonesHandler
+from .controls import InputHandler, RecordedInput
+from .player import Player
+from .profiler import profiler
+
+class Simulation:
+    # Owns the game state (world, player and handlers) and advances it in fixed
+    # ticks. It never touches the window, so App drives it from pyxel's update
+    # callback and batch runners drive it headless as fast as it can go. The
+    # handlers reach each other through the module globals, so only one
+    # simulation is live at a time.
+    def __init__(self, seed=None, world_height=None, lighting=True, save_dir=None, ore_table=None):
+        state.scroll_x, state.scroll_y = 0, 0
+        state.entity_index = SpatialHash()
+        state.enemies = EntityStore(state.entity_index)
+        self.tick_count = 0
+        self.accumulator = 0.0
+        self.pressed = set()  # Actions pressed since the last tick
+        self.recorder = None
+        self.world = WorldStore(MAP_SIZE_BLOCKS_X, world_height, WorldGenerator(seed, ore_table=ore_table), save_dir=save_dir)
+        if state.journal is not None:
+            state.journal.close()
+            state.journal = None
+        if save_dir is not None:
+            # Edits made after the save was written, replayed before the handlers load any chunk
+            if os.path.exists(journal_path(save_dir)):
+                replay_journal(self.world, journal_path(save_dir))
+            state.journal = EditJournal(journal_path(save_dir), self.world)
+        state.player = Player(0, 0)
+        state.input = InputHandler()
+        state.mining_helper = MiningHelper()
+        state.blocks_handler = BlocksHandler(self.world)
+        state.ore_handler = OresHandler(self.world)
+        state.cave_regions = CaveRegions(self.world)
+        state.paths = PathService(NavGraph(self.world))
+        state.inventory_handler = InventoryHandler()
+        # Lighting only matters to what is drawn, headless runs can leave it out
+        state.darkness_system = None
+        if lighting:
+            state.darkness_system = DarknessSystem()
+            self.world.add_listener(state.darkness_system)
+        state.trigger_zones_handler = TriggerZonesHandler()
+        state.cells = CellPhysics(self.world)
+
+    def tick(self, actions):
+        if state.journal is not None:
+            state.journal.tick = self.tick_count
+            if self.tick_count % JOURNAL_FLUSH_TICKS == 0:
+                state.journal.flush()
+        if self.recorder is not None:
+            self.recorder.record(actions)
+        if profiler.enabled:
+            with profiler.section("input"):
+                state.input.apply(actions)
+            with profiler.section("player"):
+                state.player.update()
+            with profiler.section("entities"):
+                update_entities()
+            with profiler.section("physics"):
+                state.cells.update()
+            with profiler.section("stream"):
+                self.world.stream(state.player.y // 8)
+        else:
+            # Same steps without the timers, ticks run far more often than frames
+            state.input.apply(actions)
+            state.player.update()
+            update_entities()
+            state.cells.update()
+            self.world.stream(state.player.y // 8)
+        self.tick_count += 1
+
+    def advance(self, elapsed, actions):
+        # Runs as many fixed ticks as fit in the elapsed real time. A key press
+        # only counts for the first of them, holding carries over to all. A
+        # press on a frame too short for a tick waits for the next tick.
+        self.accumulator = min(self.accumulator + elapsed, MAX_TICKS_PER_UPDATE * TICK_TIME)
+        self.pressed.update(action for action, (pressed, held) in actions.items() if pressed)
+        ticks = 0
+        while self.accumulator >= TICK_TIME:
+            self.accumulator -= TICK_TIME
+            self.tick({action: (action in self.pressed, held) for action, (pressed, held) in actions.items()})
+            self.pressed.clear()
+            ticks += 1
+        return ticks
+
+    def run(self, source, ticks=None, lighting=False):
+        # Ticks as fast as possible until the source runs out or ticks have
+        # passed. With lighting the light around the player is brought up to
+        # date every tick, as drawing a frame would.
+        end = None if ticks is None else self.tick_count + ticks
+        while end is None or self.tick_count < end:
+            actions = source.actions(self.tick_count)
+            if actions is None:
+                break
+            self.tick(actions)
+            if lighting and state.darkness_system is not None:
+                with profiler.section("lighting"):
+                    state.darkness_system.update_lighting(state.player.x, state.player.y)
+                    x0, y0 = state.scroll_x // 8, state.scroll_y // 8
+                    state.darkness_system.refresh_view(x0, y0, x0 + OVERLAY_BLOCKS - 1, y0 + OVERLAY_BLOCKS - 1)
+            if profiler.enabled:
+                profiler.end_frame()  # A headless frame is one tick
+        return self.tick_count
+
+    def state_hash(self):
+        # Digest of everything a tick can change: the player, the inventory and every edited chunk
+        digest = hashlib.sha256()
+        digest.update(struct.pack("<iiiiib?q", self.tick_count, state.player.x, state.player.y, state.player.dx, state.player.dy,
+                                  state.player.direction, state.player.is_falling, state.inventory_handler.player_money))
+        for ore_id, count in sorted((ore_id.value, count) for ore_id, count in state.inventory_handler.ores.items()):
+            digest.update(struct.pack("<BI", ore_id, count))
+        for cy in sorted(self.world.edited):
+            chunk = self.world.chunks.get(cy) or self.world.load_chunk(cy)
+            digest.update(struct.pack("<i", cy))
+            for layer in chunk.layers:
+                digest.update(layer)
+        return digest.hexdigest()[:16]
+
+    def save(self, save_dir):
+        # A full save holds every edit so far, the journal starts over after it
+        if state.journal is not None:
+            state.journal.close()
+        write_save(save_dir, self.world, state.player, state.inventory_handler)
+        state.journal = EditJournal(journal_path(save_dir), self.world, truncate=True)
+
+    def close(self):
+        if state.journal is not None:
+            state.journal.close()
+            state.journal = None
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+
+    @classmethod
+    def load(cls, save_dir, lighting=True):
+        saved = read_save(save_dir)
+        if saved["width"] != MAP_SIZE_BLOCKS_X:
+            raise ValueError(f"{save_dir} is {saved['width']} blocks wide, expected {MAP_SIZE_BLOCKS_X}")
+        simulation = cls(saved["seed"], saved["height"], lighting, save_dir)
+        (state.player.x, state.player.y, state.player.dx, state.player.dy, state.player.direction, state.player.is_falling) = saved["player"]
+        state.scroll_x, state.scroll_y = saved["scroll"]
+        state.inventory_handler.player_money = saved["money"]
+        state.inventory_handler.ores = saved["ores"]
+        return simulation
+
+
+def soak_actions(tick):
+    # Scripted input for headless runs: dig down, wander sideways and jump now and then
+    phase = tick // 90 % 4
+    actions = {action: (False, False) for action in ("left", "right", "down", "jump")}
+    actions["down"] = (tick % 90 == 0, phase != 3)
+    actions["left" if phase == 1 else "right"] = (tick % 90 == 0, phase in (1, 2))
+    actions["jump"] = (tick % 150 == 0, tick % 150 == 0)
+    return actions
+
+
+def run_headless(source, seed=0, world_height=None, ticks=None, lighting=False, profile_path=None):
+    # Batch runner: no window, no audio and no debug logging
+    logging.getLogger().setLevel(logging.WARNING)
+    simulation = Simulation(seed, world_height, lighting=lighting)
+    if profile_path is not None:
+        profiler.enable(profile_path, window=None)  # Percentiles over the whole run
+    start = time.perf_counter()
+    ran = simulation.run(source, ticks, lighting)
+    elapsed = time.perf_counter() - start
+    if profile_path is not None:
+        profiler.disable()
+        for name in ("input", "player", "entities", "physics", "stream", "lighting"):
+            mean, p50, p95, p99 = profiler.stats(name)
+            print(f"{name:9} {mean:7.3f} ms mean {p50:7.3f} p50 {p95:7.3f} p95 {p99:7.3f} p99")
+    print(f"{ran} ticks in {elapsed:.2f}s ({ran / elapsed:.0f} ticks/s), player at {state.player.x},{state.player.y}, "
+          f"money {state.inventory_handler.player_money}, state {simulation.state_hash()}")
+    return simulation
+
+def run_replay(path, lighting=False, profile_path=None):
+    recording = RecordedInput(path)
+    return run_headless(recording, recording.seed, recording.world_height, lighting=lighting, profile_path=profile_path)
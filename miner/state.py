@@ -0,0 +1,18 @@
+# Live game state shared by the modules. Simulation binds these when it
+# starts; everything else reads them as state.player, state.blocks_handler
+# and so on, so there is only ever one live game.
+scroll_x, scroll_y = 0, 0
+player = None
+input = None
+mining_helper = None
+blocks_handler = None
+ore_handler = None
+inventory_handler = None
+trigger_zones_handler = None
+darkness_system = None
+cave_regions = None
+paths = None
+cells = None
+journal = None
+enemies = []
+entity_index = None
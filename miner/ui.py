@@ -0,0 +1,298 @@
+import pyxel
+import logging
+import os
+import threading
+import time
+
+from . import audio, state
+from .constants import SCREEN_H, SCREEN_W, TRANSPARENT_COLOR
+from .world import BLOCKS_BY_CODE, BlockID, CHUNK_SIZE, LAYER_BLOCKS
+from .saves import QUICKSAVE_DIR
+from .controls import InputRecorder, LiveInput, pack_actions
+from .net import NetClient, RemoteGame
+from .simulation import Simulation
+from .profiler import profiler
+
+ASSETS_PATH = "assets/miner.pyxres"
+START_CHUNK_ROWS = 2  # Chunk rows around the spawn generated behind the loading screen
+STARTUP_TIMES_SHOWN = 90  # Frames the startup times stay on screen once the game is up
+PREVIEW_COLORS = {
+    BlockID.AIR: 0,
+    BlockID.GRASS: 11,
+    BlockID.DIRT: 4,
+    BlockID.STONE: 13,
+    BlockID.HARD_STONE: 5,
+    BlockID.MAGMA_ROCK: 8,
+    BlockID.GRAVEL: 6,
+    BlockID.MAGMA: 9,
+}
+PREVIEW_COLOR_BY_CODE = [PREVIEW_COLORS.get(block_id, 0) for block_id in BLOCKS_BY_CODE]
+
+class Assets:
+    # The resource file is loaded on first use, after the loading screen is up
+    loaded = False
+
+    @classmethod
+    def load(cls):
+        if cls.loaded:
+            return
+        pyxel.load(ASSETS_PATH)
+        # Change enemy spawn tiles invisible
+        pyxel.images[0].rect(0, 8, 24, 8, TRANSPARENT_COLOR)
+        # Gravel and magma have no tiles in the resource file, they are the
+        # stone and magma rock tiles in other colors
+        cls.recolor((48, 64), (64, 64), {13: 6, 4: 5})
+        cls.recolor((48, 144), (64, 80), {8: 9, 9: 10})
+        cls.loaded = True
+
+    @staticmethod
+    def recolor(source, target, colors):
+        # Copies the 16x16 block of variants at source to target, remapping colors
+        image = pyxel.images[0]
+        for y in range(16):
+            for x in range(16):
+                color = image.pget(source[0] + x, source[1] + y)
+                image.pset(target[0] + x, target[1] + y, colors.get(color, color))
+
+class WorldLoader:
+    # Builds the simulation and generates the chunks around the spawn on a
+    # background thread, the window keeps drawing the loading screen meanwhile.
+    # The simulation only becomes visible to the caller once it is complete.
+    def __init__(self, rows=START_CHUNK_ROWS):
+        self.rows = rows
+        self.done = 0
+        self.world = None
+        self.simulation = None
+        self.error = None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        try:
+            simulation = Simulation()
+            self.world = simulation.world
+            for cy in range(self.rows):
+                simulation.world.chunk(cy)
+                self.done = cy + 1
+            self.simulation = simulation
+        except Exception as error:
+            self.error = error
+
+class App:
+    # The window opens straight onto a loading screen: assets load on the
+    # first update, the world generates in the background and the terrain of
+    # the starting chunks is pre-rendered one chunk per frame. The times to
+    # the first frame and to the game being playable are logged and shown.
+    # Given a server address (host, port) it plays as a thin client instead:
+    # input goes to the server and the game shows what comes back.
+    def __init__(self, record_path=None, started=None, profile_path=None, connect=None):
+        self.started = time.perf_counter() if started is None else started
+        self.record_path = record_path
+        self.first_frame_time = None
+        self.ready_time = None
+        self.ready_frames = 0
+        self.simulation = None
+        self.loader = None
+        self.connect = connect
+        self.client = None
+        self.remote = None
+        self.preview = None
+        self.preview_rows = set()
+        self.source = LiveInput()
+        self.last_update = None
+        if profile_path is not None:
+            profiler.enable(profile_path)
+        pyxel.init(SCREEN_W, SCREEN_H, title="2D Miner")
+        pyxel.run(self.update, self.draw)
+
+    def update(self):
+        if pyxel.btn(pyxel.KEY_Q):
+            if self.client is not None:
+                self.client.close()
+            elif self.simulation is not None:
+                self.simulation.close()
+            profiler.disable()
+            pyxel.quit()
+        if self.simulation is None:
+            self.update_loading()
+            return
+
+        if pyxel.btnp(pyxel.KEY_F3):
+            profiler.toggle()
+        if self.remote is not None:
+            self.update_remote()  # Saves belong to the server
+            return
+        if pyxel.btnp(pyxel.KEY_F5):
+            self.simulation.save(QUICKSAVE_DIR)
+        if pyxel.btnp(pyxel.KEY_F9) and os.path.exists(os.path.join(QUICKSAVE_DIR, "save.bin")):
+            if self.simulation.recorder is not None:
+                # A recording replays from the seed, a load in the middle would not replay
+                logging.warning("Quickload is off while recording")
+            else:
+                self.simulation.close()
+                self.simulation = Simulation.load(QUICKSAVE_DIR)
+
+        with profiler.section("update"):
+            now = time.perf_counter()
+            actions = self.source.actions(self.simulation.tick_count)
+            self.simulation.advance(now - self.last_update, actions)
+            self.last_update = now
+
+    def update_remote(self):
+        # One input per frame, the window runs at the tick rate
+        if self.client.error is not None:
+            raise self.client.error
+        with profiler.section("update"):
+            for payload in self.client.pending():
+                self.remote.apply(payload)
+            self.client.send_input(pack_actions(self.source.actions(self.remote.tick)))
+
+    def update_loading(self):
+        if self.first_frame_time is None:
+            return  # Nothing heavy until the loading screen has been drawn once
+        if self.loader is None and self.client is None:
+            if self.connect is not None:
+                self.client = NetClient(*self.connect)
+                self.remote = RemoteGame()
+            else:
+                self.loader = WorldLoader()
+            Assets.load()
+            return
+        if self.client is not None:
+            simulation = self.receive_world()
+        else:
+            if self.loader.error is not None:
+                raise self.loader.error
+            simulation = self.loader.simulation
+        if simulation is None:
+            return
+        # Terrain images of the loaded chunks, one per frame
+        for cy in sorted(simulation.world.chunks):
+            if cy not in state.blocks_handler.chunk_images:
+                state.blocks_handler.chunk_image(cy)
+                return
+        self.start(simulation)
+
+    def receive_world(self):
+        # The simulation exists once the server's hello is in, the chunks it
+        # sends after that arrive before the first delta
+        if self.client.error is not None:
+            raise self.client.error
+        had_world = self.remote.simulation is not None
+        for payload in self.client.pending():
+            self.remote.apply(payload)
+        simulation = self.remote.simulation
+        if simulation is not None and not had_world:
+            for cy in range(START_CHUNK_ROWS):
+                simulation.world.chunk(cy)
+        return simulation
+
+    def start(self, simulation):
+        self.simulation = simulation
+        if self.record_path is not None:
+            simulation.recorder = InputRecorder(self.record_path, simulation.world)
+        audio.audio_enabled = True
+        pyxel.playm(0, loop=True)
+        self.ready_time = time.perf_counter() - self.started
+        logging.info(f"Startup: first frame after {self.first_frame_time * 1000:.0f} ms, playable after {self.ready_time * 1000:.0f} ms")
+        self.last_update = time.perf_counter()
+
+    def draw(self):
+        if self.simulation is None:
+            self.draw_loading()
+            if self.first_frame_time is None:
+                self.first_frame_time = time.perf_counter() - self.started
+            return
+        with profiler.section("draw"):
+            self.draw_game()
+        profiler.draw_overlay()
+        profiler.end_frame()
+
+    def draw_game(self):
+        pyxel.cls(0)
+
+        # Draw level
+        pyxel.camera()
+
+        # pyxel.bltm(0, 0, 2, (scroll_x // 4) % 128, (scroll_y // 4) % 128, 128, 128) # Background
+        # pyxel.bltm(0, 0, 1, scroll_x, scroll_y, 128, 128, TRANSPARENT_COLOR) # Foreground
+
+        # Render map with block handler:
+        with profiler.section("blocks"):
+            state.blocks_handler.draw()
+        # Render fog of war:
+
+        # Draw block mining markers
+        # Player left, right, down - draw a mark around the blocks
+
+        # Draw characters
+        pyxel.camera(state.scroll_x, state.scroll_y)
+        state.player.draw()
+        if self.remote is not None:
+            self.remote.draw_players()
+        # draw block markers?
+        state.player.draw_block_markers()
+        state.enemies.draw((state.scroll_x, state.scroll_y, state.scroll_x + SCREEN_W - 1, state.scroll_y + SCREEN_H - 1))
+
+        # Trigger zones
+        state.trigger_zones_handler.draw_zones()
+
+        # Lightning
+        with profiler.section("lighting"):
+            state.darkness_system.update_lighting(state.player.x, state.player.y)
+        with profiler.section("darkness"):
+            state.darkness_system.render_darkness()
+
+        # Draw gizmos
+        state.mining_helper.draw()
+
+        # UI
+        with profiler.section("ui"):
+            state.inventory_handler.draw_ui()
+            if self.ready_frames < STARTUP_TIMES_SHOWN:
+                self.ready_frames += 1
+                pyxel.text(state.scroll_x + 1, state.scroll_y + SCREEN_H - 6, self.startup_text(), 7)
+
+    def startup_text(self):
+        text = f"1st frame {self.first_frame_time * 1000:.0f}ms"
+        if self.ready_time is not None:
+            text += f" ready {self.ready_time * 1000:.0f}ms"
+        return text
+
+    def draw_loading(self):
+        # Title, progress bar and a minimap of the chunks generated so far
+        pyxel.cls(0)
+        pyxel.camera()
+        pyxel.text(SCREEN_W // 2 - 30, 20, "2D MINER", 7)
+        loader = self.loader
+        total = START_CHUNK_ROWS * 2 + 1
+        done = 0
+        if loader is not None:
+            done = 1 + loader.done
+            if loader.simulation is not None:
+                done += len(state.blocks_handler.chunk_images)
+            self.draw_preview(loader.world)
+        pyxel.rect(14, 100, SCREEN_W - 28, 5, 1)
+        pyxel.rect(14, 100, (SCREEN_W - 28) * min(done, total) // total, 5, 11)
+        pyxel.text(14, 108, "LOADING", 7)
+        if self.first_frame_time is not None:
+            pyxel.text(14, 116, self.startup_text(), 5)
+
+    def draw_preview(self, world):
+        # One pixel per block, each chunk is drawn into the preview once
+        if world is None:
+            return
+        if self.preview is None:
+            self.preview = pyxel.Image(world.width, START_CHUNK_ROWS * CHUNK_SIZE)
+            self.preview.cls(0)
+        for cy, chunk in list(world.chunks.items()):
+            if cy in self.preview_rows or cy >= START_CHUNK_ROWS:
+                continue
+            self.preview_rows.add(cy)
+            y0, y1 = world.chunk_rows(cy)
+            blocks = chunk.layers[LAYER_BLOCKS]
+            for y in range(y0, y1):
+                start = (y - y0) * world.width
+                for x in range(world.width):
+                    self.preview.pset(x, y, PREVIEW_COLOR_BY_CODE[blocks[start + x]])
+        pyxel.blt((SCREEN_W - world.width) // 2, 32, self.preview, 0, 0, world.width, START_CHUNK_ROWS * CHUNK_SIZE)
@@ -0,0 +1,657 @@
+from enum import Enum, auto
+from functools import partial
+import json
+import os
+import random
+import tempfile
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import mmap
+except ImportError:  # Not available on WebAssembly, saves are read into memory instead
+    mmap = None
+
+try:
+    import numpy as np
+except ImportError:  # The web build runs without numpy, fall back to pure Python
+    np = None
+
+from .constants import MAP_SIZE_BLOCKS_Y
+
+class BlockID(Enum):
+    AIR = auto()
+    GRASS = auto()
+    DIRT = auto()
+    STONE = auto()
+    HARD_STONE = auto()
+    MAGMA_ROCK = auto()
+    GRAVEL = auto()  # Falls when nothing holds it up
+    MAGMA = auto()  # Molten, flows down and levels out
+
+class OreID(Enum):
+    NONE = auto()
+    GOLD = auto()
+    DIAMONDS = auto()
+    MITHRIL = auto()
+    ALIENIUM = auto()
+
+# === Compact World Store ===
+# Every layer is a flat bytearray indexed as y*width+x. Cells hold the small-int
+# enum values (BlockID.value / OreID.value) instead of Enum objects, so a lookup
+# is one multiply-add and one byte read instead of building and hashing a tuple.
+#
+# The world is split into chunks of CHUNK_SIZE rows spanning the full map width.
+# A chunk is generated from the world seed the first time anything touches it,
+# and chunks far from the player are dropped again (or written to disk first if
+# they were modified), so the shaft can go arbitrarily deep in constant memory.
+def codes_table(enum_cls):
+    table = [None] * (max(member.value for member in enum_cls) + 1)
+    for member in enum_cls:
+        table[member.value] = member
+    return table
+
+BLOCKS_BY_CODE = codes_table(BlockID)
+ORES_BY_CODE = codes_table(OreID)
+
+CHUNK_SHIFT = 5
+CHUNK_SIZE = 1 << CHUNK_SHIFT
+CHUNK_MASK = CHUNK_SIZE - 1
+CHUNK_KEEP_RADIUS = 2  # Chunk rows kept around the player
+
+LAYER_BLOCKS, LAYER_VARIANTS, LAYER_ORES = range(3)
+
+class Chunk:
+    def __init__(self, cy, blocks, variants, ores):
+        self.cy = cy
+        self.layers = (blocks, variants, ores)
+        self.dirty = False
+
+class ChunkLayer:
+    def __init__(self, world, layer):
+        self.world = world
+        self.layer = layer
+
+    def get(self, x, y, default=0):
+        world = self.world
+        if not world.in_range(x, y):
+            return default
+        return world.chunk(y >> CHUNK_SHIFT).layers[self.layer][(y & CHUNK_MASK) * world.width + x]
+
+    def set(self, x, y, code):
+        world = self.world
+        if not world.in_range(x, y):
+            return
+        chunk = world.chunk(y >> CHUNK_SHIFT)
+        chunk.layers[self.layer][(y & CHUNK_MASK) * world.width + x] = code
+        chunk.dirty = True
+        world.unsaved.add(chunk.cy)
+        world.edited.add(chunk.cy)
+
+class WorldStore:
+    def __init__(self, width, height=None, generator=None, cache_dir=None, save_dir=None):
+        self.width = width
+        self.height = height  # None means infinitely deep
+        self.generator = WorldGenerator() if generator is None else generator
+        self.seed = self.generator.seed
+        self.cache_dir = cache_dir
+        self.save_dir = save_dir  # Chunks of the last save, read before generating
+        self.unsaved = set()  # Chunk rows changed since the last save
+        self.edited = set()  # Chunk rows changed from the seed, saving keeps them
+        if save_dir is not None and os.path.isdir(save_dir):
+            self.edited.update(int(name[6:-4]) for name in os.listdir(save_dir) if name.startswith("chunk_") and name.endswith(".bin"))
+        self.chunks: dict[int, Chunk] = {}
+        self.listeners = []  # Notified through on_chunk_loaded / on_chunk_evicted
+        self.blocks = ChunkLayer(self, LAYER_BLOCKS)
+        self.variants = ChunkLayer(self, LAYER_VARIANTS)
+        self.ores = ChunkLayer(self, LAYER_ORES)
+
+    def in_range(self, x, y):
+        return 0 <= x < self.width and 0 <= y and (self.height is None or y < self.height)
+
+    def chunk_rows(self, cy):
+        y0 = cy * CHUNK_SIZE
+        return y0, y0 + CHUNK_SIZE if self.height is None else min(y0 + CHUNK_SIZE, self.height)
+
+    def chunk(self, cy):
+        chunk = self.chunks.get(cy)
+        if chunk is None:
+            chunk = self.add_chunk(self.load_chunk(cy))
+        return chunk
+
+    def add_chunk(self, chunk):
+        self.chunks[chunk.cy] = chunk
+        for listener in self.listeners:
+            listener.on_chunk_loaded(self, chunk)
+        return chunk
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+        for chunk in list(self.chunks.values()):
+            listener.on_chunk_loaded(self, chunk)
+
+    def generate(self, cy_from, cy_to, workers=1):
+        # Generate a range of chunk rows up front, in a process pool if workers > 1
+        missing = [cy for cy in range(cy_from, cy_to) if cy not in self.chunks]
+        for band in self.generator.generate_bands(self.width, self.height, [self.chunk_rows(cy) for cy in missing], workers):
+            self.add_chunk(Chunk(band.y0 >> CHUNK_SHIFT, band.blocks, band.variants, band.ores))
+
+    def chunk_path(self, cy):
+        if self.cache_dir is None:
+            return None
+        return os.path.join(self.cache_dir, f"chunk_{cy}.bin")
+
+    def load_chunk(self, cy):
+        # Newest copy first: evicted since the last save, then the save, then the seed
+        path = self.chunk_path(cy)
+        if path is not None and os.path.exists(path):
+            with open(path, "rb") as f:
+                data = f.read()
+            size = len(data) // 3
+            return Chunk(cy, bytearray(data[:size]), bytearray(data[size:2 * size]), bytearray(data[2 * size:]))
+        if self.save_dir is not None:
+            path = save_chunk_path(self.save_dir, cy)
+            if os.path.exists(path):
+                return Chunk(cy, *map_chunk_layers(path, self.chunk_bytes(cy)))
+        y0, y1 = self.chunk_rows(cy)
+        band = self.generator.generate_band(self.width, self.height, y0, y1)
+        return Chunk(cy, band.blocks, band.variants, band.ores)
+
+    def evict_chunk(self, cy):
+        chunk = self.chunks.pop(cy)
+        for listener in self.listeners:
+            listener.on_chunk_evicted(self, chunk)
+        if not chunk.dirty:
+            return  # Untouched chunks regenerate identically from the seed
+        if self.cache_dir is None:
+            self.cache_dir = tempfile.mkdtemp(prefix="miner_chunks_")
+        with open(self.chunk_path(cy), "wb") as f:
+            f.write(b"".join(chunk.layers))
+
+    def chunk_bytes(self, cy):
+        y0, y1 = self.chunk_rows(cy)
+        return (y1 - y0) * self.width
+
+    def save(self, save_dir):
+        # Writes the chunks changed since the last save. Saving somewhere new
+        # first carries over the chunk files of the previous save.
+        os.makedirs(save_dir, exist_ok=True)
+        if self.save_dir is not None and os.path.abspath(self.save_dir) != os.path.abspath(save_dir):
+            for name in os.listdir(self.save_dir):
+                if name.startswith("chunk_") and name.endswith(".bin"):
+                    shutil.copyfile(os.path.join(self.save_dir, name), os.path.join(save_dir, name))
+        for cy in sorted(self.unsaved):
+            chunk = self.chunks.get(cy) or self.load_chunk(cy)
+            write_chunk_layers(save_chunk_path(save_dir, cy), chunk.layers)
+        self.unsaved.clear()
+        self.save_dir = save_dir
+
+    def stream(self, block_y, radius=CHUNK_KEEP_RADIUS):
+        # Keep the chunks around block_y loaded and drop the rest
+        self.stream_rows((block_y,), radius)
+
+    def stream_rows(self, block_ys, radius=CHUNK_KEEP_RADIUS):
+        # Same for several players, a chunk stays while it is near any of them
+        centers = {block_y >> CHUNK_SHIFT for block_y in block_ys}
+        for cy in [cy for cy in self.chunks if all(abs(cy - center) > radius for center in centers)]:
+            self.evict_chunk(cy)
+        for center in sorted(centers):
+            for cy in range(max(0, center - 1), center + 2):
+                if self.height is None or cy * CHUNK_SIZE < self.height:
+                    self.chunk(cy)
+
+
+SAVE_PAGE = 4096 if mmap is None else mmap.ALLOCATIONGRANULARITY
+
+def save_chunk_path(save_dir, cy):
+    return os.path.join(save_dir, f"chunk_{cy}.bin")
+
+def write_atomic(path, data):
+    # Write beside the target and swap it in: a crash never leaves half a
+    # file, and chunks still mapped from the old file keep their pages
+    with open(path + ".tmp", "wb") as f:
+        f.write(data)
+    os.replace(path + ".tmp", path)
+
+def write_chunk_layers(path, layers):
+    data = bytearray()
+    for layer in layers:
+        data += bytes(-len(data) % SAVE_PAGE)
+        data += layer
+    write_atomic(path, data)
+
+def map_chunk_layers(path, size):
+    # One copy-on-write mapping per layer: edits stay in memory until saved
+    offsets = [i * ((size + SAVE_PAGE - 1) // SAVE_PAGE * SAVE_PAGE) for i in range(3)]
+    with open(path, "rb") as f:
+        if mmap is None:
+            data = f.read()
+            return [bytearray(data[offset:offset + size]) for offset in offsets]
+        return [mmap.mmap(f.fileno(), size, access=mmap.ACCESS_COPY, offset=offset) for offset in offsets]
+
+class Ores:
+    TEXTURES = {
+        OreID.NONE: (0, 0, 0, 0),
+        OreID.GOLD: (32, 80, 8, 8),
+        OreID.DIAMONDS: (32, 96, 8, 8),
+        OreID.MITHRIL: (32, 96+16, 8, 8),
+        OreID.ALIENIUM: (32, 96+32, 8, 8)
+    }
+
+    UI_SPRITES = {
+        OreID.NONE: (0, 0, 0, 0),
+        OreID.GOLD: (0, 80, 8, 8),
+        OreID.DIAMONDS: (8, 80, 8, 8),
+        OreID.MITHRIL: (16, 80, 8, 8),
+        OreID.ALIENIUM: (24, 80, 8, 8)
+    }
+
+    BASE_VALUE = {
+        OreID.NONE: 0,
+        OreID.GOLD: 100,
+        OreID.DIAMONDS: 1000,
+        OreID.MITHRIL: 10000,
+        OreID.ALIENIUM: 999999
+    }
+
+    @staticmethod
+    def get_texture(ore_id):
+        return Ores.TEXTURES.get(ore_id, (0, 0, 0, 0))
+
+    @staticmethod
+    def get_ui_sprite(ore_id):
+        return Ores.UI_SPRITES.get(ore_id, (0, 0, 0, 0))
+
+    @staticmethod
+    def get_base_value(ore_id):
+        return Ores.BASE_VALUE.get(ore_id, 0)
+
+    @staticmethod
+    def get_sale_value(ores, prices=None):
+        # What the shop pays for {ore_id: count}, at other prices when given
+        prices = Ores.BASE_VALUE if prices is None else prices
+        return sum(prices.get(ore_id, 0) * count for ore_id, count in ores.items())
+
+# === Static Block Data ===
+class Blocks:
+    # Block properties stored in a dictionary (no instance data)
+    TEXTURES = {
+        BlockID.AIR: (48, 112, 8, 8),
+        BlockID.GRASS: (48, 96, 8, 8),
+        BlockID.DIRT: (48, 80, 8, 8),
+        BlockID.STONE: (48, 64, 8, 8),
+        BlockID.HARD_STONE: (48, 128, 8, 8),
+        BlockID.MAGMA_ROCK: (48, 144, 8, 8),
+        BlockID.GRAVEL: (64, 64, 8, 8),  # Painted into the image bank when the assets load
+        BlockID.MAGMA: (64, 80, 8, 8),
+    }
+
+    SOLIDITY = {
+        BlockID.AIR: False,
+        BlockID.GRASS: True,
+        BlockID.DIRT: True,
+        BlockID.STONE: True,
+        BlockID.HARD_STONE: True,
+        BlockID.MAGMA_ROCK: True,
+        BlockID.GRAVEL: True,
+        BlockID.MAGMA: False,
+    }
+
+    MINING_HITS = {
+        BlockID.AIR: 0,
+        BlockID.GRASS: 5,
+        BlockID.DIRT: 10,
+        BlockID.STONE: 20,
+        BlockID.HARD_STONE: 50,
+        BlockID.MAGMA_ROCK: 200,
+        BlockID.GRAVEL: 5,
+        BlockID.MAGMA: 0,
+    }
+
+    @staticmethod
+    def get_texture(block_id):
+        return Blocks.TEXTURES.get(block_id, (0, 0, 0, 0))
+
+    @staticmethod
+    def is_solid(block_id):
+        return Blocks.SOLIDITY.get(block_id, True)
+
+    @staticmethod
+    def get_mining_hits(block_id):
+        return Blocks.MINING_HITS.get(block_id, 0)
+
+# Solidity indexed by block code, for lookups straight from the world store
+SOLID_BY_CODE = [Blocks.is_solid(block_id) for block_id in BLOCKS_BY_CODE]
+SOLID_CODES_NP = None if np is None else np.array(SOLID_BY_CODE, dtype=bool)
+
+# === World Generation ===
+# The world is generated in horizontal bands by a pipeline of named stages. Every
+# row of every stage draws from its own stream derived from the world seed, so a
+# band can be generated on its own (in any process) and the result is byte
+# identical to generating the whole map in one go.
+def row_random(seed, stage, y):
+    return random.Random(f"{seed}:{stage}:{y}")
+
+def cave_noise(width, height, fill_probability=72, seed=0, top=0):
+    # Same odds as random.randint(0, 100) < fill_probability, drawn as 16 bit
+    # samples so numpy and pure Python agree cell for cell
+    threshold = round(65536 * fill_probability / 101)
+    samples = b"".join(row_random(seed, "caves", y).randbytes(2 * width) for y in range(top, top + height))
+    samples = memoryview(samples).cast("H")
+    stone, air = BlockID.STONE.value, BlockID.AIR.value
+    if np is not None:
+        noise = np.frombuffer(samples, dtype=np.uint16)
+        return bytearray(np.where(noise < threshold, stone, air).astype(np.uint8).tobytes())
+    return bytearray(stone if sample < threshold else air for sample in samples)
+
+def smooth_caves(cells, width, height, iterations=5, use_numpy=None):
+    # Cellular automaton: a cell becomes stone if 5+ of its 8 neighbours are stone.
+    # Cells outside the smoothed interior fall back to air, like missing map entries.
+    if use_numpy is None:
+        use_numpy = np is not None
+    if use_numpy:
+        return smooth_caves_numpy(cells, width, height, iterations)
+    return smooth_caves_python(cells, width, height, iterations)
+
+def smooth_caves_python(cells, width, height, iterations):
+    stone, air = BlockID.STONE.value, BlockID.AIR.value
+    for _ in range(iterations):
+        new_cells = bytearray([air]) * (width * height)
+        for y in range(1, height-1):
+            row = y * width
+            for x in range(1, width-1):
+                # Count walls around
+                walls = 0
+                for i in (row - width + x, row + x, row + width + x):
+                    walls += (cells[i-1] == stone) + (cells[i] == stone) + (cells[i+1] == stone)
+                walls -= cells[row + x] == stone
+
+                if walls >= 5:
+                    new_cells[row + x] = stone
+        cells = new_cells
+    return cells
+
+def smooth_caves_numpy(cells, width, height, iterations):
+    stone, air = BlockID.STONE.value, BlockID.AIR.value
+    walls = np.frombuffer(cells, dtype=np.uint8).reshape(height, width) == stone
+    walls = walls.astype(np.uint8)
+    for _ in range(iterations):
+        # Neighbour count from the 8 shifted views of the interior
+        neighbours = (
+            walls[:-2, :-2] + walls[:-2, 1:-1] + walls[:-2, 2:]
+            + walls[1:-1, :-2] + walls[1:-1, 2:]
+            + walls[2:, :-2] + walls[2:, 1:-1] + walls[2:, 2:]
+        )
+        new_walls = np.zeros_like(walls)
+        new_walls[1:-1, 1:-1] = neighbours >= 5
+        walls = new_walls
+    return bytearray(np.where(walls, stone, air).astype(np.uint8).tobytes())
+
+class WorldBand:
+    # Rows y0..y1 of every world layer, laid out like Chunk layers.
+    # A height of None means the world is infinitely deep.
+    def __init__(self, width, height, y0, y1):
+        self.width = width
+        self.height = height
+        self.y0 = y0
+        self.y1 = y1
+        size = width * (y1 - y0)
+        self.blocks = bytearray([BlockID.AIR.value]) * size
+        self.variants = bytearray(size)
+        self.ores = bytearray([OreID.NONE.value]) * size
+
+VARIANTS_TABLE = bytes(value % 4 for value in range(256))
+
+def generate_variants(band, seed):
+    width = band.width
+    for y in range(band.y0, band.y1):
+        row = (y - band.y0) * width
+        band.variants[row:row + width] = row_random(seed, "variants", y).randbytes(width).translate(VARIANTS_TABLE)
+
+def generate_caves(band, seed, fill_probability=72, iterations=5):
+    # Smooth the band together with `iterations` rows of halo on each side: the
+    # automaton treats the slice edges as map edges, and that error creeps in by
+    # one row per pass, so it never reaches the band itself.
+    width = band.width
+    top = max(0, band.y0 - iterations)
+    bottom = band.y1 + iterations if band.height is None else min(band.height, band.y1 + iterations)
+    cells = cave_noise(width, bottom - top, fill_probability, seed, top)
+    cells = smooth_caves(cells, width, bottom - top, iterations)
+    start = (band.y0 - top) * width
+    band.blocks[:] = cells[start:start + len(band.blocks)]
+    # Fix missing borders
+    stone = BlockID.STONE.value
+    for row in range(0, len(band.blocks), width):
+        band.blocks[row] = stone
+        band.blocks[row + width - 1] = stone
+
+def rocks_gradient_changer(band, seed, layer_height=10, buffer=10):
+    layers = [BlockID.DIRT, BlockID.STONE, BlockID.HARD_STONE, BlockID.MAGMA_ROCK]
+    layers = [block_id.value for block_id in layers]
+    width, blocks = band.width, band.blocks
+    stone = BlockID.STONE.value
+
+    for y in range(band.y0, band.y1):
+        row = (y - band.y0) * width
+        if y < 10:
+            blocks[row:row + width] = bytearray([BlockID.AIR.value]) * width
+            continue
+        elif y == 10:
+            blocks[row:row + width] = bytearray([BlockID.GRASS.value]) * width
+            continue
+        elif y < 13:
+            blocks[row:row + width] = bytearray([BlockID.DIRT.value]) * width
+            continue
+
+        rng = row_random(seed, "layers", y)
+        layer_index = (y - 13) // (layer_height + buffer)
+        layer_index = min(layer_index, len(layers) - 1)
+
+        primary_block = layers[layer_index]
+        layer_start = 13 + layer_index * (layer_height + buffer)
+        layer_end = layer_start + layer_height
+        transition_top = layer_start - buffer
+        transition_bottom = layer_end
+
+        for i in range(row, row + width):
+            if blocks[i] != stone:
+                continue
+            if transition_top <= y < layer_start and layer_index > 0:
+                above_block = layers[layer_index - 1]
+                mix_prob = (y - transition_top) / buffer
+                blocks[i] = above_block if rng.random() > mix_prob else primary_block
+
+            elif transition_bottom <= y < transition_bottom + buffer and layer_index < len(layers) - 1:
+                below_block = layers[layer_index + 1]
+                mix_prob = (transition_bottom + buffer - y) / buffer
+                blocks[i] = below_block if rng.random() > mix_prob else primary_block
+
+            else:
+                blocks[i] = primary_block
+
+# === Ore Table ===
+# Where ores go is data, not code: assets/ores.json lists every ore with the
+# blocks it can sit in, its depth range, its odds (a base chance plus a part
+# that grows with depth) and optionally how it clusters into veins.
+ORE_TABLE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets", "ores.json")
+
+class OreRule:
+    def __init__(self, ore_id, blocks, min_depth=0, max_depth=None, chance=0.0, depth_chance=0.0, vein_steps=0, vein_spread=0.0):
+        self.ore_id = ore_id
+        self.allowed = [block_id in blocks for block_id in BLOCKS_BY_CODE]  # Indexed by block code
+        self.min_depth = min_depth
+        self.max_depth = max_depth
+        self.chance = chance
+        self.depth_chance = depth_chance
+        self.vein_steps = vein_steps
+        self.spread_threshold = round(65536 * vein_spread)
+
+    def in_depth(self, y):
+        return y >= self.min_depth and (self.max_depth is None or y < self.max_depth)
+
+    def threshold(self, y, depth_scale):
+        # Odds of row y as a bound on 16 bit samples, 0 outside the depth range
+        if not self.in_depth(y):
+            return 0
+        chance = self.chance + min(y / depth_scale, 1.0) * self.depth_chance
+        return min(round(65536 * chance), 65536)
+
+def load_ore_table(path=ORE_TABLE_PATH):
+    with open(path) as f:
+        entries = json.load(f)["ores"]
+    rules = []
+    for entry in entries:
+        try:
+            vein = entry.get("vein", {})
+            rules.append(OreRule(
+                OreID[entry["ore"]],
+                {BlockID[name] for name in entry["blocks"]},
+                entry.get("min_depth", 0),
+                entry.get("max_depth"),
+                entry.get("chance", 0.0),
+                entry.get("depth_chance", 0.0),
+                vein.get("steps", 0),
+                vein.get("spread", 0.0),
+            ))
+        except KeyError as error:
+            raise ValueError(f"{path}: unknown or missing {error} in ore entry {entry}") from None
+    return rules
+
+default_ore_table = None
+
+def generate_ores(band, seed, table=None):
+    # Every row draws 16 bit samples from its own stream: one per cell and ore
+    # to place it, and one more per cell and vein ore to let a vein grow into
+    # the cell. Veins spread one cell per step, so the samples cover `steps`
+    # rows of halo around the band and a band still comes out the same as the
+    # whole map generated at once.
+    global default_ore_table
+    if table is None:
+        if default_ore_table is None:
+            default_ore_table = load_ore_table()
+        table = default_ore_table
+    if not table:
+        return
+    reach = max(rule.vein_steps for rule in table)
+    top = max(0, band.y0 - reach)
+    bottom = band.y1 + reach if band.height is None else min(band.height, band.y1 + reach)
+    slots = len(table) + sum(1 for rule in table if rule.vein_steps)
+    samples = b"".join(row_random(seed, "ores", y).randbytes(2 * band.width * slots) for y in range(top, bottom))
+    # Ore odds keep scaling to the bottom of the original map, then level off
+    depth_scale = band.height or MAP_SIZE_BLOCKS_Y
+    thresholds = [[rule.threshold(y, depth_scale) for y in range(top, bottom)] for rule in table]
+    if np is not None:
+        generate_ores_numpy(band, table, samples, slots, thresholds, top, bottom)
+    else:
+        generate_ores_python(band, table, memoryview(samples).cast("H"), slots, thresholds, top, bottom)
+
+def generate_ores_numpy(band, table, samples, slots, thresholds, top, bottom):
+    width = band.width
+    samples = np.frombuffer(samples, dtype=np.uint16).reshape(bottom - top, slots, width)
+    blocks = np.frombuffer(band.blocks, dtype=np.uint8).reshape(-1, width)
+    ores = np.frombuffer(band.ores, dtype=np.uint8).reshape(-1, width)
+    inner = slice(band.y0 - top, band.y1 - top)
+    vein_slot = len(table)
+    for index, rule in enumerate(table):
+        placed = samples[:, index] < np.array(thresholds[index], dtype=np.uint32)[:, None]
+        if rule.vein_steps:
+            spread = samples[:, vein_slot] < rule.spread_threshold
+            vein_slot += 1
+            for _ in range(rule.vein_steps):
+                grown = np.zeros_like(placed)
+                grown[1:] |= placed[:-1]
+                grown[:-1] |= placed[1:]
+                grown[:, 1:] |= placed[:, :-1]
+                grown[:, :-1] |= placed[:, 1:]
+                placed = placed | (grown & spread)
+        in_depth = np.array([rule.in_depth(y) for y in range(band.y0, band.y1)], dtype=bool)[:, None]
+        mask = placed[inner] & in_depth & np.array(rule.allowed, dtype=bool)[blocks]
+        ores[mask] = rule.ore_id.value
+
+def generate_ores_python(band, table, samples, slots, thresholds, top, bottom):
+    # Same cells as generate_ores_numpy, one at a time
+    width, blocks, ores = band.width, band.blocks, band.ores
+    rows = bottom - top
+    size = rows * width
+    stride = width * slots
+    vein_slot = len(table)
+    for index, rule in enumerate(table):
+        placed = bytearray(size)
+        for row in range(rows):
+            threshold, base = thresholds[index][row], row * stride + width * index
+            for x in range(width):
+                placed[row * width + x] = samples[base + x] < threshold
+        if rule.vein_steps:
+            spread = bytearray(size)
+            for row in range(rows):
+                base = row * stride + width * vein_slot
+                for x in range(width):
+                    spread[row * width + x] = samples[base + x] < rule.spread_threshold
+            vein_slot += 1
+            for _ in range(rule.vein_steps):
+                grown = bytearray(placed)
+                for i in range(size):
+                    if placed[i] or not spread[i]:
+                        continue
+                    x = i % width
+                    if (x > 0 and placed[i - 1]) or (x < width - 1 and placed[i + 1]) or (i >= width and placed[i - width]) or (i + width < size and placed[i + width]):
+                        grown[i] = 1
+                placed = grown
+        code, allowed = rule.ore_id.value, rule.allowed
+        for y in range(band.y0, band.y1):
+            if not rule.in_depth(y):
+                continue
+            row, source = (y - band.y0) * width, (y - top) * width
+            for x in range(width):
+                if placed[source + x] and allowed[blocks[row + x]]:
+                    ores[row + x] = code
+
+GRAVEL_ODDS = 10  # Out of 256, stone cells that are gravel instead
+MAGMA_ODDS = 24  # Out of 256, cave cells that hold magma at MAGMA_DEPTH and below
+MAGMA_DEPTH = 73  # First row of the magma rock layer
+
+def generate_loose(band, seed):
+    # Gravel in the stone and magma in the deep caves, placed where the dice
+    # say without looking at their support: what hangs in the air comes down
+    # as soon as the chunk loads, see miner.cells
+    width, blocks = band.width, band.blocks
+    stone, air = BlockID.STONE.value, BlockID.AIR.value
+    gravel, magma = BlockID.GRAVEL.value, BlockID.MAGMA.value
+    for y in range(max(band.y0, 13), band.y1):
+        row = (y - band.y0) * width
+        dice = row_random(seed, "loose", y).randbytes(width)
+        for x in range(width):
+            code = blocks[row + x]
+            if code == stone and dice[x] < GRAVEL_ODDS:
+                blocks[row + x] = gravel
+            elif code == air and y >= MAGMA_DEPTH and dice[x] < MAGMA_ODDS:
+                blocks[row + x] = magma
+
+class WorldGenerator:
+    STAGES = [
+        ("variants", generate_variants),
+        ("caves", generate_caves),
+        ("layers", rocks_gradient_changer),
+        ("loose", generate_loose),
+        ("ores", generate_ores),
+    ]
+
+    def __init__(self, seed=None, stages=None, ore_table=None):
+        self.seed = random.randrange(2**32) if seed is None else seed
+        self.stages = list(self.STAGES if stages is None else stages)
+        if ore_table is not None:
+            self.stages = [(name, partial(generate_ores, table=ore_table) if stage is generate_ores else stage) for name, stage in self.stages]
+
+    def generate_band(self, width, height, y0, y1):
+        band = WorldBand(width, height, y0, y1)
+        for name, stage in self.stages:
+            stage(band, self.seed)
+        return band
+
+    def generate_bands(self, width, height, rows, workers=1):
+        # workers > 1 fills the bands in a process pool, the result is identical
+        jobs = [(width, height, y0, y1) for y0, y1 in rows]
+        if workers > 1 and len(jobs) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                return list(pool.map(self.generate_band, *zip(*jobs)))
+        return [self.generate_band(*job) for job in jobs]
@@ -0,0 +1,73 @@
+from miner import state
+from miner.player import Player
+from miner.simulation import Simulation
+from miner.world import BlockID
+
+
+def shaft():
+    # A stone box with an empty shaft at x 12 to 14, rows 8 to 19, floored at row 20
+    blocks = state.blocks_handler.blocks
+    for y in range(7, 21):
+        for x in range(11, 16):
+            blocks.set(x, y, BlockID.STONE.value)
+    for y in range(8, 20):
+        for x in range(12, 15):
+            blocks.set(x, y, BlockID.AIR.value)
+    while state.cells.update():
+        pass
+
+
+def settle(ticks=40):
+    for _ in range(ticks):
+        state.cells.update()
+
+
+def test_gravel_stops_on_the_player():
+    Simulation(0, lighting=False)
+    shaft()
+    state.player.x, state.player.y = 13 * 8, 19 * 8
+    state.blocks_handler.set_block(13, 9, BlockID.GRAVEL)
+    settle()
+    blocks = state.blocks_handler.blocks
+    assert blocks.get(13, 19) == BlockID.AIR.value
+    assert blocks.get(13, 18) == BlockID.GRAVEL.value
+    # Once the player steps away the gravel carries on down
+    state.player.x = 12 * 8 - 4
+    state.player.y = 8 * 8
+    settle()
+    assert blocks.get(13, 18) == BlockID.AIR.value
+    assert blocks.get(13, 19) == BlockID.GRAVEL.value
+
+
+def test_gravel_stops_on_a_player_between_cells():
+    Simulation(0, lighting=False)
+    shaft()
+    state.player.x, state.player.y = 13 * 8 + 3, 18 * 8 + 5
+    state.blocks_handler.set_block(13, 9, BlockID.GRAVEL)
+    settle()
+    blocks = state.blocks_handler.blocks
+    assert blocks.get(13, 17) == BlockID.GRAVEL.value
+    assert blocks.get(13, 18) == blocks.get(13, 19) == BlockID.AIR.value
+
+
+def test_magma_stops_on_an_enemy():
+    Simulation(0, lighting=False)
+    shaft()
+    state.player.x, state.player.y = 0, 0
+    state.enemies.spawn(12 * 8, 19 * 8)
+    state.blocks_handler.set_block(12, 9, BlockID.MAGMA)
+    settle()
+    blocks = state.blocks_handler.blocks
+    assert blocks.get(12, 19) == BlockID.AIR.value
+    assert BlockID.MAGMA.value in (blocks.get(12, 18), blocks.get(13, 19), blocks.get(14, 19))
+
+
+def test_server_keeps_every_seat_clear():
+    Simulation(0, lighting=False)
+    shaft()
+    seated = Player(13 * 8, 19 * 8)
+    state.player.x, state.player.y = 0, 0
+    state.blocks_handler.set_block(13, 9, BlockID.GRAVEL)
+    for _ in range(40):
+        state.cells.update([state.player, seated])
+    assert state.blocks_handler.blocks.get(13, 19) == BlockID.AIR.value
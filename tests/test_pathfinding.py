@@ -0,0 +1,30 @@
+from miner import state
+from miner.entities import update_entities
+from miner.simulation import Simulation
+from miner.world import BlockID
+
+
+def corridor():
+    # A flat corridor at rows 9 to 12 across the first 60 columns
+    Simulation(0, lighting=False)
+    for y in range(8, 14):
+        for x in range(60):
+            state.blocks_handler.set_block(x, y, BlockID.STONE if y in (8, 13) else BlockID.AIR)
+
+
+def test_enemies_chase_the_nearest_player():
+    corridor()
+    left = state.enemies.spawn(20 * 8, 12 * 8, 1)
+    right = state.enemies.spawn(40 * 8, 12 * 8, -1)
+    update_entities([(14 * 8, 12 * 8), (33 * 8, 12 * 8), (44 * 8, 12 * 8)])
+    assert left.direction == -1
+    assert right.direction == 1
+
+
+def test_enemies_ignore_players_out_of_reach():
+    corridor()
+    enemy = state.enemies.spawn(20 * 8, 12 * 8, -1)
+    update_entities([])
+    assert enemy.direction == -1
+    update_entities([(21 * 8, 12 * 8)])
+    assert enemy.direction == 1
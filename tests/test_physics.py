@@ -0,0 +1,74 @@
+import random
+
+import pyxel
+
+from miner import state
+from miner.physics import push_back
+from miner.simulation import Simulation
+from miner.world import BlockID
+
+
+# The per-pixel movement push_back replaced, kept as the reference
+def reference_is_colliding(x, y):
+    x1 = pyxel.floor(x) // 8
+    y1 = pyxel.floor(y) // 8
+    x2 = (pyxel.ceil(x) + 7) // 8
+    y2 = (pyxel.ceil(y) + 7) // 8
+    for yi in range(y1, y2 + 1):
+        for xi in range(x1, x2 + 1):
+            if state.blocks_handler.is_solid(xi, yi):
+                return True
+    return False
+
+
+def reference_push_back(x, y, dx, dy):
+    for _ in range(pyxel.ceil(abs(dy))):
+        step = max(-1, min(1, dy))
+        if reference_is_colliding(x, y + step):
+            break
+        y += step
+        dy -= step
+    for _ in range(pyxel.ceil(abs(dx))):
+        step = max(-1, min(1, dx))
+        if reference_is_colliding(x + step, y):
+            break
+        x += step
+        dx -= step
+    return x, y
+
+
+def scattered_world(rng, width=40, height=40, solid=0.3):
+    Simulation(0, lighting=False)
+    for y in range(height):
+        for x in range(width):
+            state.blocks_handler.blocks.set(x, y, BlockID.STONE.value if rng.random() < solid else BlockID.AIR.value)
+
+
+def test_integer_moves_match_the_reference():
+    rng = random.Random(1)
+    scattered_world(rng)
+    for _ in range(5000):
+        x, y = rng.randint(-4, 300), rng.randint(-4, 300)
+        dx, dy = rng.randint(-40, 40), rng.randint(-40, 40)
+        assert push_back(x, y, dx, dy) == reference_push_back(x, y, dx, dy), (x, y, dx, dy)
+
+
+def test_float_moves_match_the_reference():
+    rng = random.Random(2)
+    scattered_world(rng)
+    for _ in range(5000):
+        x, y = rng.uniform(-4, 300), rng.uniform(-4, 300)
+        dx, dy = rng.uniform(-40, 40), rng.uniform(-40, 40)
+        if rng.random() < 0.3:
+            x, y = int(x), int(y)  # Whole positions with fractional moves
+        assert push_back(x, y, dx, dy) == reference_push_back(x, y, dx, dy), (x, y, dx, dy)
+
+
+def test_open_world_moves_match_the_reference():
+    # Long moves through sparse blocks cross many block lines between hits
+    rng = random.Random(3)
+    scattered_world(rng, solid=0.05)
+    for _ in range(2000):
+        x, y = rng.randint(0, 300), rng.randint(0, 300)
+        dx, dy = (rng.choice((rng.randint(-120, 120), rng.uniform(-120, 120))) for _ in range(2))
+        assert push_back(x, y, dx, dy) == reference_push_back(x, y, dx, dy), (x, y, dx, dy)
@@ -0,0 +1,22 @@
+from miner.controls import ScriptedInput
+from miner.simulation import Simulation, soak_actions
+
+
+def test_state_hash_survives_a_save(tmp_path):
+    simulation = Simulation(0, lighting=False)
+    simulation.run(ScriptedInput(soak_actions), 1500)
+    before = simulation.state_hash()
+    simulation.save(str(tmp_path))
+    assert not simulation.world.unsaved
+    assert simulation.state_hash() == before
+    simulation.run(ScriptedInput(soak_actions), 300)
+    after = simulation.state_hash()
+    simulation.close()
+
+    assert after != before
+
+    # Loading hashes the saved chunks along with the replayed journal
+    loaded = Simulation.load(str(tmp_path), lighting=False)
+    loaded.tick_count = 1800
+    assert loaded.state_hash() == after
+    loaded.close()